@@ -1 +1,11 @@
-from .dots_parser import DotsOCRParser
+# DotsOCRParser is resolved on first access, so that importing a submodule
+# such as dots_ocr.parser or dots_ocr.utils does not load the parser
+__all__ = ["DotsOCRParser"]
+
+
+def __getattr__(name):
+    if name == "DotsOCRParser":
+        from .dots_parser import DotsOCRParser
+
+        return DotsOCRParser
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
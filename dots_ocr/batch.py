@@ -0,0 +1,327 @@
+import os
+import json
+import argparse
+import threading
+
+from dots_ocr.dots_parser import add_parser_args, parser_from_args
+
+
+def list_pdf_files(input_path):
+    """
+    Lists the documents of a batch.
+
+    Args:
+        input_path: A directory, whose pdf files are taken in name order, or a
+            manifest file with one pdf path per line ('#' starts a comment).
+            Relative paths in a manifest are resolved against its directory.
+
+    Returns:
+        list: Absolute pdf paths.
+    """
+    if os.path.isdir(input_path):
+        names = sorted(f for f in os.listdir(input_path) if f.lower().endswith(".pdf"))
+        return [os.path.abspath(os.path.join(input_path, f)) for f in names]
+
+    base_dir = os.path.dirname(os.path.abspath(input_path))
+    pdf_files = []
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                pdf_files.append(os.path.abspath(os.path.join(base_dir, line)))
+    return pdf_files
+
+
+class _Document:
+    """Bookkeeping of one document while its pages are in flight."""
+
+    def __init__(self, input_path, num_pages):
+        self.input_path = input_path
+        self.num_pages = num_pages
+        self.results = []
+        self.errors = []
+        self.output_dir = None
+        self.filename = None
+        self.save_dir = None
+        self.checkpoint = None
+        self.setup_error = None
+
+    @property
+    def finished(self):
+        return len(self.results) + len(self.errors) == self.num_pages
+
+
+class BatchIngest:
+    """
+    Parses many pdf files with one worker pool shared by all their pages.
+
+    Pages are fed to the pool in document order through a bounded feeder, so
+    the tail of a document overlaps the head of the next one instead of leaving
+    threads idle. Every finished document is written by the parser's result
+    sink, recorded in a progress file and reported to `on_document_done`; a
+    rerun with the same progress file skips the documents already done. A
+    document that fails, including an unreadable pdf or a failed output or
+    checkpoint setup, is reported and recorded as failed like a failed page,
+    and retried on the next run without stopping the batch.
+    """
+
+    def __init__(
+        self,
+        dots_ocr_parser,
+        prompt_mode="prompt_layout_all_en",
+        output_dir="",
+        progress_file=None,
+        on_document_done=None,
+    ):
+        """
+        Args:
+            dots_ocr_parser: The DotsOCRParser used for every page.
+            prompt_mode: The prompt of every page.
+            output_dir: Output directory, the parser's output_dir by default.
+            progress_file: Jsonl of the finished documents, defaults to
+                `<output_dir>/batch_progress.jsonl`.
+            on_document_done: Optional callable `(input_path, results, error)`
+                called from the calling thread as soon as a document is finished.
+                `error` is None on success, otherwise `results` holds the pages
+                that succeeded and the document is retried on the next run.
+        """
+        self.parser = dots_ocr_parser
+        self.prompt_mode = prompt_mode
+        self.output_dir = os.path.abspath(output_dir or dots_ocr_parser.output_dir)
+        self.progress_file = progress_file or os.path.join(
+            self.output_dir, "batch_progress.jsonl"
+        )
+        self.on_document_done = on_document_done
+
+    @staticmethod
+    def _fingerprint(input_path):
+        stat = os.stat(input_path)
+        return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+    def _load_progress(self):
+        done = {}
+        if os.path.exists(self.progress_file):
+            with open(self.progress_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record.get("status") == "failed":
+                        done.pop(record["input_path"], None)
+                    else:
+                        done[record["input_path"]] = record
+        return done
+
+    def _record_progress(self, doc, error=None):
+        record = {"input_path": doc.input_path, "num_pages": doc.num_pages}
+        try:
+            record.update(self._fingerprint(doc.input_path))
+        except OSError:
+            pass  # a missing input is recorded as failed without a fingerprint
+        if error is not None:
+            record.update(status="failed", error=str(error))
+        os.makedirs(os.path.dirname(self.progress_file), exist_ok=True)
+        with open(self.progress_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _pending_documents(self, pdf_files):
+        from dots_ocr.utils.doc_utils import get_pdf_page_count
+
+        done = self._load_progress()
+        docs = []
+        for input_path in pdf_files:
+            record = done.get(input_path)
+            if record is not None and all(
+                record.get(k) == v for k, v in self._fingerprint(input_path).items()
+            ):
+                print(f"skip finished document: {input_path}")
+                continue
+            try:
+                num_pages = get_pdf_page_count(input_path)
+            except Exception as e:
+                # reported like a failed setup, retried on the next run
+                doc = _Document(input_path, 0)
+                doc.setup_error = e
+                self._fail_document(doc)
+                continue
+            if num_pages == 0:
+                print(f"skip empty document: {input_path}")
+                continue
+            docs.append(_Document(input_path, num_pages))
+        return docs
+
+    def _finish_document(self, doc):
+        if doc.checkpoint is not None:
+            doc.checkpoint.close()
+        doc.results.sort(key=lambda x: x["page_no"])
+        for result in doc.results:
+            result["file_path"] = doc.input_path
+        self.parser.result_sink.end_document(
+            doc.output_dir, doc.filename, doc.save_dir, doc.results
+        )
+        error = None
+        if doc.errors:
+            error = doc.errors[0]
+            print(f"{len(doc.errors)} pages of {doc.input_path} failed, first error: {error}")
+        self._record_progress(doc, error)
+        if self.on_document_done is not None:
+            self.on_document_done(doc.input_path, doc.results, error)
+
+    def _fail_document(self, doc):
+        """Reports a document whose setup failed, none of its pages were parsed."""
+        if doc.checkpoint is not None:
+            doc.checkpoint.close()
+        print(f"Error preparing {doc.input_path}: {doc.setup_error}")
+        self._record_progress(doc, doc.setup_error)
+        if self.on_document_done is not None:
+            self.on_document_done(doc.input_path, [], doc.setup_error)
+
+    def run(self, pdf_files):
+        """
+        Parses the documents not recorded as finished in the progress file.
+
+        Args:
+            pdf_files: Pdf paths, see `list_pdf_files`.
+
+        Returns:
+            dict: The sorted page results of every document parsed successfully.
+        """
+        from multiprocessing.pool import ThreadPool
+        from tqdm import tqdm
+
+        docs = self._pending_documents([os.path.abspath(p) for p in pdf_files])
+        total_pages = sum(doc.num_pages for doc in docs)
+        parser = self.parser
+        num_thread = parser._max_inflight
+        print(
+            f"Parsing {len(docs)} documents with {total_pages} pages using {num_thread} threads..."
+        )
+
+        # a large page takes as many prefetch slots as its pixels
+        capacity = num_thread * parser.prefetch_factor
+        page_slots = threading.BoundedSemaphore(capacity)
+
+        def _iter_tasks():
+            for doc in docs:
+                try:
+                    doc.output_dir, doc.filename, _, doc.save_dir = parser._prepare_save_dir(
+                        doc.input_path, self.output_dir
+                    )
+                    doc.checkpoint, completed = parser.begin_pdf_document(
+                        doc.input_path, doc.filename, self.prompt_mode, doc.save_dir
+                    )
+                except Exception as e:
+                    # reported by the run loop, the other documents go on
+                    doc.setup_error = e
+                    page_slots.acquire()
+                    yield doc, 1, e
+                    continue
+                if completed:
+                    # the pages restored from the checkpoint go through the pool as
+                    # one task, so that a fully restored document is finished too
+                    page_slots.acquire()
+                    yield doc, 1, list(completed.values())
+                rendered = len(completed)
+                try:
+                    for i, image, native_cells in parser.iter_pdf_pages(
+                        doc.input_path,
+                        self.prompt_mode,
+                        skip_page_ids=completed,
+                        max_pages_in_flight=capacity,
+                    ):
+                        slots = parser._prefetch_slots(image, capacity)
+                        for _ in range(slots):
+                            page_slots.acquire()
+                        rendered += 1
+                        yield doc, slots, {
+                            "origin_image": image,
+                            "prompt_mode": self.prompt_mode,
+                            "save_dir": doc.save_dir,
+                            "save_name": doc.filename,
+                            "source": "pdf",
+                            "page_idx": i,
+                            "native_cells": native_cells,
+                        }
+                except Exception as e:
+                    # a broken document fails on its own, the pages it still owes
+                    # are reported as failed so that it gets finished
+                    print(f"Error rendering {doc.input_path}: {e}")
+                    for _ in range(doc.num_pages - rendered):
+                        page_slots.acquire()
+                        yield doc, 1, e
+
+        def _execute_task(task):
+            doc, slots, task_args = task
+            try:
+                if isinstance(task_args, Exception):
+                    return doc, [], task_args
+                if isinstance(task_args, list):
+                    return doc, task_args, None
+                result = parser._parse_single_image(**task_args)
+                if doc.checkpoint is not None:
+                    doc.checkpoint.record(result)
+                return doc, [result], None
+            except Exception as e:
+                return doc, [], e
+            finally:
+                page_slots.release(slots)
+
+        results = {}
+        with ThreadPool(num_thread) as pool:
+            with tqdm(total=total_pages, desc="Processing PDF pages") as pbar:
+                for doc, page_results, error in pool.imap_unordered(
+                    _execute_task, _iter_tasks()
+                ):
+                    if doc.setup_error is not None:
+                        pbar.update(doc.num_pages)
+                        self._fail_document(doc)
+                        continue
+                    doc.results.extend(page_results)
+                    if error is not None:
+                        doc.errors.append(error)
+                    pbar.update(len(page_results) or 1)
+                    if doc.finished:
+                        self._finish_document(doc)
+                        if not doc.errors:
+                            results[doc.input_path] = doc.results
+        if parser.limiter is not None:
+            print(f"adaptive concurrency: {parser.limiter.stats()}")
+        if parser.cache is not None:
+            print(f"OCR cache: {parser.cache.stats()}")
+        if parser.scheduler is not None:
+            print(f"scheduler: {parser.scheduler.stats()}")
+        print(f"Batch finished, {len(results)}/{len(docs)} documents parsed")
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="dots.ocr batch ingest, all pages of many pdf files share one worker pool",
+    )
+    parser.add_argument(
+        "input_path",
+        type=str,
+        help="directory of pdf files, or a manifest file with one pdf path per line",
+    )
+    parser.add_argument(
+        "--progress_file",
+        type=str,
+        default=None,
+        help="jsonl of the finished documents, skipped when rerun (default: <output>/batch_progress.jsonl)",
+    )
+    add_parser_args(parser)
+    # batch jobs must not starve interactive parses of the same process
+    parser.set_defaults(priority="bulk")
+    args = parser.parse_args()
+
+    with parser_from_args(args) as dots_ocr_parser:
+        BatchIngest(
+            dots_ocr_parser,
+            prompt_mode=args.prompt,
+            output_dir=args.output,
+            progress_file=args.progress_file,
+        ).run(list_pdf_files(args.input_path))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,25 @@
 import os
 import json
-from tqdm import tqdm
-from multiprocessing.pool import ThreadPool, Pool
+import math
+import asyncio
+import threading
 import argparse
+import contextlib
+import weakref
 
 
-from dots_ocr.inference import inference_with_vllm
+# only light modules are imported here; fitz, PIL, numpy, openai, tqdm and the
+# modules depending on them are imported where they are used, so that `--help`,
+# the gradio app and other importers do not pay for code paths they never run
 from dots_ocr.utils.consts import image_extensions, MIN_PIXELS, MAX_PIXELS
 from dots_ocr.utils.image_utils import get_image_by_fitz_doc, fetch_image, smart_resize
-from dots_ocr.utils.doc_utils import fitz_doc_to_image, load_images_from_pdf
 from dots_ocr.utils.prompts import dict_promptmode_to_prompt
-from dots_ocr.utils.layout_utils import (
-    post_process_output,
-    draw_layout_on_image,
-    pre_process_bboxes,
-)
-from dots_ocr.utils.format_transformer import layoutjson2md
+from dots_ocr.utils.ocr_cache import OCRResultCache
+from dots_ocr.utils.result_sink import make_result_sink
+from dots_ocr.utils.image_store import ImageAssetStore
+from dots_ocr.utils.checkpoint import PageCheckpoint
+from dots_ocr.utils.concurrency import AdaptiveConcurrencyLimiter
+from dots_ocr.utils.scheduler import get_scheduler, DEFAULT_PRIORITY_CLASSES
 
 
 class DotsOCRParser:
@@ -33,11 +37,29 @@ class DotsOCRParser:
         top_p=1.0,
         max_completion_tokens=16384,
         num_thread=64,
+        prefetch_factor=2,
+        render_workers=0,
         dpi=200,
         output_dir="./output",
         min_pixels=None,
         max_pixels=None,
         use_hf=False,
+        hf_batch_size=1,
+        hf_model_path="./weights/DotsOCR",
+        hf_attn_implementation="flash_attention_2",
+        hf_device_map="auto",
+        cache_dir=None,
+        cache_max_bytes=2 * 1024**3,
+        adaptive_concurrency=False,
+        image_format="PNG",
+        image_quality=None,
+        render_layout=True,
+        result_sink="directory",
+        image_dir=None,
+        resume=False,
+        native_text=False,
+        tile_oversized=False,
+        priority=None,
     ):
         self.dpi = dpi
 
@@ -50,78 +72,143 @@ class DotsOCRParser:
         self.temperature = temperature
         self.top_p = top_p
         self.max_completion_tokens = max_completion_tokens
+        # encoding of the page images sent to the vllm server, PNG is lossless but slow and large
+        self.image_format = image_format
+        self.image_quality = image_quality
         self.num_thread = num_thread
+        # rendered pages kept in memory per inference thread
+        self.prefetch_factor = prefetch_factor
+        # size of the process pool rasterizing pdf pages, 0 renders in-thread
+        self.render_workers = render_workers
         self.output_dir = output_dir
         self.min_pixels = min_pixels
         self.max_pixels = max_pixels
+        # draw the layout image of every page while parsing, when disabled no .jpg is
+        # written and `render_layout_image` can draw a page on demand from its json
+        self.render_layout = render_layout
+        # where the pages go: per-page files, one record file per document or memory only
+        self.result_sink = make_result_sink(result_sink)
+        # content-addressed store of the Picture crops, the markdown then references
+        # them by path instead of inlining base64
+        self.image_store = ImageAssetStore(image_dir) if image_dir else None
+        # keep a page-level checkpoint of every pdf and skip the pages it already holds
+        self.resume = resume
+        # build the cells of born-digital pdf pages from their text layer, only
+        # scanned pages are sent to the model
+        self.native_text = native_text
+        # render oversized pdf pages at full dpi and parse them as overlapping tiles
+        # within max_pixels, instead of falling back to 72 dpi
+        self.tile_oversized = tile_oversized
+
+        # on-disk cache of model responses keyed by page pixels and request settings
+        self.cache = OCRResultCache(cache_dir, cache_max_bytes) if cache_dir else None
+
+        # priority class of the requests in the process-wide scheduler, e.g. interactive
+        # or bulk; None sends requests without scheduling
+        self.priority = priority
+        self.scheduler = get_scheduler() if priority else None
+
+        # AIMD window in front of the vllm server, num_thread becomes its upper bound
+        self.limiter = None
+        if adaptive_concurrency:
+            self.limiter = AdaptiveConcurrencyLimiter(
+                initial_limit=min(8, self.num_thread), max_limit=self.num_thread
+            )
 
         self.use_hf = use_hf
+        # pages generated together by the local model, 1 generates page by page
+        self.hf_batch_size = hf_batch_size
+        self.hf_model_path = hf_model_path
+        self.hf_attn_implementation = hf_attn_implementation
+        self.hf_device_map = hf_device_map
         if self.use_hf:
             self._load_hf_model()
-            print(f"use hf model, num_thread will be set to 1")
+            print(f"use hf model, num_thread will be set to {self.hf_batch_size}")
         else:
             print(f"use vllm model, num_thread will be set to {self.num_thread}")
+        # every model request of the parser waits for one of these, so tiles of
+        # oversized pages share the cap with the pages parsed next to them
+        self._request_slots = threading.BoundedSemaphore(self._max_inflight)
+        self._async_request_slots = weakref.WeakKeyDictionary()
+        self._tile_pool = None
+        self._tile_pool_lock = threading.Lock()
         assert self.min_pixels is None or self.min_pixels >= MIN_PIXELS
         assert self.max_pixels is None or self.max_pixels <= MAX_PIXELS
 
     def _load_hf_model(self):
-        import torch
-        from transformers import AutoModelForCausalLM, AutoProcessor, AutoTokenizer
-        from qwen_vl_utils import process_vision_info
-
-        model_path = "./weights/DotsOCR"
-        self.model = AutoModelForCausalLM.from_pretrained(
-            model_path,
-            attn_implementation="flash_attention_2",
-            torch_dtype=torch.bfloat16,
-            device_map="auto",
-            trust_remote_code=True,
+        from dots_ocr.hf_inference import load_hf_model, HFBatchGenerator
+
+        self.model, self.processor, self.process_vision_info = load_hf_model(
+            self.hf_model_path,
+            attn_implementation=self.hf_attn_implementation,
+            device_map=self.hf_device_map,
         )
-        self.processor = AutoProcessor.from_pretrained(
-            model_path, trust_remote_code=True, use_fast=True
+        self.hf_generator = HFBatchGenerator(
+            self.model,
+            self.processor,
+            self.process_vision_info,
+            batch_size=self.hf_batch_size,
         )
-        self.process_vision_info = process_vision_info
+
+    @property
+    def _max_inflight(self):
+        """Pages parsed at the same time, the hf model needs enough to fill a batch."""
+        return self.hf_batch_size if self.use_hf else self.num_thread
+
+    def _request_slots_async(self):
+        """The request cap of the running event loop."""
+        loop = asyncio.get_running_loop()
+        slots = self._async_request_slots.get(loop)
+        if slots is None:
+            slots = self._async_request_slots[loop] = asyncio.Semaphore(
+                self._max_inflight
+            )
+        return slots
+
+    def _tile_executor(self):
+        """The worker threads shared by the tiles of all pages."""
+        with self._tile_pool_lock:
+            if self._tile_pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+
+                self._tile_pool = ThreadPoolExecutor(
+                    self._max_inflight, thread_name_prefix="dots-ocr-tile"
+                )
+            return self._tile_pool
+
+    def _prefetch_slots(self, image, capacity):
+        """
+        Prefetch slots held by a rendered page, one per MAX_PIXELS it spans, so
+        that a window of oversized pages holds no more pixels than normal pages.
+        """
+        pixels = image.width * image.height
+        return max(1, min(capacity, math.ceil(pixels / MAX_PIXELS)))
 
     def _inference_with_hf(self, image, prompt):
-        messages = [
-            {
-                "role": "user",
-                "content": [
-                    {"type": "image", "image": image},
-                    {"type": "text", "text": prompt},
-                ],
-            }
-        ]
-
-        # Preparation for inference
-        text = self.processor.apply_chat_template(
-            messages, tokenize=False, add_generation_prompt=True
-        )
-        image_inputs, video_inputs = self.process_vision_info(messages)
-        inputs = self.processor(
-            text=[text],
-            images=image_inputs,
-            videos=video_inputs,
-            padding=True,
-            return_tensors="pt",
-        )
+        if self.hf_batch_size > 1:
+            return self.hf_generator.generate(image, prompt)
+        return self.hf_generator.generate_batch([image], [prompt])[0]
 
-        inputs = inputs.to("cuda")
-
-        # Inference: Generation of the output
-        generated_ids = self.model.generate(**inputs, max_new_tokens=24000)
-        generated_ids_trimmed = [
-            out_ids[len(in_ids) :]
-            for in_ids, out_ids in zip(inputs.input_ids, generated_ids)
-        ]
-        response = self.processor.batch_decode(
-            generated_ids_trimmed,
-            skip_special_tokens=True,
-            clean_up_tokenization_spaces=False,
-        )[0]
-        return response
+    def _scheduled(self, key):
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        return self.scheduler.slot(self.priority, key)
+
+    def _scheduled_async(self, key):
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        return self.scheduler.slot_async(self.priority, key)
+
+    def _inference_with_vllm(self, image, prompt, key=None):
+        # the scheduler decides which request goes next, the limiter how many the server takes
+        with self._scheduled(key):
+            if self.limiter is not None:
+                return self.limiter.run(self._request_vllm, image, prompt)
+            return self._request_vllm(image, prompt)
+
+    def _request_vllm(self, image, prompt):
+        from dots_ocr.inference import inference_with_vllm
 
-    def _inference_with_vllm(self, image, prompt):
         response = inference_with_vllm(
             image,
             prompt,
@@ -132,9 +219,60 @@ class DotsOCRParser:
             temperature=self.temperature,
             top_p=self.top_p,
             max_completion_tokens=self.max_completion_tokens,
+            image_format=self.image_format,
+            image_quality=self.image_quality,
         )
         return response
 
+    async def _inference_with_vllm_async(self, image, prompt, key=None):
+        async with self._scheduled_async(key):
+            if self.limiter is not None:
+                return await self.limiter.run_async(
+                    self._request_vllm_async, image, prompt
+                )
+            return await self._request_vllm_async(image, prompt)
+
+    async def _request_vllm_async(self, image, prompt):
+        from dots_ocr.inference import inference_with_vllm_async
+
+        response = await inference_with_vllm_async(
+            image,
+            prompt,
+            model_name=self.model_name,
+            protocol=self.protocol,
+            ip=self.ip,
+            port=self.port,
+            temperature=self.temperature,
+            top_p=self.top_p,
+            max_completion_tokens=self.max_completion_tokens,
+            image_format=self.image_format,
+            image_quality=self.image_quality,
+        )
+        return response
+
+    def close(self):
+        """
+        Shuts down the tile worker threads. A parser used again afterwards starts
+        a new pool on demand.
+        """
+        with self._tile_pool_lock:
+            tile_pool, self._tile_pool = self._tile_pool, None
+        if tile_pool is not None:
+            tile_pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    async def aclose(self):
+        """Closes the keep-alive clients of the running event loop and the tile workers."""
+        from dots_ocr.inference import close_async_vllm_clients
+
+        await close_async_vllm_clients()
+        await asyncio.to_thread(self.close)
+
     def get_prompt(
         self,
         prompt_mode,
@@ -146,6 +284,8 @@ class DotsOCRParser:
     ):
         prompt = dict_promptmode_to_prompt[prompt_mode]
         if prompt_mode == "prompt_grounding_ocr":
+            from dots_ocr.utils.layout_utils import pre_process_bboxes
+
             assert bbox is not None
             bboxes = [bbox]
             bbox = pre_process_bboxes(
@@ -159,15 +299,11 @@ class DotsOCRParser:
             prompt = prompt + str(bbox)
         return prompt
 
-    # def post_process_results(self, response, prompt_mode, save_dir, save_name, origin_image, image, min_pixels, max_pixels)
-    def _parse_single_image(
+    def _prepare_single_image(
         self,
         origin_image,
         prompt_mode,
-        save_dir,
-        save_name,
         source="image",
-        page_idx=0,
         bbox=None,
         fitz_preprocess=False,
     ):
@@ -181,13 +317,16 @@ class DotsOCRParser:
             assert max_pixels <= MAX_PIXELS, f"max_pixels should <= {MAX_PIXELS}"
 
         if source == "image" and fitz_preprocess:
-            image = get_image_by_fitz_doc(origin_image, target_dpi=self.dpi)
-            image = fetch_image(image, min_pixels=min_pixels, max_pixels=max_pixels)
+            image = get_image_by_fitz_doc(
+                origin_image,
+                target_dpi=self.dpi,
+                min_pixels=min_pixels,
+                max_pixels=max_pixels,
+            )
         else:
             image = fetch_image(
                 origin_image, min_pixels=min_pixels, max_pixels=max_pixels
             )
-        input_height, input_width = smart_resize(image.height, image.width)
         prompt = self.get_prompt(
             prompt_mode,
             bbox,
@@ -196,17 +335,266 @@ class DotsOCRParser:
             min_pixels=min_pixels,
             max_pixels=max_pixels,
         )
-        if self.use_hf:
-            response = self._inference_with_hf(image, prompt)
-        else:
-            response = self._inference_with_vllm(image, prompt)
-        result = {
+        return image, prompt, min_pixels, max_pixels
+
+    def _lookup_cache(
+        self, origin_image, prompt_mode, prompt, min_pixels, max_pixels, fitz_preprocess
+    ):
+        if self.cache is None:
+            return None, None
+        # the hf model generates greedily with its own token budget
+        cache_key = self.cache.make_key(
+            origin_image,
+            prompt_mode=prompt_mode,
+            prompt=prompt,
+            model_name="hf" if self.use_hf else self.model_name,
+            min_pixels=min_pixels,
+            max_pixels=max_pixels,
+            fitz_preprocess=fitz_preprocess,
+            image_format=None if self.use_hf else self.image_format,
+            image_quality=None if self.use_hf else self.image_quality,
+            temperature=None if self.use_hf else self.temperature,
+            top_p=None if self.use_hf else self.top_p,
+            max_completion_tokens=self.hf_generator.max_new_tokens
+            if self.use_hf
+            else self.max_completion_tokens,
+        )
+        return cache_key, self.cache.get(cache_key)
+
+    def _update_cache(self, cache_key, response):
+        if self.cache is not None:
+            self.cache.put(cache_key, response)
+
+    def _request_image(
+        self,
+        origin_image,
+        prompt_mode,
+        source="image",
+        bbox=None,
+        fitz_preprocess=False,
+        key=None,
+    ):
+        """
+        Returns (model input image, response, min_pixels, max_pixels), served from
+        the cache if possible. `key` names the document for the scheduler.
+        """
+        image, prompt, min_pixels, max_pixels = self._prepare_single_image(
+            origin_image,
+            prompt_mode,
+            source=source,
+            bbox=bbox,
+            fitz_preprocess=fitz_preprocess,
+        )
+        cache_key, response = self._lookup_cache(
+            origin_image, prompt_mode, prompt, min_pixels, max_pixels, fitz_preprocess
+        )
+        if response is None:
+            with self._request_slots:
+                if self.use_hf:
+                    response = self._inference_with_hf(image, prompt)
+                else:
+                    response = self._inference_with_vllm(image, prompt, key)
+            self._update_cache(cache_key, response)
+        return image, response, min_pixels, max_pixels
+
+    async def _request_image_async(
+        self,
+        origin_image,
+        prompt_mode,
+        source="image",
+        bbox=None,
+        fitz_preprocess=False,
+        key=None,
+    ):
+        image, prompt, min_pixels, max_pixels = await asyncio.to_thread(
+            self._prepare_single_image,
+            origin_image,
+            prompt_mode,
+            source=source,
+            bbox=bbox,
+            fitz_preprocess=fitz_preprocess,
+        )
+        cache_key, response = await asyncio.to_thread(
+            self._lookup_cache,
+            origin_image,
+            prompt_mode,
+            prompt,
+            min_pixels,
+            max_pixels,
+            fitz_preprocess,
+        )
+        if response is None:
+            async with self._request_slots_async():
+                if self.use_hf:
+                    response = await asyncio.to_thread(
+                        self._inference_with_hf, image, prompt
+                    )
+                else:
+                    response = await self._inference_with_vllm_async(
+                        image, prompt, key
+                    )
+            await asyncio.to_thread(self._update_cache, cache_key, response)
+        return image, response, min_pixels, max_pixels
+
+    def _should_tile(self, origin_image, prompt_mode):
+        return (
+            self.tile_oversized
+            and prompt_mode in ("prompt_layout_all_en", "prompt_layout_only_en")
+            and origin_image.width * origin_image.height > (self.max_pixels or MAX_PIXELS)
+        )
+
+    def _split_tiles(self, origin_image):
+        """Returns the tile boxes of an oversized page and their crops."""
+        from dots_ocr.utils.tiling import plan_tiles
+
+        tiles = plan_tiles(
+            origin_image.width, origin_image.height, self.max_pixels or MAX_PIXELS
+        )
+        return tiles, [origin_image.crop(tile) for tile in tiles]
+
+    def _parse_single_image(
+        self,
+        origin_image,
+        prompt_mode,
+        save_dir,
+        save_name,
+        source="image",
+        page_idx=0,
+        bbox=None,
+        fitz_preprocess=False,
+        native_cells=None,
+    ):
+        if source == "pdf":
+            save_name = f"{save_name}_page_{page_idx}"
+        if native_cells is not None:
+            return self.post_process_native(
+                native_cells, prompt_mode, save_dir, save_name, origin_image, page_idx
+            )
+        if self._should_tile(origin_image, prompt_mode):
+            tiles, tile_images = self._split_tiles(origin_image)
+            requests = list(
+                self._tile_executor().map(
+                    lambda tile_image: self._request_image(
+                        tile_image, prompt_mode, key=save_dir
+                    ),
+                    tile_images,
+                )
+            )
+            return self.post_process_tiles(
+                tiles,
+                tile_images,
+                requests,
+                prompt_mode,
+                save_dir,
+                save_name,
+                origin_image,
+                page_idx=page_idx,
+            )
+        image, response, min_pixels, max_pixels = self._request_image(
+            origin_image,
+            prompt_mode,
+            source=source,
+            bbox=bbox,
+            fitz_preprocess=fitz_preprocess,
+            key=save_dir,
+        )
+        return self.post_process_results(
+            response,
+            prompt_mode,
+            save_dir,
+            save_name,
+            origin_image,
+            image,
+            min_pixels,
+            max_pixels,
+            page_idx=page_idx,
+        )
+
+    async def _parse_single_image_async(
+        self,
+        origin_image,
+        prompt_mode,
+        save_dir,
+        save_name,
+        source="image",
+        page_idx=0,
+        bbox=None,
+        fitz_preprocess=False,
+        native_cells=None,
+    ):
+        if source == "pdf":
+            save_name = f"{save_name}_page_{page_idx}"
+        # image preprocessing and result writing are CPU/disk bound, keep them off the event loop
+        if native_cells is not None:
+            return await asyncio.to_thread(
+                self.post_process_native,
+                native_cells,
+                prompt_mode,
+                save_dir,
+                save_name,
+                origin_image,
+                page_idx,
+            )
+        if self._should_tile(origin_image, prompt_mode):
+            tiles, tile_images = self._split_tiles(origin_image)
+            requests = await asyncio.gather(
+                *[
+                    self._request_image_async(tile_image, prompt_mode, key=save_dir)
+                    for tile_image in tile_images
+                ]
+            )
+            return await asyncio.to_thread(
+                self.post_process_tiles,
+                tiles,
+                tile_images,
+                requests,
+                prompt_mode,
+                save_dir,
+                save_name,
+                origin_image,
+                page_idx=page_idx,
+            )
+        image, response, min_pixels, max_pixels = await self._request_image_async(
+            origin_image,
+            prompt_mode,
+            source=source,
+            bbox=bbox,
+            fitz_preprocess=fitz_preprocess,
+            key=save_dir,
+        )
+        return await asyncio.to_thread(
+            self.post_process_results,
+            response,
+            prompt_mode,
+            save_dir,
+            save_name,
+            origin_image,
+            image,
+            min_pixels,
+            max_pixels,
+            page_idx=page_idx,
+        )
+
+    def post_process_results(
+        self,
+        response,
+        prompt_mode,
+        save_dir,
+        save_name,
+        origin_image,
+        image,
+        min_pixels,
+        max_pixels,
+        page_idx=0,
+    ):
+        from dots_ocr.utils.layout_utils import post_process_output
+
+        input_height, input_width = smart_resize(image.height, image.width)
+        page = {
             "page_no": page_idx,
             "input_height": input_height,
             "input_width": input_width,
         }
-        if source == "pdf":
-            save_name = f"{save_name}_page_{page_idx}"
         if prompt_mode in [
             "prompt_layout_all_en",
             "prompt_layout_only_en",
@@ -223,82 +611,117 @@ class DotsOCRParser:
             if (
                 filtered and prompt_mode != "prompt_layout_only_en"
             ):  # model output json failed, use filtered process
-                json_file_path = os.path.join(save_dir, f"{save_name}.json")
-                with open(json_file_path, "w", encoding="utf-8") as w:
-                    json.dump(response, w, ensure_ascii=False)
-
-                image_layout_path = os.path.join(save_dir, f"{save_name}.jpg")
-                origin_image.save(image_layout_path)
-                result.update(
-                    {
-                        "layout_info_path": json_file_path,
-                        "layout_image_path": image_layout_path,
-                    }
-                )
-
-                md_file_path = os.path.join(save_dir, f"{save_name}.md")
-                with open(md_file_path, "w", encoding="utf-8") as md_file:
-                    md_file.write(cells)
-                result.update({"md_content_path": md_file_path})
-                result.update({"filtered": True})
+                page["layout_info"] = response
+                if self.render_layout:
+                    page["layout_image"] = origin_image
+                page["md_content"] = cells
+                page["filtered"] = True
             else:
-                try:
-                    image_with_layout = draw_layout_on_image(origin_image, cells)
-                except Exception as e:
-                    print(f"Error drawing layout on image: {e}")
-                    image_with_layout = origin_image
-
-                json_file_path = os.path.join(save_dir, f"{save_name}.json")
-                with open(json_file_path, "w", encoding="utf-8") as w:
-                    json.dump(cells, w, ensure_ascii=False)
-
-                image_layout_path = os.path.join(save_dir, f"{save_name}.jpg")
-                image_with_layout.save(image_layout_path)
-                result.update(
-                    {
-                        "layout_info_path": json_file_path,
-                        "layout_image_path": image_layout_path,
-                    }
-                )
-                if (
-                    prompt_mode != "prompt_layout_only_en"
-                ):  # no text md when detection only
-                    md_content = layoutjson2md(origin_image, cells, text_key="text")
-                    md_content_no_hf = layoutjson2md(
-                        origin_image, cells, text_key="text", no_page_hf=True
-                    )  # used for clean output or metric of omnidocbench、olmbench
-                    md_file_path = os.path.join(save_dir, f"{save_name}.md")
-                    with open(md_file_path, "w", encoding="utf-8") as md_file:
-                        md_file.write(md_content)
-                    md_nohf_file_path = os.path.join(save_dir, f"{save_name}_nohf.md")
-                    with open(md_nohf_file_path, "w", encoding="utf-8") as md_file:
-                        md_file.write(md_content_no_hf)
-                    result.update(
-                        {
-                            "md_content_path": md_file_path,
-                            "md_content_nohf_path": md_nohf_file_path,
-                        }
-                    )
+                self._fill_layout_page(page, prompt_mode, origin_image, cells)
         else:
-            image_layout_path = os.path.join(save_dir, f"{save_name}.jpg")
-            origin_image.save(image_layout_path)
-            result.update(
-                {
-                    "layout_image_path": image_layout_path,
-                }
+            if self.render_layout:
+                page["layout_image"] = origin_image
+            page["md_content"] = response
+
+        return self.result_sink.write_page(save_dir, save_name, page)
+
+    def post_process_tiles(
+        self,
+        tiles,
+        tile_images,
+        requests,
+        prompt_mode,
+        save_dir,
+        save_name,
+        origin_image,
+        page_idx=0,
+    ):
+        """Merges the responses of the tiles of an oversized page into one page."""
+        from dots_ocr.utils.layout_utils import post_process_output
+        from dots_ocr.utils.tiling import merge_tile_cells
+
+        tile_cells = []
+        for tile_image, (image, response, min_pixels, max_pixels) in zip(
+            tile_images, requests
+        ):
+            cells, filtered = post_process_output(
+                response,
+                prompt_mode,
+                tile_image,
+                image,
+                min_pixels=min_pixels,
+                max_pixels=max_pixels,
             )
+            if filtered:
+                # keep the text recovered from a broken tile as one cell over the tile
+                if prompt_mode == "prompt_layout_only_en" or not cells:
+                    cells = []
+                else:
+                    cells = [
+                        {
+                            "bbox": [0, 0, tile_image.width, tile_image.height],
+                            "category": "Text",
+                            "text": cells,
+                        }
+                    ]
+            tile_cells.append(cells)
+        # every tile is sent at about the same size, report the first one
+        input_height, input_width = smart_resize(requests[0][0].height, requests[0][0].width)
+        page = {
+            "page_no": page_idx,
+            "input_height": input_height,
+            "input_width": input_width,
+            "tiles": len(tiles),
+        }
+        self._fill_layout_page(
+            page, prompt_mode, origin_image, merge_tile_cells(tiles, tile_cells)
+        )
+        return self.result_sink.write_page(save_dir, save_name, page)
 
-            md_content = response
-            md_file_path = os.path.join(save_dir, f"{save_name}.md")
-            with open(md_file_path, "w", encoding="utf-8") as md_file:
-                md_file.write(md_content)
-            result.update(
-                {
-                    "md_content_path": md_file_path,
-                }
+    def _fill_layout_page(self, page, prompt_mode, origin_image, cells):
+        from dots_ocr.utils.layout_utils import draw_layout_on_image
+        from dots_ocr.utils.format_transformer import layoutjson2md_with_nohf
+
+        page["layout_info"] = cells
+        if self.render_layout:
+            try:
+                page["layout_image"] = draw_layout_on_image(origin_image, cells)
+            except Exception as e:
+                print(f"Error drawing layout on image: {e}")
+                page["layout_image"] = origin_image
+        if prompt_mode != "prompt_layout_only_en":  # no text md when detection only
+            # the nohf variant is used for clean output or metric of omnidocbench、olmbench
+            page["md_content"], page["md_content_nohf"] = layoutjson2md_with_nohf(
+                origin_image,
+                cells,
+                text_key="text",
+                image_writer=self.image_store.put if self.image_store else None,
             )
 
-        return result
+    def post_process_native(
+        self, cells, prompt_mode, save_dir, save_name, origin_image, page_idx=0
+    ):
+        """Writes a page whose cells were built from the pdf text layer instead of the model."""
+        # the size the page would have been sent to the model with
+        image_height, image_width = smart_resize(
+            origin_image.height,
+            origin_image.width,
+            min_pixels=self.min_pixels or MIN_PIXELS,
+            max_pixels=self.max_pixels or MAX_PIXELS,
+        )
+        input_height, input_width = smart_resize(image_height, image_width)
+        if prompt_mode == "prompt_layout_only_en":
+            cells = [
+                {k: v for k, v in cell.items() if k != "text"} for cell in cells
+            ]
+        page = {
+            "page_no": page_idx,
+            "input_height": input_height,
+            "input_width": input_width,
+            "native_text": True,
+        }
+        self._fill_layout_page(page, prompt_mode, origin_image, cells)
+        return self.result_sink.write_page(save_dir, save_name, page)
 
     def parse_image(
         self,
@@ -322,43 +745,277 @@ class DotsOCRParser:
         result["file_path"] = input_path
         return [result]
 
+    async def parse_image_async(
+        self,
+        input_path,
+        filename,
+        prompt_mode,
+        save_dir,
+        bbox=None,
+        fitz_preprocess=False,
+    ):
+        origin_image = await asyncio.to_thread(fetch_image, input_path)
+        result = await self._parse_single_image_async(
+            origin_image,
+            prompt_mode,
+            save_dir,
+            filename,
+            source="image",
+            bbox=bbox,
+            fitz_preprocess=fitz_preprocess,
+        )
+        result["file_path"] = input_path
+        return [result]
+
+    def _checkpoint_config(self, prompt_mode):
+        """the settings that change the output of a page, a checkpoint is only reused if they match"""
+        return {
+            "prompt_mode": prompt_mode,
+            "dpi": self.dpi,
+            "model_name": "hf" if self.use_hf else self.model_name,
+            "min_pixels": self.min_pixels,
+            "max_pixels": self.max_pixels,
+            "image_format": self.image_format,
+            "image_quality": self.image_quality,
+            "render_layout": self.render_layout,
+            "result_sink": type(self.result_sink).__name__,
+            "image_dir": self.image_store.store_dir if self.image_store else None,
+            "native_text": self.native_text,
+            "tile_oversized": self.tile_oversized,
+        }
+
+    def open_checkpoint(self, input_path, filename, prompt_mode, save_dir):
+        """returns the checkpoint of a pdf and the results of its finished pages, (None, {}) without resume"""
+        if not self.resume:
+            return None, {}
+        checkpoint = PageCheckpoint(
+            save_dir, filename, input_path, self._checkpoint_config(prompt_mode)
+        )
+        return checkpoint, checkpoint.load()
+
+    def begin_pdf_document(self, input_path, filename, prompt_mode, save_dir):
+        """
+        Opens the checkpoint, then the result sink of a pdf. The sink only keeps
+        the output of an earlier run if the checkpoint restored pages from it, a
+        checkpoint rejected for a changed input or config starts it afresh.
+        """
+        checkpoint, completed = self.open_checkpoint(
+            input_path, filename, prompt_mode, save_dir
+        )
+        try:
+            # save_dir is <output_dir>/<filename>, see _prepare_save_dir
+            self.result_sink.begin_document(
+                os.path.dirname(save_dir), filename, save_dir, restored=completed.values()
+            )
+        except Exception:
+            if checkpoint is not None:
+                checkpoint.close()
+            raise
+        return checkpoint, completed
+
+    def iter_pdf_pages(
+        self, input_path, prompt_mode, skip_page_ids=None, max_pages_in_flight=None
+    ):
+        """
+        Renders the pages of a pdf for parsing. With render_workers the process
+        pool renders at most `max_pages_in_flight` pages ahead, pass the prefetch
+        window of the caller.
+
+        Yields:
+            tuple: (page index, PIL.Image, cells built from the text layer or None
+                if the page goes to the model), in page order.
+        """
+        from dots_ocr.utils.doc_utils import iter_images_from_pdf
+        from dots_ocr.utils.native_text import NativeTextExtractor, NATIVE_TEXT_PROMPTS
+
+        max_render_pixels = None
+        if self.tile_oversized:
+            from dots_ocr.utils.tiling import TILED_RENDER_MAX_PIXELS
+
+            max_render_pixels = TILED_RENDER_MAX_PIXELS
+        pages = iter_images_from_pdf(
+            input_path,
+            dpi=self.dpi,
+            num_workers=self.render_workers,
+            skip_page_ids=skip_page_ids,
+            max_render_pixels=max_render_pixels,
+            max_pages_in_flight=max_pages_in_flight,
+        )
+        try:
+            if not self.native_text or prompt_mode not in NATIVE_TEXT_PROMPTS:
+                for i, image in pages:
+                    yield i, image, None
+                return
+            with NativeTextExtractor(input_path) as extractor:
+                for i, image in pages:
+                    yield i, image, extractor.extract(i, image)
+                print(f"native text: {extractor.stats()}")
+        finally:
+            pages.close()
+
     def parse_pdf(self, input_path, filename, prompt_mode, save_dir):
+        from multiprocessing.pool import ThreadPool
+        from tqdm import tqdm
+        from dots_ocr.utils.doc_utils import get_pdf_page_count
+
         print(f"loading pdf: {input_path}")
-        images_origin = load_images_from_pdf(input_path, dpi=self.dpi)
-        total_pages = len(images_origin)
-        tasks = [
-            {
-                "origin_image": image,
-                "prompt_mode": prompt_mode,
-                "save_dir": save_dir,
-                "save_name": filename,
-                "source": "pdf",
-                "page_idx": i,
-            }
-            for i, image in enumerate(images_origin)
-        ]
-
-        def _execute_task(task_args):
-            return self._parse_single_image(**task_args)
+        total_pages = get_pdf_page_count(input_path)
+        checkpoint, completed = self.begin_pdf_document(
+            input_path, filename, prompt_mode, save_dir
+        )
 
-        if self.use_hf:
-            num_thread = 1
-        else:
-            num_thread = min(total_pages, self.num_thread)
+        num_thread = min(total_pages, self._max_inflight)
         print(f"Parsing PDF with {total_pages} pages using {num_thread} threads...")
 
-        results = []
-        with ThreadPool(num_thread) as pool:
-            with tqdm(total=total_pages, desc="Processing PDF pages") as pbar:
-                for result in pool.imap_unordered(_execute_task, tasks):
-                    results.append(result)
-                    pbar.update(1)
+        # ThreadPool.imap_unordered drains its input eagerly, so rendering is
+        # throttled here: the next page is only rasterized once the pages before
+        # it got their slots, a large page takes as many slots as its pixels.
+        capacity = num_thread * self.prefetch_factor
+        page_slots = threading.BoundedSemaphore(capacity)
+
+        def _iter_tasks():
+            for i, image, native_cells in self.iter_pdf_pages(
+                input_path,
+                prompt_mode,
+                skip_page_ids=completed,
+                max_pages_in_flight=capacity,
+            ):
+                slots = self._prefetch_slots(image, capacity)
+                for _ in range(slots):
+                    page_slots.acquire()
+                yield slots, {
+                    "origin_image": image,
+                    "prompt_mode": prompt_mode,
+                    "save_dir": save_dir,
+                    "save_name": filename,
+                    "source": "pdf",
+                    "page_idx": i,
+                    "native_cells": native_cells,
+                }
+
+        def _execute_task(task):
+            slots, task_args = task
+            try:
+                result = self._parse_single_image(**task_args)
+                if checkpoint is not None:
+                    checkpoint.record(result)
+                return result
+            finally:
+                page_slots.release(slots)
+
+        results = list(completed.values())
+        try:
+            with ThreadPool(num_thread) as pool:
+                with tqdm(
+                    total=total_pages, initial=len(completed), desc="Processing PDF pages"
+                ) as pbar:
+                    for result in pool.imap_unordered(_execute_task, _iter_tasks()):
+                        results.append(result)
+                        if self.limiter is not None:
+                            pbar.set_postfix(window=self.limiter.window, refresh=False)
+                        pbar.update(1)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+        if self.limiter is not None:
+            print(f"adaptive concurrency: {self.limiter.stats()}")
+        if self.use_hf and self.hf_batch_size > 1:
+            print(f"hf batches: {self.hf_generator.stats()}")
+
+        results.sort(key=lambda x: x["page_no"])
+        for i in range(len(results)):
+            results[i]["file_path"] = input_path
+        return results
+
+    async def parse_pdf_async(self, input_path, filename, prompt_mode, save_dir):
+        from tqdm import tqdm
+        from dots_ocr.utils.doc_utils import get_pdf_page_count
+
+        print(f"loading pdf: {input_path}")
+        total_pages = await asyncio.to_thread(get_pdf_page_count, input_path)
+        checkpoint, completed = await asyncio.to_thread(
+            self.begin_pdf_document, input_path, filename, prompt_mode, save_dir
+        )
+
+        num_requests = self._max_inflight
+        print(
+            f"Parsing PDF with {total_pages} pages using {num_requests} concurrent requests..."
+        )
+
+        # a page is only rendered once a page slot is free, which bounds the
+        # rendered pages held in memory; a large page takes as many slots as its
+        # pixels, the requests themselves are capped per parser
+        capacity = num_requests * self.prefetch_factor
+        page_slots = asyncio.Semaphore(capacity)
+        pages = self.iter_pdf_pages(
+            input_path,
+            prompt_mode,
+            skip_page_ids=completed,
+            max_pages_in_flight=capacity,
+        )
+
+        async def _execute_task(task_args, slots):
+            try:
+                result = await self._parse_single_image_async(**task_args)
+                if checkpoint is not None:
+                    await asyncio.to_thread(checkpoint.record, result)
+                return result
+            finally:
+                for _ in range(slots):
+                    page_slots.release()
+
+        tasks = []
+        try:
+            with tqdm(
+                total=total_pages, initial=len(completed), desc="Processing PDF pages"
+            ) as pbar:
+                while True:
+                    await page_slots.acquire()
+                    page = await asyncio.to_thread(next, pages, None)
+                    if page is None:
+                        page_slots.release()
+                        break
+                    i, image, native_cells = page
+                    slots = self._prefetch_slots(image, capacity)
+                    for _ in range(slots - 1):
+                        await page_slots.acquire()
+                    task = asyncio.create_task(
+                        _execute_task(
+                            {
+                                "origin_image": image,
+                                "prompt_mode": prompt_mode,
+                                "save_dir": save_dir,
+                                "save_name": filename,
+                                "source": "pdf",
+                                "page_idx": i,
+                                "native_cells": native_cells,
+                            },
+                            slots,
+                        )
+                    )
+                    task.add_done_callback(lambda _: pbar.update(1))
+                    tasks.append(task)
+                results = list(completed.values()) + await asyncio.gather(*tasks)
+        finally:
+            pages.close()
+            if checkpoint is not None:
+                checkpoint.close()
+        if self.limiter is not None:
+            print(f"adaptive concurrency: {self.limiter.stats()}")
 
         results.sort(key=lambda x: x["page_no"])
         for i in range(len(results)):
             results[i]["file_path"] = input_path
         return results
 
+    def _prepare_save_dir(self, input_path, output_dir=""):
+        output_dir = output_dir or self.output_dir
+        output_dir = os.path.abspath(output_dir)
+        filename, file_ext = os.path.splitext(os.path.basename(input_path))
+        save_dir = os.path.join(output_dir, filename)
+        os.makedirs(save_dir, exist_ok=True)
+        return output_dir, filename, file_ext, save_dir
+
     def parse_file(
         self,
         input_path,
@@ -367,11 +1024,12 @@ class DotsOCRParser:
         bbox=None,
         fitz_preprocess=False,
     ):
-        output_dir = output_dir or self.output_dir
-        output_dir = os.path.abspath(output_dir)
-        filename, file_ext = os.path.splitext(os.path.basename(input_path))
-        save_dir = os.path.join(output_dir, filename)
-        os.makedirs(save_dir, exist_ok=True)
+        output_dir, filename, file_ext, save_dir = self._prepare_save_dir(
+            input_path, output_dir
+        )
+        if file_ext in image_extensions:
+            # a pdf begins its document once the checkpoint is open
+            self.result_sink.begin_document(output_dir, filename, save_dir)
 
         if file_ext == ".pdf":
             results = self.parse_pdf(input_path, filename, prompt_mode, save_dir)
@@ -390,25 +1048,56 @@ class DotsOCRParser:
             )
 
         print(f"Parsing finished, results saving to {save_dir}")
-        with open(
-            os.path.join(output_dir, os.path.basename(filename) + ".jsonl"),
-            "w",
-            encoding="utf-8",
-        ) as w:
-            for result in results:
-                w.write(json.dumps(result, ensure_ascii=False) + "\n")
-
+        if self.cache is not None:
+            print(f"OCR cache: {self.cache.stats()}")
+        self.result_sink.end_document(output_dir, filename, save_dir, results)
         return results
 
+    async def parse_file_async(
+        self,
+        input_path,
+        output_dir="",
+        prompt_mode="prompt_layout_all_en",
+        bbox=None,
+        fitz_preprocess=False,
+    ):
+        """asyncio counterpart of `parse_file`, sharing one keep-alive client per server"""
+        output_dir, filename, file_ext, save_dir = self._prepare_save_dir(
+            input_path, output_dir
+        )
+        if file_ext in image_extensions:
+            # a pdf begins its document once the checkpoint is open
+            self.result_sink.begin_document(output_dir, filename, save_dir)
 
-def main():
-    prompts = list(dict_promptmode_to_prompt.keys())
-    parser = argparse.ArgumentParser(
-        description="dots.ocr Multilingual Document Layout Parser",
-    )
+        if file_ext == ".pdf":
+            results = await self.parse_pdf_async(
+                input_path, filename, prompt_mode, save_dir
+            )
+        elif file_ext in image_extensions:
+            results = await self.parse_image_async(
+                input_path,
+                filename,
+                prompt_mode,
+                save_dir,
+                bbox=bbox,
+                fitz_preprocess=fitz_preprocess,
+            )
+        else:
+            raise ValueError(
+                f"file extension {file_ext} not supported, supported extensions are {image_extensions} and pdf"
+            )
+
+        print(f"Parsing finished, results saving to {save_dir}")
+        if self.cache is not None:
+            print(f"OCR cache: {self.cache.stats()}")
+        await asyncio.to_thread(
+            self.result_sink.end_document, output_dir, filename, save_dir, results
+        )
+        return results
 
-    parser.add_argument("input_path", type=str, help="Input PDF/image file path")
 
+def add_parser_args(parser):
+    """the options of DotsOCRParser, shared by the single file and the batch command line"""
     parser.add_argument(
         "--output",
         type=str,
@@ -418,18 +1107,11 @@ def main():
 
     parser.add_argument(
         "--prompt",
-        choices=prompts,
+        choices=list(dict_promptmode_to_prompt.keys()),
         type=str,
         default="prompt_layout_all_en",
         help="prompt to query the model, different prompts for different tasks",
     )
-    parser.add_argument(
-        "--bbox",
-        type=int,
-        nargs=4,
-        metavar=("x1", "y1", "x2", "y2"),
-        help="should give this argument if you want to prompt_grounding_ocr",
-    )
     parser.add_argument(
         "--protocol", type=str, choices=["http", "https"], default="http", help=""
     )
@@ -442,16 +1124,112 @@ def main():
     parser.add_argument("--max_completion_tokens", type=int, default=16384, help="")
     parser.add_argument("--num_thread", type=int, default=16, help="")
     parser.add_argument(
-        "--no_fitz_preprocess",
-        action="store_true",
-        help="False will use tikz dpi upsample pipeline, good for images which has been render with low dpi, but maybe result in higher computational costs",
+        "--render_workers",
+        type=int,
+        default=0,
+        help="processes used to rasterize pdf pages, 0 renders them in the main process",
     )
     parser.add_argument("--min_pixels", type=int, default=None, help="")
     parser.add_argument("--max_pixels", type=int, default=None, help="")
     parser.add_argument("--use_hf", type=bool, default=False, help="")
-    args = parser.parse_args()
+    parser.add_argument(
+        "--hf_batch_size",
+        type=int,
+        default=1,
+        help="pages generated together by the local hf model, grouped by image size",
+    )
+    parser.add_argument(
+        "--hf_model_path",
+        type=str,
+        default="./weights/DotsOCR",
+        help="checkpoint of the local hf model, a tiny model with the same processor can stand in for tests",
+    )
+    parser.add_argument(
+        "--hf_attn_implementation",
+        type=str,
+        default="flash_attention_2",
+        help="attention implementation of the hf model, e.g. sdpa or eager without flash-attn",
+    )
+    parser.add_argument(
+        "--hf_device_map",
+        type=str,
+        default="auto",
+        help="device map of the hf model, e.g. cpu",
+    )
+    parser.add_argument(
+        "--image_format",
+        type=str,
+        choices=["PNG", "JPEG", "WEBP"],
+        default="PNG",
+        help="encoding of the page images sent to the vllm server",
+    )
+    parser.add_argument(
+        "--image_quality",
+        type=int,
+        default=None,
+        help="quality of JPEG/WEBP page images",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=None,
+        help="directory of the page-level OCR result cache, disabled when not set",
+    )
+    parser.add_argument(
+        "--cache_max_bytes",
+        type=int,
+        default=2 * 1024**3,
+        help="size limit of the OCR result cache, least recently used entries are evicted first",
+    )
+    parser.add_argument(
+        "--adaptive_concurrency",
+        action="store_true",
+        help="adapt the number of concurrent requests to the server latency and errors, num_thread is the upper bound",
+    )
+    parser.add_argument(
+        "--no_render_layout",
+        action="store_true",
+        help="skip drawing the layout image of every page, use render_layout_image to draw a page on demand",
+    )
+    parser.add_argument(
+        "--result_sink",
+        type=str,
+        default="directory",
+        choices=["directory", "records"],
+        help="write per-page files, or append all pages of a document to one records file",
+    )
+    parser.add_argument(
+        "--native_text",
+        action="store_true",
+        help="build the layout of born-digital pdf pages from their text layer, only scanned pages go to the model",
+    )
+    parser.add_argument(
+        "--tile_oversized",
+        action="store_true",
+        help="parse oversized pages as overlapping tiles within max_pixels at full dpi, instead of falling back to 72 dpi",
+    )
+    parser.add_argument(
+        "--priority",
+        type=str,
+        choices=DEFAULT_PRIORITY_CLASSES,
+        default=None,
+        help="priority class of the requests in the process-wide scheduler, interactive requests go before bulk ones, also of other processes on this host (default: no scheduling)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="checkpoint every parsed page of a pdf and only parse the missing pages when rerun",
+    )
+    parser.add_argument(
+        "--image_dir",
+        type=str,
+        default=None,
+        help="store the Picture crops in this directory and reference them by path in the markdown, inlined as base64 when not set",
+    )
+
 
-    dots_ocr_parser = DotsOCRParser(
+def parser_from_args(args):
+    return DotsOCRParser(
         protocol=args.protocol,
         ip=args.ip,
         port=args.port,
@@ -460,24 +1238,86 @@ def main():
         top_p=args.top_p,
         max_completion_tokens=args.max_completion_tokens,
         num_thread=args.num_thread,
+        render_workers=args.render_workers,
         dpi=args.dpi,
         output_dir=args.output,
         min_pixels=args.min_pixels,
         max_pixels=args.max_pixels,
         use_hf=args.use_hf,
+        hf_batch_size=args.hf_batch_size,
+        hf_model_path=args.hf_model_path,
+        hf_attn_implementation=args.hf_attn_implementation,
+        hf_device_map=args.hf_device_map,
+        cache_dir=args.cache_dir,
+        cache_max_bytes=args.cache_max_bytes,
+        adaptive_concurrency=args.adaptive_concurrency,
+        image_format=args.image_format,
+        image_quality=args.image_quality,
+        render_layout=not args.no_render_layout,
+        result_sink=args.result_sink,
+        image_dir=args.image_dir,
+        resume=args.resume,
+        native_text=args.native_text,
+        tile_oversized=args.tile_oversized,
+        priority=args.priority,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="dots.ocr Multilingual Document Layout Parser",
     )
 
+    parser.add_argument("input_path", type=str, help="Input PDF/image file path")
+    parser.add_argument(
+        "--bbox",
+        type=int,
+        nargs=4,
+        metavar=("x1", "y1", "x2", "y2"),
+        help="should give this argument if you want to prompt_grounding_ocr",
+    )
+    parser.add_argument(
+        "--no_fitz_preprocess",
+        action="store_true",
+        help="False will use tikz dpi upsample pipeline, good for images which has been render with low dpi, but maybe result in higher computational costs",
+    )
+    parser.add_argument(
+        "--use_async",
+        action="store_true",
+        help="drive the vllm server from an asyncio event loop with a shared keep-alive client",
+    )
+    add_parser_args(parser)
+    args = parser.parse_args()
+
+    dots_ocr_parser = parser_from_args(args)
+
     fitz_preprocess = not args.no_fitz_preprocess
     if fitz_preprocess:
         print(
             f"Using fitz preprocess for image input, check the change of the image pixels"
         )
-    result = dots_ocr_parser.parse_file(
-        args.input_path,
-        prompt_mode=args.prompt,
-        bbox=args.bbox,
-        fitz_preprocess=fitz_preprocess,
-    )
+    if args.use_async:
+
+        async def _parse_async():
+            try:
+                return await dots_ocr_parser.parse_file_async(
+                    args.input_path,
+                    prompt_mode=args.prompt,
+                    bbox=args.bbox,
+                    fitz_preprocess=fitz_preprocess,
+                )
+            finally:
+                await dots_ocr_parser.aclose()
+
+        result = asyncio.run(_parse_async())
+    else:
+        with dots_ocr_parser:
+            result = dots_ocr_parser.parse_file(
+                args.input_path,
+                prompt_mode=args.prompt,
+                bbox=args.bbox,
+                fitz_preprocess=fitz_preprocess,
+            )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,199 @@
+import queue
+import threading
+import time
+
+
+def load_hf_model(
+    model_path="./weights/DotsOCR",
+    attn_implementation="flash_attention_2",
+    device_map="auto",
+):
+    """
+    Loads the dots.ocr checkpoint, or any small model with the same processor
+    interface, e.g. to test the batched path on CPU with `attn_implementation="sdpa"`
+    and `device_map="cpu"`.
+
+    Returns:
+        tuple: (model, processor, process_vision_info)
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, AutoProcessor
+    from qwen_vl_utils import process_vision_info
+
+    model = AutoModelForCausalLM.from_pretrained(
+        model_path,
+        attn_implementation=attn_implementation,
+        torch_dtype=torch.bfloat16 if torch.cuda.is_available() else torch.float32,
+        device_map=device_map,
+        trust_remote_code=True,
+    )
+    processor = AutoProcessor.from_pretrained(
+        model_path, trust_remote_code=True, use_fast=True
+    )
+    return model, processor, process_vision_info
+
+
+class _Request:
+    def __init__(self, image, prompt):
+        self.image = image
+        self.prompt = prompt
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+    @property
+    def pixels(self):
+        return self.image.width * self.image.height
+
+
+class HFBatchGenerator:
+    """
+    Runs the pages requested by many threads through batched `generate` calls.
+
+    `generate` is called from the parser threads like a request to the vllm
+    server. A worker thread collects up to `batch_size` pending pages, waiting at
+    most `max_wait` seconds for a batch to fill, splits them into groups of
+    similar image size (the largest at most `size_ratio` times the smallest
+    image) to limit padding, and generates each group with one left-padded
+    `generate` call. A group whose call fails is generated again page by page,
+    so that only the pages that fail on their own get the error.
+    """
+
+    def __init__(
+        self,
+        model,
+        processor,
+        process_vision_info,
+        batch_size=8,
+        max_wait=0.05,
+        size_ratio=1.5,
+        max_new_tokens=24000,
+    ):
+        self.model = model
+        self.processor = processor
+        self.process_vision_info = process_vision_info
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.size_ratio = size_ratio
+        self.max_new_tokens = max_new_tokens
+        # decoder-only generation continues from the end of every row
+        self.processor.tokenizer.padding_side = "left"
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self.batches = 0
+        self.pages = 0
+
+    def generate_batch(self, images, prompts):
+        """Generates the responses of several pages with one `generate` call."""
+        messages = [
+            [
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "image", "image": image},
+                        {"type": "text", "text": prompt},
+                    ],
+                }
+            ]
+            for image, prompt in zip(images, prompts)
+        ]
+        texts = [
+            self.processor.apply_chat_template(
+                message, tokenize=False, add_generation_prompt=True
+            )
+            for message in messages
+        ]
+        image_inputs, video_inputs = self.process_vision_info(messages)
+        inputs = self.processor(
+            text=texts,
+            images=image_inputs,
+            videos=video_inputs,
+            padding=True,
+            return_tensors="pt",
+        )
+        inputs = inputs.to(self.model.device)
+
+        generated_ids = self.model.generate(**inputs, max_new_tokens=self.max_new_tokens)
+        # left padding: every prompt ends at the same position
+        generated_ids_trimmed = generated_ids[:, inputs.input_ids.shape[1] :]
+        return self.processor.batch_decode(
+            generated_ids_trimmed,
+            skip_special_tokens=True,
+            clean_up_tokenization_spaces=False,
+        )
+
+    def generate(self, image, prompt):
+        """Blocks until the page was generated as part of a batch, thread safe."""
+        self._ensure_worker()
+        request = _Request(image, prompt)
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.response
+
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="hf-batch-generator", daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _group_by_size(self, batch):
+        batch = sorted(batch, key=lambda request: request.pixels)
+        groups = [[batch[0]]]
+        for request in batch[1:]:
+            if request.pixels > groups[-1][0].pixels * self.size_ratio:
+                groups.append([request])
+            else:
+                groups[-1].append(request)
+        return groups
+
+    def _generate_group(self, group):
+        try:
+            responses = self.generate_batch(
+                [request.image for request in group],
+                [request.prompt for request in group],
+            )
+            for request, response in zip(group, responses):
+                request.response = response
+        except Exception as e:
+            if len(group) == 1:
+                print(f"hf generation error: {e}")
+                group[0].error = e
+            else:
+                print(f"hf batch generation error: {e}, generating {len(group)} pages one by one")
+                for request in group:
+                    self._generate_group([request])
+                return
+        self.batches += 1
+        self.pages += len(group)
+
+    def _run(self):
+        while True:
+            for group in self._group_by_size(self._collect()):
+                self._generate_group(group)
+                for request in group:
+                    request.done.set()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "pages": self.pages,
+            "avg_batch_size": self.pages / self.batches if self.batches else 0.0,
+        }
@@ -1,23 +1,66 @@
-import requests
+import asyncio
+import atexit
+import threading
+import weakref
+
 from dots_ocr.utils.image_utils import PILimage_to_base64
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, APIError, APITimeoutError
 import os
 
 
-def inference_with_vllm(
-    image,
-    prompt,
-    protocol="http",
-    ip="localhost",
-    port=8000,
-    temperature=0.1,
-    top_p=0.9,
-    max_completion_tokens=32768,
-    model_name="rednote-hilab/dots.ocr",
-):
+# OpenAI clients keep an httpx connection pool, share one per server instead of one per page
+_clients = {}
+_clients_lock = threading.Lock()
+# httpx async clients are bound to the event loop they were first used in
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _get_server_addr(protocol, ip, port):
+    return f"{protocol}://{ip}:{port}/v1"
+
+
+def get_vllm_client(protocol="http", ip="localhost", port=8000):
+    addr = _get_server_addr(protocol, ip, port)
+    with _clients_lock:
+        client = _clients.get(addr)
+        if client is None:
+            client = OpenAI(
+                api_key="{}".format(os.environ.get("API_KEY", "0")), base_url=addr
+            )
+            _clients[addr] = client
+    return client
 
-    addr = f"{protocol}://{ip}:{port}/v1"
-    client = OpenAI(api_key="{}".format(os.environ.get("API_KEY", "0")), base_url=addr)
+
+@atexit.register
+def close_vllm_clients():
+    """Closes the shared sync clients and their connection pools."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+def get_async_vllm_client(protocol="http", ip="localhost", port=8000):
+    addr = _get_server_addr(protocol, ip, port)
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(addr)
+    if client is None:
+        client = AsyncOpenAI(
+            api_key="{}".format(os.environ.get("API_KEY", "0")), base_url=addr
+        )
+        clients[addr] = client
+    return client
+
+
+async def close_async_vllm_clients():
+    """Closes the async clients of the running event loop, call it before the loop ends."""
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
+
+
+def _build_messages(image, prompt, image_format="PNG", image_quality=None):
     messages = []
     messages.append(
         {
@@ -25,7 +68,11 @@ def inference_with_vllm(
             "content": [
                 {
                     "type": "image_url",
-                    "image_url": {"url": PILimage_to_base64(image)},
+                    "image_url": {
+                        "url": PILimage_to_base64(
+                            image, format=image_format, quality=image_quality
+                        )
+                    },
                 },
                 {
                     "type": "text",
@@ -34,6 +81,25 @@ def inference_with_vllm(
             ],
         }
     )
+    return messages
+
+
+def inference_with_vllm(
+    image,
+    prompt,
+    protocol="http",
+    ip="localhost",
+    port=8000,
+    temperature=0.1,
+    top_p=0.9,
+    max_completion_tokens=32768,
+    model_name="rednote-hilab/dots.ocr",
+    image_format="PNG",
+    image_quality=None,
+):
+
+    client = get_vllm_client(protocol, ip, port)
+    messages = _build_messages(image, prompt, image_format, image_quality)
     try:
         response = client.chat.completions.create(
             messages=messages,
@@ -44,6 +110,42 @@ def inference_with_vllm(
         )
         response = response.choices[0].message.content
         return response
-    except requests.exceptions.RequestException as e:
+    except (APIError, APITimeoutError) as e:
+        # connection errors and timeouts are APIErrors too, a failed page returns None
+        print(f"request error: {e}")
+        return None
+
+
+async def inference_with_vllm_async(
+    image,
+    prompt,
+    protocol="http",
+    ip="localhost",
+    port=8000,
+    temperature=0.1,
+    top_p=0.9,
+    max_completion_tokens=32768,
+    model_name="rednote-hilab/dots.ocr",
+    image_format="PNG",
+    image_quality=None,
+):
+
+    client = get_async_vllm_client(protocol, ip, port)
+    # base64 encoding a full page is CPU bound, keep it off the event loop
+    messages = await asyncio.to_thread(
+        _build_messages, image, prompt, image_format, image_quality
+    )
+    try:
+        response = await client.chat.completions.create(
+            messages=messages,
+            model=model_name,
+            max_completion_tokens=max_completion_tokens,
+            temperature=temperature,
+            top_p=top_p,
+        )
+        response = response.choices[0].message.content
+        return response
+    except (APIError, APITimeoutError) as e:
+        # same contract as inference_with_vllm
         print(f"request error: {e}")
         return None
@@ -1,3 +1,4 @@
+import asyncio
 from typing import Optional, Tuple
 from dots_ocr.dots_parser import DotsOCRParser
 from dots_ocr.utils import dict_promptmode_to_prompt
@@ -16,10 +17,27 @@ def do_parse(
     dpi: int = 200,
     max_completion_tokens: int = 16384,
     num_thread: int = 16,
+    render_workers: int = 0,
     no_fitz_preprocess: bool = False,
     min_pixels: Optional[int] = None,
     max_pixels: Optional[int] = None,
     use_hf: bool = False,
+    hf_batch_size: int = 1,
+    hf_model_path: str = "./weights/DotsOCR",
+    hf_attn_implementation: str = "flash_attention_2",
+    hf_device_map: str = "auto",
+    use_async: bool = False,
+    cache_dir: Optional[str] = None,
+    adaptive_concurrency: bool = False,
+    image_format: str = "PNG",
+    image_quality: Optional[int] = None,
+    render_layout: bool = True,
+    result_sink: str = "directory",
+    image_dir: Optional[str] = None,
+    resume: bool = False,
+    native_text: bool = False,
+    tile_oversized: bool = False,
+    priority: Optional[str] = None,
 ):
     """
     dots.ocr 多语言文档布局解析器
@@ -37,10 +55,27 @@ def do_parse(
         dpi (int): DPI设置 (默认: 200)
         max_completion_tokens (int): 最大完成标记数 (默认: 16384)
         num_thread (int): 线程数 (默认: 16)
+        render_workers (int): PDF页面渲染的进程数，0表示在主进程中渲染 (默认: 0)
         no_fitz_preprocess (bool): 是否禁用Fitz预处理 (默认: False)指的是选择是否使用PyMuPDF（fitz）库对图像输入进行特定的预处理操作
         min_pixels (Optional[int]): 最小像素数
         max_pixels (Optional[int]): 最大像素数
         use_hf (bool): 是否使用HuggingFace (默认: False)
+        hf_batch_size (int): HuggingFace本地模型一次generate批量生成的页数，按图片尺寸分组并左填充 (默认: 1)
+        hf_model_path (str): HuggingFace本地模型路径，CPU测试环境可换成同样处理器接口的小模型 (默认: ./weights/DotsOCR)
+        hf_attn_implementation (str): 注意力实现，没有flash-attn时可用sdpa或eager (默认: flash_attention_2)
+        hf_device_map (str): 模型加载的设备，例如cpu (默认: auto)
+        use_async (bool): 是否使用asyncio并复用同一个长连接客户端请求vLLM服务 (默认: False)
+        cache_dir (Optional[str]): OCR结果缓存目录，按页面图像哈希缓存模型输出，未变化的页面不再请求模型 (默认: 不缓存)
+        adaptive_concurrency (bool): 是否根据服务端延迟和错误率自适应调整并发请求数(AIMD)，num_thread为上限 (默认: False)
+        image_format (str): 发送给vLLM的页面图片编码格式 PNG/JPEG/WEBP (默认: PNG)
+        image_quality (Optional[int]): JPEG/WEBP的压缩质量
+        render_layout (bool): 解析时是否为每页绘制布局可视化图片(.jpg)，批量入库时可关闭，需要查看时用render_layout_image按需绘制 (默认: True)
+        result_sink (str): 解析结果的去向，directory为每页写json/jpg/md文件，records为每个文档追加写一个记录文件，memory为只保留在返回结果中不写文件 (默认: directory)
+        image_dir (Optional[str]): 图片区域的存储目录，按内容哈希命名只写一次，md中按路径引用而不是内嵌base64 (默认: 内嵌base64)
+        resume (bool): 是否按页保存检查点，重新解析同一份PDF时只处理缺失的页面 (默认: False)
+        native_text (bool): 是否对带文本层的PDF页面直接从文本层提取布局和文字，只有扫描页才请求模型 (默认: False)
+        tile_oversized (bool): 超大页面是否保持原dpi渲染，切分为不超过max_pixels的重叠分块并发识别后合并，而不是降到72dpi (默认: False)
+        priority (Optional[str]): 请求在进程内调度器中的优先级 interactive/bulk，interactive请求优先发送，bulk有并发上限 (默认: 不调度)
     """
     # 获取所有可用的提示模式
     prompts = list(dict_promptmode_to_prompt.keys())
@@ -58,11 +93,27 @@ def do_parse(
         top_p=top_p,
         max_completion_tokens=max_completion_tokens,
         num_thread=num_thread,
+        render_workers=render_workers,
         dpi=dpi,
         output_dir=output,
         min_pixels=min_pixels,
         max_pixels=max_pixels,
         use_hf=use_hf,
+        hf_batch_size=hf_batch_size,
+        hf_model_path=hf_model_path,
+        hf_attn_implementation=hf_attn_implementation,
+        hf_device_map=hf_device_map,
+        cache_dir=cache_dir,
+        adaptive_concurrency=adaptive_concurrency,
+        image_format=image_format,
+        image_quality=image_quality,
+        render_layout=render_layout,
+        result_sink=result_sink,
+        image_dir=image_dir,
+        resume=resume,
+        native_text=native_text,
+        tile_oversized=tile_oversized,
+        priority=priority,
     )
 
     # 设置Fitz预处理标志
@@ -71,12 +122,30 @@ def do_parse(
         print(f"对图像输入使用Fitz预处理，请检查图像像素的变化")
 
     # 解析文件
-    result = dots_ocr_parser.parse_file(
-        input_path,
-        prompt_mode=prompt,
-        bbox=bbox,
-        fitz_preprocess=fitz_preprocess,
-    )
+    if use_async:
+
+        async def _parse_async():
+            try:
+                return await dots_ocr_parser.parse_file_async(
+                    input_path,
+                    prompt_mode=prompt,
+                    bbox=bbox,
+                    fitz_preprocess=fitz_preprocess,
+                )
+            finally:
+                # 关闭本事件循环中的长连接客户端和切块线程
+                await dots_ocr_parser.aclose()
+
+        result = asyncio.run(_parse_async())
+    else:
+        # 退出时关闭切块线程
+        with dots_ocr_parser:
+            result = dots_ocr_parser.parse_file(
+                input_path,
+                prompt_mode=prompt,
+                bbox=bbox,
+                fitz_preprocess=fitz_preprocess,
+            )
 
     return result
 
@@ -0,0 +1,120 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class CellBatch:
+    """
+    The layout cells of a page with their bboxes held as one (N, 4) array.
+
+    Rescaling, legality checks and bbox dedup run on the whole array instead of
+    per cell. The other cell fields stay in the original dicts, which are only
+    copied when converting back with `to_cells`.
+    """
+
+    def __init__(self, bboxes: np.ndarray, cells: Optional[List[Dict]] = None):
+        self.bboxes = bboxes
+        self.cells = cells
+
+    @classmethod
+    def from_cells(cls, cells: List[Dict]) -> "CellBatch":
+        """
+        Builds a batch from the cell dicts of the model output.
+
+        Args:
+            cells: A list of cells containing bounding box information.
+
+        Returns:
+            CellBatch: The batch, raising ValueError if a bbox is not 4 numbers.
+        """
+        return cls(cls._to_array([cell["bbox"] for cell in cells]), cells)
+
+    @classmethod
+    def from_bboxes(cls, bboxes: List[List]) -> "CellBatch":
+        return cls(cls._to_array(bboxes))
+
+    @staticmethod
+    def _to_array(bboxes):
+        if len(bboxes) == 0:
+            return np.empty((0, 4), dtype=np.float64)
+        # float64 keeps fractional model coordinates until they are rescaled
+        array = np.asarray(bboxes, dtype=np.float64)
+        if array.ndim != 2 or array.shape[1] < 4:
+            raise ValueError(f"bboxes must have 4 coordinates, got shape {array.shape}")
+        return array[:, :4]
+
+    def __len__(self):
+        return len(self.bboxes)
+
+    def rescale(self, scale_x: float, scale_y: float) -> "CellBatch":
+        """
+        Divides x coordinates by `scale_x` and y coordinates by `scale_y`.
+
+        Coordinates are truncated to int like `int(float(coord) / scale)`.
+        """
+        scale = np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float64)
+        return CellBatch((self.bboxes / scale).astype(np.int64), self.cells)
+
+    def translate(self, dx: float, dy: float) -> "CellBatch":
+        """Shifts all bboxes, e.g. from tile to page coordinates."""
+        offset = np.array([dx, dy, dx, dy], dtype=self.bboxes.dtype)
+        return CellBatch(self.bboxes + offset, self.cells)
+
+    def areas(self) -> np.ndarray:
+        return np.clip(self.bboxes[:, 2] - self.bboxes[:, 0], 0, None) * np.clip(
+            self.bboxes[:, 3] - self.bboxes[:, 1], 0, None
+        )
+
+    def pairwise_overlap(self):
+        """
+        Overlap of every pair of bboxes.
+
+        Returns:
+            tuple: (iou, containment) (N, N) arrays, containment being the
+                intersection over the area of the smaller bbox.
+        """
+        b = self.bboxes.astype(np.float64)
+        x0 = np.maximum(b[:, None, 0], b[None, :, 0])
+        y0 = np.maximum(b[:, None, 1], b[None, :, 1])
+        x1 = np.minimum(b[:, None, 2], b[None, :, 2])
+        y1 = np.minimum(b[:, None, 3], b[None, :, 3])
+        inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+        areas = CellBatch(b).areas()
+        union = areas[:, None] + areas[None, :] - inter
+        smaller = np.minimum(areas[:, None], areas[None, :])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            iou = np.where(union > 0, inter / union, 0.0)
+            containment = np.where(smaller > 0, inter / smaller, 0.0)
+        return iou, containment
+
+    def legal_mask(self) -> np.ndarray:
+        """True for the cells whose bbox has a positive width and height."""
+        return (self.bboxes[:, 2] > self.bboxes[:, 0]) & (self.bboxes[:, 3] > self.bboxes[:, 1])
+
+    def is_legal(self) -> bool:
+        return bool(self.legal_mask().all())
+
+    def duplicate_bbox_groups(self) -> List[np.ndarray]:
+        """
+        Finds the bboxes that occur more than once.
+
+        Returns:
+            list: For every repeated bbox, the ascending positions of its cells.
+        """
+        if len(self) < 2:
+            return []
+        _, inverse, counts = np.unique(
+            self.bboxes, axis=0, return_inverse=True, return_counts=True
+        )
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind="stable")
+        groups = np.split(order, np.cumsum(counts)[:-1])
+        groups = [group for group in groups if len(group) >= 2]
+        groups.sort(key=lambda group: group[0])  # in order of first occurrence
+        return groups
+
+    def to_cells(self) -> List[Dict]:
+        """Converts back to the list of cell dicts expected by `layoutjson2md`."""
+        return [
+            dict(cell, bbox=bbox) for cell, bbox in zip(self.cells, self.bboxes.tolist())
+        ]
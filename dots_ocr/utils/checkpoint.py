@@ -0,0 +1,107 @@
+import os
+import json
+import hashlib
+import threading
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class PageCheckpoint:
+    """
+    Page-level checkpoint manifest of a document, `<save_dir>/<filename>.checkpoint.jsonl`.
+
+    The first line identifies the run: a hash of the input file and the settings
+    that change the output. Every finished page then appends its result together
+    with the sha256 of the files it wrote. A rerun with the same input and
+    settings restores the pages whose files are still intact and only parses the
+    missing ones; anything else starts a fresh manifest.
+    """
+
+    # result keys pointing to files that are not owned by a single page, the
+    # records sink restores missing records itself from the checkpoint
+    _SHARED_PATH_KEYS = {"file_path", "records_path"}
+
+    def __init__(self, save_dir, filename, input_path, config):
+        self.path = os.path.join(save_dir, f"{filename}.checkpoint.jsonl")
+        # json round trip, so that it compares equal to the header read back
+        self.header = json.loads(
+            json.dumps({"input_sha256": file_sha256(input_path), "config": config})
+        )
+        self._lock = threading.Lock()
+        self._file = None
+
+    def _output_hashes(self, result):
+        return {
+            key: file_sha256(path)
+            for key, path in result.items()
+            if key.endswith("_path")
+            and key not in self._SHARED_PATH_KEYS
+            and isinstance(path, str)
+        }
+
+    def _is_intact(self, record):
+        for key, digest in record["outputs"].items():
+            path = record["result"].get(key)
+            if not path or not os.path.exists(path) or file_sha256(path) != digest:
+                return False
+        return True
+
+    def load(self):
+        """
+        Opens the manifest for appending.
+
+        Returns:
+            dict: page_no -> result of the pages that need no parsing.
+        """
+        completed = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+            try:
+                header = json.loads(lines[0]) if lines else None
+            except ValueError:
+                header = None
+            if header == self.header:
+                for line in lines[1:]:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line of a killed run
+                    if self._is_intact(record):
+                        completed[record["result"]["page_no"]] = record
+            else:
+                print(f"checkpoint {self.path} does not match the input or settings, starting over")
+
+        # rewrite the manifest with the pages kept, dropping stale or torn lines
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._file.write(json.dumps(self.header, ensure_ascii=False) + "\n")
+        for record in completed.values():
+            self._write(record["result"], record["outputs"])
+        self._file.flush()
+        if completed:
+            print(f"checkpoint: {len(completed)} pages already parsed")
+        return {page_no: record["result"] for page_no, record in completed.items()}
+
+    def _write(self, result, outputs):
+        record = {"result": result, "outputs": outputs}
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def record(self, result):
+        """Appends a finished page, called once its files are written."""
+        result = {k: v for k, v in result.items() if k != "layout_image"}
+        outputs = self._output_hashes(result)
+        with self._lock:
+            self._write(result, outputs)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,154 @@
+import time
+import asyncio
+import threading
+
+
+def _wake(future):
+    # a waiter cancelled meanwhile has a done future
+    if not future.done():
+        future.set_result(None)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD (additive increase, multiplicative decrease) limiter for requests to the OCR server.
+
+    The window of concurrent requests grows by about one request per window of
+    successful, fast responses, and is cut by `backoff_ratio` when a request fails
+    or the smoothed latency exceeds `latency_tolerance` times the best latency
+    observed so far. The window therefore settles around what the server can
+    actually serve instead of a fixed thread count.
+
+    Threads wait with `acquire`/`run`, coroutines with `acquire_async`/`run_async`
+    without blocking their event loop; both share the same window.
+    """
+
+    def __init__(
+        self,
+        initial_limit=8,
+        min_limit=1,
+        max_limit=64,
+        latency_tolerance=2.0,
+        backoff_ratio=0.5,
+        smoothing=0.2,
+    ):
+        assert 1 <= min_limit <= max_limit, "expected 1 <= min_limit <= max_limit"
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_tolerance = latency_tolerance
+        self.backoff_ratio = backoff_ratio
+        self.smoothing = smoothing
+
+        self._cond = threading.Condition()
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._inflight = 0
+        self._latency_ewma = None
+        self._min_latency = None
+        self._last_decrease = 0.0
+        self._async_waiters = []  # (loop, future) of coroutines waiting for a slot
+        self.successes = 0
+        self.errors = 0
+
+    @property
+    def window(self):
+        """The current number of requests allowed in flight."""
+        return int(self._limit)
+
+    def acquire(self):
+        with self._cond:
+            while self._inflight >= int(self._limit):
+                self._cond.wait()
+            self._inflight += 1
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._inflight < int(self._limit):
+                    self._inflight += 1
+                    return
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+            # woken by the next release, then compete for the slot again
+            await future
+
+    def release(self, latency, error=False):
+        with self._cond:
+            self._inflight -= 1
+            now = time.monotonic()
+            if error:
+                self.errors += 1
+                self._decrease(now)
+            else:
+                self.successes += 1
+                self._latency_ewma = (
+                    latency
+                    if self._latency_ewma is None
+                    else self.smoothing * latency
+                    + (1 - self.smoothing) * self._latency_ewma
+                )
+                # let the baseline drift up slowly, so a server that became
+                # permanently slower does not pin the window at its minimum
+                self._min_latency = (
+                    latency
+                    if self._min_latency is None
+                    else min(latency, self._min_latency * 1.01)
+                )
+                if self._latency_ewma > self._min_latency * self.latency_tolerance:
+                    self._decrease(now)
+                else:
+                    self._limit = min(
+                        self.max_limit, self._limit + 1.0 / max(self._limit, 1.0)
+                    )
+            self._cond.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def _decrease(self, now):
+        # react at most once per round trip, the requests already in flight
+        # were sent under the old window and would otherwise collapse it
+        if now - self._last_decrease < (self._latency_ewma or 0.0):
+            return
+        self._last_decrease = now
+        self._limit = max(self.min_limit, self._limit * self.backoff_ratio)
+
+    def run(self, func, *args, **kwargs):
+        """
+        Calls `func` once a slot is free and feeds its latency back into the window.
+
+        A raised exception or a `None` result (the request helpers return None
+        on request errors) counts as an error.
+        """
+        self.acquire()
+        start = time.monotonic()
+        error = True
+        try:
+            result = func(*args, **kwargs)
+            error = result is None
+            return result
+        finally:
+            self.release(time.monotonic() - start, error=error)
+
+    async def run_async(self, func, *args, **kwargs):
+        """`run` for a coroutine function, awaited once a slot is free."""
+        await self.acquire_async()
+        start = time.monotonic()
+        error = True
+        try:
+            result = await func(*args, **kwargs)
+            error = result is None
+            return result
+        finally:
+            self.release(time.monotonic() - start, error=error)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "window": int(self._limit),
+                "inflight": self._inflight,
+                "latency_ewma": self._latency_ewma,
+                "min_latency": self._min_latency,
+                "successes": self.successes,
+                "errors": self.errors,
+            }
@@ -1,6 +1,8 @@
 import fitz
-import numpy as np
 import enum
+import multiprocessing
+from collections import deque
+from itertools import islice
 from pydantic import BaseModel, Field
 from PIL import Image
 
@@ -17,44 +19,185 @@ class PageInfo(BaseModel):
     h: float = Field(description='the height of page')
 
 
-def fitz_doc_to_image(doc, target_dpi=200, origin_dpi=None) -> dict:
+def fitz_doc_to_pixmap(doc, target_dpi=200, max_render_pixels=None):
+    """Render a fitz page to an RGB pixmap.
+
+    Pages wider or higher than 4500 px fall back to 72 dpi, unless
+    `max_render_pixels` is given: the page is then kept at the target dpi and
+    only scaled down as far as needed to stay within that many pixels, e.g. to
+    be split into tiles afterwards.
+    """
+    zoom = target_dpi / 72
+    # check the size before rendering, so oversized pages are only rasterized once
+    irect = (doc.rect * fitz.Matrix(zoom, zoom)).irect
+    if max_render_pixels is not None:
+        pixels = irect.width * irect.height
+        if pixels > max_render_pixels:
+            zoom *= (max_render_pixels / pixels) ** 0.5
+    elif irect.width > 4500 or irect.height > 4500:
+        zoom = 72 / 72  # use fitz default dpi
+    return doc.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+
+
+def fitz_doc_to_image(doc, target_dpi=200, origin_dpi=None, max_render_pixels=None) -> dict:
     """Convert fitz.Document to image, Then convert the image to numpy array.
 
     Args:
         doc (_type_): pymudoc page
         dpi (int, optional): reset the dpi of dpi. Defaults to 200.
+        max_render_pixels (int, optional): see `fitz_doc_to_pixmap`.
 
     Returns:
         dict:  {'img': numpy array, 'width': width, 'height': height }
     """
-    from PIL import Image
-    mat = fitz.Matrix(target_dpi / 72, target_dpi / 72)
-    pm = doc.get_pixmap(matrix=mat, alpha=False)
+    pm = fitz_doc_to_pixmap(doc, target_dpi=target_dpi, max_render_pixels=max_render_pixels)
+    # samples_mv is a view of the pixmap buffer, frombytes makes the only copy
+    image = Image.frombytes('RGB', (pm.width, pm.height), pm.samples_mv)
+    return image
 
-    if pm.width > 4500 or pm.height > 4500:
-        mat = fitz.Matrix(72 / 72, 72 / 72)  # use fitz default dpi
-        pm = doc.get_pixmap(matrix=mat, alpha=False)
 
-    image = Image.frombytes('RGB', (pm.width, pm.height), pm.samples)
-    return image
+def get_pdf_page_count(pdf_file) -> int:
+    with fitz.open(pdf_file) as doc:
+        return doc.page_count
 
 
-def load_images_from_pdf(pdf_file, dpi=200, start_page_id=0, end_page_id=None) -> list:
-    images = []
+def load_page_from_pdf(pdf_file, page_idx, dpi=200, max_render_pixels=None):
+    """Render a single pdf page, e.g. to redraw its layout long after parsing."""
+    with fitz.open(pdf_file) as doc:
+        return fitz_doc_to_image(
+            doc[page_idx], target_dpi=dpi, max_render_pixels=max_render_pixels
+        )
+
+
+def _resolve_page_range(pdf_page_num, start_page_id=0, end_page_id=None):
+    end_page_id = (
+        end_page_id
+        if end_page_id is not None and end_page_id >= 0
+        else pdf_page_num - 1
+    )
+    if end_page_id > pdf_page_num - 1:
+        print('end_page_id is out of range, use images length')
+        end_page_id = pdf_page_num - 1
+    return range(start_page_id, end_page_id + 1)
+
+
+def _render_page_range(pdf_file, dpi, page_ids, max_render_pixels=None):
+    """Process pool worker: open the pdf and render the given pages to raw RGB bytes."""
+    pages = []
+    with fitz.open(pdf_file) as doc:
+        for index in page_ids:
+            pm = fitz_doc_to_pixmap(
+                doc[index], target_dpi=dpi, max_render_pixels=max_render_pixels
+            )
+            pages.append((index, (pm.width, pm.height), pm.samples))
+    return pages
+
+
+def _iter_images_from_pdf_mp(
+    pdf_file,
+    page_ids,
+    dpi,
+    num_workers,
+    pages_per_task,
+    max_render_pixels=None,
+    max_pages_in_flight=None,
+):
+    # the chunks submitted at a time hold at most max_pages_in_flight pages
+    max_pages_in_flight = max_pages_in_flight or num_workers * 2 * pages_per_task
+    pages_per_task = max(1, min(pages_per_task, max_pages_in_flight))
+    window = max(1, max_pages_in_flight // pages_per_task)
+    chunks = (
+        page_ids[i : i + pages_per_task]
+        for i in range(0, len(page_ids), pages_per_task)
+    )
+    # spawn rather than fork: the caller is usually a thread of a ThreadPool
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(num_workers) as pool:
+        # keep a bounded window of submitted chunks so rendered pages do not
+        # pile up in the result queue when inference is the slower stage; the
+        # chunk being handed out counts until its last page was taken
+        pending = deque(
+            pool.apply_async(_render_page_range, (pdf_file, dpi, chunk, max_render_pixels))
+            for chunk in islice(chunks, window)
+        )
+        while pending:
+            pages = pending.popleft().get()
+            while pages:
+                index, size, samples = pages.pop(0)
+                yield index, Image.frombytes('RGB', size, samples)
+            for chunk in islice(chunks, 1):
+                pending.append(
+                    pool.apply_async(_render_page_range, (pdf_file, dpi, chunk, max_render_pixels))
+                )
+
+
+def iter_images_from_pdf(
+    pdf_file,
+    dpi=200,
+    start_page_id=0,
+    end_page_id=None,
+    num_workers=0,
+    pages_per_task=4,
+    skip_page_ids=None,
+    max_render_pixels=None,
+    max_pages_in_flight=None,
+):
+    """Lazily rasterize the pages of a pdf, one page at a time.
+
+    Unlike `load_images_from_pdf`, only the page currently being rendered is
+    held by this generator, so the caller decides how many pages stay in memory.
+
+    Args:
+        pdf_file (str): path of the pdf file
+        dpi (int, optional): target dpi of the rendered pages. Defaults to 200.
+        start_page_id (int, optional): first page to render. Defaults to 0.
+        end_page_id (int, optional): last page to render (inclusive). Defaults to the last page.
+        num_workers (int, optional): render in a process pool of this size, each worker
+            opening its own fitz document. 0 renders in the calling thread. Defaults to 0.
+        pages_per_task (int, optional): pages rendered per process pool task. Defaults to 4.
+        skip_page_ids (set, optional): pages not to render, e.g. already parsed ones.
+        max_render_pixels (int, optional): keep oversized pages at the target dpi up to
+            this many pixels instead of falling back to 72 dpi, see `fitz_doc_to_pixmap`.
+        max_pages_in_flight (int, optional): pages the process pool renders ahead of
+            the caller, usually the caller's own prefetch window. Defaults to
+            `num_workers * 2 * pages_per_task`.
+
+    Yields:
+        tuple: (page index, PIL.Image), in page order
+    """
+    skip_page_ids = skip_page_ids or ()
+    if num_workers > 0:
+        page_ids = [
+            index
+            for index in _resolve_page_range(
+                get_pdf_page_count(pdf_file), start_page_id, end_page_id
+            )
+            if index not in skip_page_ids
+        ]
+        yield from _iter_images_from_pdf_mp(
+            pdf_file,
+            page_ids,
+            dpi,
+            num_workers,
+            pages_per_task,
+            max_render_pixels,
+            max_pages_in_flight,
+        )
+        return
+
     with fitz.open(pdf_file) as doc:
-        pdf_page_num = doc.page_count
-        end_page_id = (
-            end_page_id
-            if end_page_id is not None and end_page_id >= 0
-            else pdf_page_num - 1
+        for index in _resolve_page_range(doc.page_count, start_page_id, end_page_id):
+            if index in skip_page_ids:
+                continue
+            yield index, fitz_doc_to_image(
+                doc[index], target_dpi=dpi, max_render_pixels=max_render_pixels
+            )
+
+
+def load_images_from_pdf(pdf_file, dpi=200, start_page_id=0, end_page_id=None) -> list:
+    return [
+        img
+        for _, img in iter_images_from_pdf(
+            pdf_file, dpi=dpi, start_page_id=start_page_id, end_page_id=end_page_id
         )
-        if end_page_id > pdf_page_num - 1:
-            print('end_page_id is out of range, use images length')
-            end_page_id = pdf_page_num - 1
-
-        for index in range(0, doc.page_count):
-            if start_page_id <= index <= end_page_id:
-                page = doc[index]
-                img = fitz_doc_to_image(page, target_dpi=dpi)
-                images.append(img)
-    return images
\ No newline at end of file
+    ]
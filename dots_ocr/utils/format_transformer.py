@@ -142,46 +142,109 @@ def clean_text(text: str) -> str:
     return text
 
 
-def layoutjson2md(
-    image: Image.Image, cells: list, text_key: str = "text", no_page_hf: bool = False
-) -> str:
+def _layoutjson2md_items(
+    image: Image.Image,
+    cells: list,
+    text_key: str = "text",
+    no_page_hf: bool = False,
+    image_writer=None,
+) -> list:
     """
-    Converts a layout JSON format to Markdown.
-
-    In the layout JSON, formulas are LaTeX, tables are HTML, and text is Markdown.
+    Converts every layout cell to its Markdown item.
 
     Args:
         image: A PIL Image object.
         cells: A list of dictionaries, each representing a layout cell.
         text_key: The key for the text field in the cell dictionary.
-        no_page_header_footer: If True, skips page headers and footers.
+        no_page_hf: If True, skips page headers and footers.
+        image_writer: Optional callable storing a picture crop and returning its path.
 
     Returns:
-        str: The text in Markdown format.
+        list: (markdown, is_page_header_footer) tuples in reading order.
     """
-    text_items = []
+    items = []
 
     for i, cell in enumerate(cells):
         x1, y1, x2, y2 = [int(coord) for coord in cell["bbox"]]
         text = cell.get(text_key, "")
+        is_page_hf = cell["category"] in ["Page-header", "Page-footer"]
 
-        if no_page_hf and cell["category"] in ["Page-header", "Page-footer"]:
+        if no_page_hf and is_page_hf:
             continue
 
         if cell["category"] == "Picture":
             image_crop = image.crop((x1, y1, x2, y2))
-            image_base64 = PILimage_to_base64(image_crop)
-            text_items.append(f"![]({image_base64})")
+            if image_writer is not None:
+                image_ref = image_writer(image_crop)
+            else:
+                image_ref = PILimage_to_base64(image_crop)
+            items.append((f"![]({image_ref})", is_page_hf))
         elif cell["category"] == "Formula":
-            text_items.append(get_formula_in_markdown(text))
+            items.append((get_formula_in_markdown(text), is_page_hf))
         else:
             text = clean_text(text)
-            text_items.append(f"{text}")
+            items.append((f"{text}", is_page_hf))
+
+    return items
 
-    markdown_text = "\n\n".join(text_items)
+
+def layoutjson2md(
+    image: Image.Image,
+    cells: list,
+    text_key: str = "text",
+    no_page_hf: bool = False,
+    image_writer=None,
+) -> str:
+    """
+    Converts a layout JSON format to Markdown.
+
+    In the layout JSON, formulas are LaTeX, tables are HTML, and text is Markdown.
+
+    Args:
+        image: A PIL Image object.
+        cells: A list of dictionaries, each representing a layout cell.
+        text_key: The key for the text field in the cell dictionary.
+        no_page_header_footer: If True, skips page headers and footers.
+        image_writer: Optional callable storing a picture crop and returning the path
+            referenced from the markdown, pictures are inlined as base64 by default.
+
+    Returns:
+        str: The text in Markdown format.
+    """
+    items = _layoutjson2md_items(
+        image, cells, text_key=text_key, no_page_hf=no_page_hf, image_writer=image_writer
+    )
+    markdown_text = "\n\n".join(item for item, _ in items)
     return markdown_text
 
 
+def layoutjson2md_with_nohf(
+    image: Image.Image, cells: list, text_key: str = "text", image_writer=None
+) -> tuple:
+    """
+    Converts a layout JSON format to Markdown, with and without page headers and footers.
+
+    Same output as calling `layoutjson2md` with `no_page_hf=False` and `no_page_hf=True`,
+    but every picture is cropped and encoded only once.
+
+    Args:
+        image: A PIL Image object.
+        cells: A list of dictionaries, each representing a layout cell.
+        text_key: The key for the text field in the cell dictionary.
+        image_writer: Optional callable storing a picture crop and returning the path
+            referenced from the markdown, pictures are inlined as base64 by default.
+
+    Returns:
+        tuple: The full Markdown text and the Markdown text without page headers and footers.
+    """
+    items = _layoutjson2md_items(
+        image, cells, text_key=text_key, image_writer=image_writer
+    )
+    markdown_text = "\n\n".join(item for item, _ in items)
+    markdown_text_no_hf = "\n\n".join(item for item, is_page_hf in items if not is_page_hf)
+    return markdown_text, markdown_text_no_hf
+
+
 def fix_streamlit_formulas(md: str) -> str:
     """
     Fixes the format of formulas in Markdown to ensure they display correctly in Streamlit.
@@ -0,0 +1,50 @@
+import os
+import hashlib
+import threading
+
+
+class ImageAssetStore:
+    """
+    Content-addressed store of the figures cropped out of parsed pages.
+
+    Every crop is written once as `<store_dir>/<sha256>.png`, keyed by its
+    pixels, and referenced from the markdown by path instead of an inline
+    base64 data uri. Identical figures, e.g. a logo repeated on every page or
+    a re-parsed document, map to the same file and are not encoded again.
+    """
+
+    def __init__(self, store_dir, format="PNG"):
+        self.store_dir = os.path.abspath(store_dir)
+        self.format = format
+        self.ext = "jpg" if format.upper() == "JPEG" else format.lower()
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(image):
+        h = hashlib.sha256()
+        h.update(f"{image.mode}:{image.width}x{image.height}".encode("utf-8"))
+        h.update(image.tobytes())
+        return h.hexdigest()
+
+    def put(self, image):
+        """
+        Stores an image, unless an identical one is already stored.
+
+        Args:
+            image: A PIL Image object.
+
+        Returns:
+            str: The path of the stored image.
+        """
+        path = os.path.join(self.store_dir, f"{self.make_key(image)}.{self.ext}")
+        if os.path.exists(path):
+            return path
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            image.save(tmp_path, format=self.format)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
@@ -1,15 +1,14 @@
 import math
 import base64
-from PIL import Image
 from typing import Tuple
 import os
 from dots_ocr.utils.consts import IMAGE_FACTOR, MIN_PIXELS, MAX_PIXELS
-from dots_ocr.utils.doc_utils import fitz_doc_to_image
 from io import BytesIO
-import fitz
-import requests
 import copy
 
+# PIL, fitz and requests are imported where they are used, smart_resize and the
+# other size helpers do not need them
+
 
 def round_by_factor(number: int, factor: int) -> int:
     """Returns the closest integer to 'number' that is divisible by 'factor'."""
@@ -63,20 +62,42 @@ def smart_resize(
     return h_bar, w_bar
 
 
-def PILimage_to_base64(image, format="PNG"):
+def PILimage_to_base64(image, format="PNG", quality=None):
+    """
+    Encodes a PIL image as a base64 data url.
+
+    Args:
+        image: The PIL Image.
+        format: The image format, e.g. PNG (lossless), JPEG or WEBP.
+        quality: The quality of lossy formats, ignored for PNG.
+
+    Returns:
+        str: The data url.
+    """
     buffered = BytesIO()
-    image.save(buffered, format=format)
+    save_kwargs = {}
+    if format.upper() in ("JPEG", "JPG"):
+        format = "JPEG"
+        image = to_rgb(image)  # jpeg has no alpha channel
+    if quality is not None and format.upper() != "PNG":
+        save_kwargs["quality"] = quality
+    image.save(buffered, format=format, **save_kwargs)
     base64_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
     return f"data:image/{format.lower()};base64,{base64_str}"
 
 
-def to_rgb(pil_image: Image.Image) -> Image.Image:
+def to_rgb(pil_image: "Image.Image") -> "Image.Image":
     if pil_image.mode == "RGBA":
+        from PIL import Image
+
         white_background = Image.new("RGB", pil_image.size, (255, 255, 255))
         white_background.paste(
             pil_image, mask=pil_image.split()[3]
         )  # Use alpha channel as mask
         return white_background
+    elif pil_image.mode == "RGB":
+        pil_image.load()  # no copy, only make sure lazily opened files are read
+        return pil_image
     else:
         return pil_image.convert("RGB")
 
@@ -88,12 +109,16 @@ def fetch_image(
     max_pixels=None,
     resized_height=None,
     resized_width=None,
-) -> Image.Image:
+) -> "Image.Image":
+    from PIL import Image
+
     assert image is not None, f"image not found, maybe input format error: {image}"
     image_obj = None
     if isinstance(image, Image.Image):
         image_obj = image
     elif image.startswith("http://") or image.startswith("https://"):
+        import requests
+
         # fix memory leak issue while using BytesIO
         with requests.get(image, stream=True) as response:
             response.raise_for_status()
@@ -142,13 +167,14 @@ def fetch_image(
         assert (
             resized_height > 0 and resized_width > 0
         ), f"resized_height: {resized_height}, resized_width: {resized_width}, min_pixels: {min_pixels}, max_pixels:{max_pixels}, width: {width}, height:{height}, "
-        image = image.resize((resized_width, resized_height))
+        if (resized_width, resized_height) != image.size:
+            image = image.resize((resized_width, resized_height))
 
     return image
 
 
 def get_input_dimensions(
-    image: Image.Image, min_pixels: int, max_pixels: int, factor: int = 28
+    image: "Image.Image", min_pixels: int, max_pixels: int, factor: int = 28
 ) -> Tuple[int, int]:
     """
     Gets the resized dimensions of the input image.
@@ -172,14 +198,56 @@ def get_input_dimensions(
     return input_width, input_height
 
 
-def get_image_by_fitz_doc(image, target_dpi=200):
-    # get image through fitz, to get target dpi image, mainly for higher image
+def get_fitz_render_size(width, height, target_dpi=200, origin_dpi=None):
+    """
+    Gets the size fitz renders an image to when it is opened as a document.
+
+    fitz lays the image out on a page sized from its resolution (96 dpi when
+    unknown) and rasterizes that page at `target_dpi`, falling back to 72 dpi
+    when a side would exceed 4500 pixels.
+
+    Args:
+        width: The image width in pixels.
+        height: The image height in pixels.
+        target_dpi: The dpi the page is rendered at.
+        origin_dpi: The (x, y) resolution of the image, if any.
+
+    Returns:
+        The rendered (width, height).
+    """
+    import fitz
+
+    xres, yres = (
+        (int(round(origin_dpi[0])), int(round(origin_dpi[1])))
+        if origin_dpi and min(origin_dpi) >= 1
+        else (96, 96)
+    )
+    page_rect = fitz.Rect(0, 0, width * 72 / xres, height * 72 / yres)
+    irect = (page_rect * fitz.Matrix(target_dpi / 72, target_dpi / 72)).irect
+    if irect.width > 4500 or irect.height > 4500:
+        irect = page_rect.irect  # use fitz default dpi
+    return irect.width, irect.height
+
+
+def get_image_by_fitz_doc(image, target_dpi=200, min_pixels=None, max_pixels=None):
+    """
+    Resamples an image to `target_dpi`, mainly for images rendered with a low dpi.
+
+    The output has the size the image would get when opened as a fitz document
+    and re-rasterized, but is produced with a single resize instead of a
+    PNG -> PDF -> pixmap round trip. When `min_pixels` or `max_pixels` is set the
+    smart_resize of the model input is folded into that same resize.
+    """
+    from PIL import Image
+
     if not isinstance(image, Image.Image):
         assert isinstance(image, str)
         _, file_ext = os.path.splitext(image)
         assert file_ext in {".jpg", ".jpeg", ".png"}
 
         if image.startswith("http://") or image.startswith("https://"):
+            import requests
+
             with requests.get(image, stream=True) as response:
                 response.raise_for_status()
                 data_bytes = response.content
@@ -188,14 +256,23 @@ def get_image_by_fitz_doc(image, target_dpi=200):
                 data_bytes = f.read()
 
         image = Image.open(BytesIO(data_bytes))
+        origin_dpi = image.info.get("dpi", None)
     else:
-        data_bytes = BytesIO()
-        image.save(data_bytes, format="PNG")
-
-    origin_dpi = image.info.get("dpi", None)
-    pdf_bytes = fitz.open(stream=data_bytes).convert_to_pdf()
-    doc = fitz.open("pdf", pdf_bytes)
-    page = doc[0]
-    image_fitz = fitz_doc_to_image(page, target_dpi=target_dpi, origin_dpi=origin_dpi)
+        # in-memory images always went through a PNG without resolution info
+        origin_dpi = None
 
-    return image_fitz
+    image = to_rgb(image)
+    width, height = get_fitz_render_size(
+        image.width, image.height, target_dpi=target_dpi, origin_dpi=origin_dpi
+    )
+    if min_pixels or max_pixels:
+        height, width = smart_resize(
+            height,
+            width,
+            factor=IMAGE_FACTOR,
+            min_pixels=min_pixels or MIN_PIXELS,
+            max_pixels=max_pixels or MAX_PIXELS,
+        )
+    if (width, height) != image.size:
+        image = image.resize((width, height), Image.BICUBIC)
+    return image
@@ -4,10 +4,12 @@ from typing import Dict, List
 import fitz
 from io import BytesIO
 import json
+import os
 
 from dots_ocr.utils.image_utils import smart_resize
 from dots_ocr.utils.consts import MIN_PIXELS, MAX_PIXELS
 from dots_ocr.utils.output_cleaner import OutputCleaner
+from dots_ocr.utils.cell_batch import CellBatch
 
 
 # Define a color map (using RGBA format)
@@ -119,6 +121,63 @@ def draw_layout_on_image(
     return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
 
 
+def render_layout_image(
+    input_path,
+    layout_info_path=None,
+    page_idx=None,
+    dpi=200,
+    save_path=None,
+    cells=None,
+    max_render_pixels=None,
+):
+    """
+    Lazily draw the layout of an already parsed page.
+
+    The page is re-rasterized from its source and the cells are read back from
+    the saved layout, so parsing can skip `draw_layout_on_image` entirely.
+
+    Args:
+        input_path: The parsed PDF or image file.
+        layout_info_path: The `.json` file written for the page.
+        page_idx: The page number for PDF input, ignored for images.
+        dpi: The dpi the PDF was parsed with.
+        save_path: Optional `.jpg` path, reused if it already exists.
+        cells: The layout cells of the page, used instead of `layout_info_path`.
+        max_render_pixels: The render limit of oversized PDF pages, if parsed with tiling.
+
+    Returns:
+        PIL.Image: The image with drawings.
+    """
+    if save_path and os.path.exists(save_path):
+        return Image.open(save_path)
+
+    if os.path.splitext(input_path)[1].lower() == ".pdf":
+        from dots_ocr.utils.doc_utils import load_page_from_pdf
+
+        origin_image = load_page_from_pdf(
+            input_path, page_idx or 0, dpi=dpi, max_render_pixels=max_render_pixels
+        )
+    else:
+        from dots_ocr.utils.image_utils import fetch_image
+
+        origin_image = fetch_image(input_path)
+
+    if cells is None:
+        with open(layout_info_path, "r", encoding="utf-8") as f:
+            cells = json.load(f)
+    # the raw response is saved when the model output json failed, nothing to draw
+    image_with_layout = origin_image
+    if isinstance(cells, list):
+        try:
+            image_with_layout = draw_layout_on_image(origin_image, cells)
+        except Exception as e:
+            print(f"Error drawing layout on image: {e}")
+
+    if save_path:
+        image_with_layout.save(save_path)
+    return image_with_layout
+
+
 def pre_process_bboxes(
     origin_image,
     bboxes,
@@ -140,17 +199,7 @@ def pre_process_bboxes(
     scale_x = original_width / input_width
     scale_y = original_height / input_height
 
-    bboxes_out = []
-    for bbox in bboxes:
-        bbox_resized = [
-            int(float(bbox[0]) / scale_x),
-            int(float(bbox[1]) / scale_y),
-            int(float(bbox[2]) / scale_x),
-            int(float(bbox[3]) / scale_y),
-        ]
-        bboxes_out.append(bbox_resized)
-
-    return bboxes_out
+    return CellBatch.from_bboxes(bboxes).rescale(scale_x, scale_y).bboxes.tolist()
 
 
 def post_process_cells(
@@ -189,28 +238,11 @@ def post_process_cells(
     scale_x = input_width / original_width
     scale_y = input_height / original_height
 
-    cells_out = []
-    for cell in cells:
-        bbox = cell["bbox"]
-        bbox_resized = [
-            int(float(bbox[0]) / scale_x),
-            int(float(bbox[1]) / scale_y),
-            int(float(bbox[2]) / scale_x),
-            int(float(bbox[3]) / scale_y),
-        ]
-        cell_copy = cell.copy()
-        cell_copy["bbox"] = bbox_resized
-        cells_out.append(cell_copy)
-
-    return cells_out
+    return CellBatch.from_cells(cells).rescale(scale_x, scale_y).to_cells()
 
 
 def is_legal_bbox(cells):
-    for cell in cells:
-        bbox = cell["bbox"]
-        if bbox[2] <= bbox[0] or bbox[3] <= bbox[1]:
-            return False
-    return True
+    return CellBatch.from_cells(cells).is_legal()
 
 
 def post_process_output(
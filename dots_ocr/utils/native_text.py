@@ -0,0 +1,235 @@
+import re
+import html
+
+import fitz
+
+from dots_ocr.utils.doc_utils import SupportedPdfParseMethod
+from dots_ocr.utils.reading_order import sort_cells
+
+
+# prompts whose output can be produced from the text layer
+NATIVE_TEXT_PROMPTS = ("prompt_layout_all_en", "prompt_layout_only_en")
+
+# fonts of typeset math, their glyphs rarely map back to meaningful unicode
+MATH_FONT_PATTERN = re.compile(r"CMMI|CMSY|CMEX|MSBM|Math|Symbol|MT Extra|STIX", re.IGNORECASE)
+LIST_ITEM_PATTERN = re.compile(r"^\s*([•●▪◦■□‣·\-–—*]|\(?\d{1,3}[.)]|\(?[a-zA-Z][.)])\s+")
+CAPTION_PATTERN = re.compile(r"^\s*(Figure|Fig\.|Table|Chart|图|表)\s*\d", re.IGNORECASE)
+CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+
+
+def _is_garbled(char):
+    # replacement character or private use area, i.e. glyphs without a unicode mapping
+    return char == "\ufffd" or "\ue000" <= char <= "\uf8ff"
+
+
+def _join_lines(lines):
+    text = ""
+    for line in lines:
+        if not text:
+            text = line
+        elif CJK_PATTERN.match(text[-1]) and CJK_PATTERN.match(line[0]):
+            text += line
+        else:
+            text += " " + line
+    return text
+
+
+def _table_to_html(table):
+    rows = []
+    for row in table.extract():
+        cells = "".join(
+            f"<td>{html.escape((cell or '').replace(chr(10), ' ').strip())}</td>"
+            for cell in row
+        )
+        rows.append(f"<tr>{cells}</tr>")
+    return f"<table>{''.join(rows)}</table>"
+
+
+class NativeTextExtractor:
+    """
+    Builds the layout cells of born-digital pdf pages from their text layer.
+
+    `extract` first classifies a page with cheap statistics of its text layer:
+    enough visible characters, few glyphs without unicode mapping, little
+    typeset math, no invisible OCR layer and no page-sized scan image. Pages
+    passing all checks are turned into cells in the format of the model output
+    (Text, Title, Section-header, List-item, Caption, Table, Picture,
+    Page-header and Page-footer), in the pixel coordinates of the rendered page.
+    Every other page returns None and goes to the model.
+
+    A fitz document is not thread safe, use one extractor per thread.
+    """
+
+    def __init__(
+        self,
+        pdf_file,
+        min_chars=20,
+        max_garbled_ratio=0.02,
+        max_math_ratio=0.02,
+        max_invisible_ratio=0.5,
+        max_image_coverage=0.5,
+        header_footer_margin=0.06,
+    ):
+        self.doc = fitz.open(pdf_file)
+        self.min_chars = min_chars
+        self.max_garbled_ratio = max_garbled_ratio
+        self.max_math_ratio = max_math_ratio
+        self.max_invisible_ratio = max_invisible_ratio
+        self.max_image_coverage = max_image_coverage
+        self.header_footer_margin = header_footer_margin
+        self.native_pages = 0
+        self.ocr_pages = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.doc.close()
+
+    def stats(self):
+        return {"native_pages": self.native_pages, "ocr_pages": self.ocr_pages}
+
+    def _read_blocks(self, page):
+        """Visible text blocks as (rect, lines, size, bold) and the text layer statistics."""
+        info = page.get_text("dict", flags=fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES)
+        stats = {"chars": 0, "garbled": 0, "math": 0, "invisible": 0}
+        blocks = []
+        for block in info["blocks"]:
+            if block["type"] != 0:
+                continue
+            lines, sizes, bold_chars, num_chars = [], [], 0, 0
+            rect = fitz.Rect()
+            for line in block["lines"]:
+                spans = []
+                for span in line["spans"]:
+                    chars = len(span["text"].strip())
+                    if not chars:
+                        continue
+                    if span.get("alpha", 255) == 0:
+                        stats["invisible"] += chars
+                        continue
+                    stats["chars"] += chars
+                    stats["garbled"] += sum(_is_garbled(c) for c in span["text"])
+                    if MATH_FONT_PATTERN.search(span["font"]):
+                        stats["math"] += chars
+                    sizes.append((span["size"], chars))
+                    if span["flags"] & fitz.TEXT_FONT_BOLD:
+                        bold_chars += chars
+                    num_chars += chars
+                    spans.append(span["text"])
+                text = "".join(spans).strip()
+                if text:
+                    lines.append(text)
+                    rect |= line["bbox"]
+            if lines:
+                size = sum(s * n for s, n in sizes) / num_chars
+                blocks.append((rect, lines, size, bold_chars * 2 > num_chars, sizes))
+        return blocks, stats
+
+    def classify(self, page, blocks, stats):
+        """Returns SupportedPdfParseMethod.TXT if the text layer can replace the model."""
+        chars = stats["chars"]
+        if page.rotation or chars < self.min_chars:
+            return SupportedPdfParseMethod.OCR
+        if stats["garbled"] > chars * self.max_garbled_ratio:
+            return SupportedPdfParseMethod.OCR
+        if stats["math"] > chars * self.max_math_ratio:
+            return SupportedPdfParseMethod.OCR
+        if stats["invisible"] > (chars + stats["invisible"]) * self.max_invisible_ratio:
+            return SupportedPdfParseMethod.OCR
+        page_area = page.rect.get_area()
+        image_area = sum(
+            (fitz.Rect(image["bbox"]) & page.rect).get_area()
+            for image in page.get_image_info()
+        )
+        if image_area > page_area * self.max_image_coverage:
+            return SupportedPdfParseMethod.OCR
+        return SupportedPdfParseMethod.TXT
+
+    def _body_size(self, blocks):
+        # char weighted median of the span sizes
+        sizes = sorted(s for block in blocks for s in block[4])
+        half, seen = sum(n for _, n in sizes) / 2, 0
+        for size, n in sizes:
+            seen += n
+            if seen >= half:
+                return size
+        return 0
+
+    def _text_cell(self, page, rect, lines, size, bold, body_size):
+        text = _join_lines(lines)
+        height = page.rect.height
+        short = len(text) < 200
+        if short and rect.y1 <= height * self.header_footer_margin:
+            return {"category": "Page-header", "text": text}
+        if short and rect.y0 >= height * (1 - self.header_footer_margin):
+            return {"category": "Page-footer", "text": text}
+        if short and size >= body_size * 1.5:
+            return {"category": "Title", "text": f"# {text}"}
+        if short and len(lines) <= 3 and (size >= body_size * 1.15 or (bold and len(lines) == 1)):
+            return {"category": "Section-header", "text": f"## {text}"}
+        if CAPTION_PATTERN.match(text):
+            return {"category": "Caption", "text": text}
+        if LIST_ITEM_PATTERN.match(text):
+            return {"category": "List-item", "text": text}
+        return {"category": "Text", "text": text}
+
+    def extract(self, page_idx, image):
+        """
+        Args:
+            page_idx: Index of the page in the pdf.
+            image: The rendered page, cell bboxes are given in its pixels.
+
+        Returns:
+            list: The layout cells of the page in reading order, or None if the
+                page has to be parsed by the model.
+        """
+        page = self.doc[page_idx]
+        blocks, stats = self._read_blocks(page)
+        if self.classify(page, blocks, stats) != SupportedPdfParseMethod.TXT:
+            self.ocr_pages += 1
+            return None
+        try:
+            tables = page.find_tables().tables
+        except Exception as e:
+            print(f"Error finding tables on page {page_idx}: {e}")
+            self.ocr_pages += 1
+            return None
+
+        items = []
+        table_rects = [fitz.Rect(table.bbox) for table in tables]
+        for table, rect in zip(tables, table_rects):
+            items.append((rect, {"category": "Table", "text": _table_to_html(table)}))
+        for image_info in page.get_image_info():
+            rect = fitz.Rect(image_info["bbox"]) & page.rect
+            if rect.width >= 20 and rect.height >= 20:
+                items.append((rect, {"category": "Picture"}))
+        body_size = self._body_size(blocks)
+        for rect, lines, size, bold, _ in blocks:
+            center = fitz.Point((rect.x0 + rect.x1) / 2, (rect.y0 + rect.y1) / 2)
+            if any(center in table_rect for table_rect in table_rects):
+                continue
+            items.append((rect, self._text_cell(page, rect, lines, size, bold, body_size)))
+
+        ordered = sort_cells(
+            [dict(bbox=tuple(rect), **cell) for rect, cell in items], page.rect.width
+        )
+
+        scale_x = image.width / page.rect.width
+        scale_y = image.height / page.rect.height
+        cells = []
+        for cell in ordered:
+            x0, y0, x1, y1 = cell["bbox"]
+            bbox = [
+                max(0, int(x0 * scale_x)),
+                max(0, int(y0 * scale_y)),
+                min(image.width, int(x1 * scale_x)),
+                min(image.height, int(y1 * scale_y)),
+            ]
+            if bbox[2] > bbox[0] and bbox[3] > bbox[1]:
+                cells.append(dict(cell, bbox=bbox))
+        self.native_pages += 1
+        return cells
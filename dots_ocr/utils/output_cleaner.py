@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 """
-Data Cleaning Script - Cleans all data using a simplified regex method and saves the results
+Data Cleaning Script - Cleans all data using a linear recovery scanner and saves the results
 
 Features:
-1. Cleans all cases using a simplified regex method.
+1. Cleans all cases by salvaging every complete dict in a single scan.
 2. Saves the cleaned data for each case.
 3. Ensures the relative order of dicts remains unchanged.
 4. Generates a before-and-after cleaning report.
@@ -17,6 +17,8 @@ from dataclasses import dataclass
 from collections import Counter
 import traceback
 
+from dots_ocr.utils.cell_batch import CellBatch
+
 
 @dataclass
 class CleanedData:
@@ -30,13 +32,12 @@ class CleanedData:
 
 
 class OutputCleaner:
-    """Data Cleaner - Based on a simplified regex method"""
+    """Data Cleaner - Based on a linear brace and string state scanner"""
     
     def __init__(self):
-        # Simplified regular expression patterns
-        self.dict_pattern = re.compile(r'\{[^{}]*?"bbox"\s*:\s*\[[^\]]*?\][^{}]*?\}', re.DOTALL)
+        # Tokens of the recovery scanner: a complete string, a brace, or an unterminated quote
+        self.token_pattern = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}"]', re.DOTALL)
         self.bbox_pattern = re.compile(r'"bbox"\s*:\s*\[([^\]]+)\]')
-        self.missing_delimiter_pattern = re.compile(r'\}\s*\{(?!")')
         
         self.cleaned_results: List[CleanedData] = []
     
@@ -123,24 +124,29 @@ class OutputCleaner:
         }
         
         try:
-            # Step 1: Detect and fix missing delimiters
-            data_str, delimiter_fixes = self._fix_missing_delimiters(data_str)
-            operations['delimiter_fixes'] = delimiter_fixes
-            
-            # Step 2: Truncate the last incomplete element
-            data_str, tail_truncated = self._truncate_last_incomplete_element(data_str)
-            operations['tail_truncated'] = tail_truncated
-            operations['truncated_length'] = len(data_str)
+            # Step 1: Salvage the complete top-level dicts in one linear scan. Missing
+            # delimiters are skipped over and an incomplete tail is never closed.
+            dict_strings, scan_stats = self._scan_complete_dicts(data_str)
+            operations.update(scan_stats)
             
-            # Step 3: Remove duplicate complete dict objects, preserving order
-            data_str, duplicate_removes = self._remove_duplicate_complete_dicts_preserve_order(data_str)
+            # Step 2: Remove duplicate complete dict objects, preserving order
+            dict_strings, duplicate_removes = self._remove_duplicate_dict_strings(dict_strings)
             operations['duplicate_dicts_removed'] = duplicate_removes
             
-            # Step 4: Ensure correct JSON format
-            data_str = self._ensure_json_format(data_str)
+            # Step 3: Parse every dict on its own, a broken one does not sink the others
+            final_data = []
+            for dict_str in dict_strings:
+                try:
+                    final_data.append(json.loads(dict_str))
+                except json.JSONDecodeError:
+                    continue
             
-            # Step 5: Try to parse the final result
-            final_data = self._parse_final_json(data_str)
+            if final_data:
+                print(f"    ✅ Extracted {len(final_data)} valid dicts")
+                final_data = self.clean_list_data(final_data, case_id).cleaned_data
+            else:
+                # fallback: Special handling for a single incomplete dict
+                final_data = self._handle_single_incomplete_dict(data_str)
             
             if final_data is not None:
                 operations['final_objects'] = len(final_data)
@@ -168,135 +174,72 @@ class OutputCleaner:
                 success=False
             )
     
-    def _fix_missing_delimiters(self, text: str) -> Tuple[str, int]:
-        """Fixes missing delimiters"""
-        
-        fixes = 0
-        
-        def replace_delimiter(match):
-            nonlocal fixes
-            fixes += 1
-            return '},{'
-        
-        text = self.missing_delimiter_pattern.sub(replace_delimiter, text)
-        
-        if fixes > 0:
-            print(f"    ✅ Fixed {fixes} missing delimiters")
-        
-        return text, fixes
-    
-    def _truncate_last_incomplete_element(self, text: str) -> Tuple[str, bool]:
-        """Truncates the last incomplete element"""
-        
-        # For very long text (>50k) or text not ending with ']', directly truncate the last '{"bbox":'
-        needs_truncation = (
-            len(text) > 50000 or 
-            not text.strip().endswith(']')
-        )
-        
-        if needs_truncation:
-            # Check how many dict objects there are
-            bbox_count = text.count('{"bbox":')
-            
-            # If there is only one dict object, do not truncate to avoid deleting the only object
-            if bbox_count <= 1:
-                print(f"    ⚠️ Only {bbox_count} dict objects found, skipping truncation to avoid deleting all content")
-                return text, False
+    def _scan_complete_dicts(self, text: str) -> Tuple[List[str], Dict[str, Any]]:
+        """Extracts the complete top-level dicts with a single pass over the text
+        
+        Strings are consumed as whole tokens, so braces inside texts are ignored,
+        and only the braces between them are visited. The scan never backtracks.
+        """
+        
+        dict_strings = []
+        delimiter_fixes = 0
+        depth = 0
+        in_string = False
+        start = 0
+        last_end = -1
+        
+        for match in self.token_pattern.finditer(text):
+            pos = match.start()
+            char = text[pos]
             
-            # Find the position of the last '{"bbox":'
-            last_bbox_pos = text.rfind('{"bbox":')
-            
-            if last_bbox_pos > 0:
-                # Truncate before this position
-                truncated_text = text[:last_bbox_pos].rstrip()
-                
-                # Remove trailing comma
-                if truncated_text.endswith(','):
-                    truncated_text = truncated_text[:-1]
-                
-                print(f"    ✂️ Truncated the last incomplete element, length reduced from {len(text):,} to {len(truncated_text):,}")
-                return truncated_text, True
-        
-        return text, False
+            if char == '"':
+                if match.end() - pos == 1:
+                    # a quote without its closing quote: the output ends inside a string
+                    in_string = True
+                    break
+            elif char == '{':
+                if depth == 0:
+                    start = pos
+                    # two dicts separated by whitespace only: the model dropped the comma
+                    if last_end >= 0 and not text[last_end:pos].strip():
+                        delimiter_fixes += 1
+                depth += 1
+            elif depth > 0:
+                depth -= 1
+                if depth == 0:
+                    dict_strings.append(text[start:pos + 1])
+                    last_end = pos + 1
+        
+        if delimiter_fixes > 0:
+            print(f"    ✅ Fixed {delimiter_fixes} missing delimiters")
+        
+        tail_truncated = depth > 0 or in_string
+        if tail_truncated:
+            print(f"    ✂️ Dropped the last incomplete element, length reduced from {len(text):,} to {max(last_end, 0):,}")
+        
+        return dict_strings, {
+            'delimiter_fixes': delimiter_fixes,
+            'tail_truncated': tail_truncated,
+            'truncated_length': max(last_end, 0) if tail_truncated else len(text),
+        }
     
-    def _remove_duplicate_complete_dicts_preserve_order(self, text: str) -> Tuple[str, int]:
+    def _remove_duplicate_dict_strings(self, dict_strings: List[str]) -> Tuple[List[str], int]:
         """Removes duplicate complete dict objects, preserving original order"""
         
-        # Extract all dict objects, preserving order
-        dict_matches = list(self.dict_pattern.finditer(text))
-        
-        if not dict_matches:
-            return text, 0
+        if not dict_strings:
+            return dict_strings, 0
         
-        print(f"    📊 Found {len(dict_matches)} dict objects")
+        print(f"    📊 Found {len(dict_strings)} dict objects")
         
         # Deduplication while preserving order: only keep the first occurrence of a dict
-        unique_dicts = []
-        seen_dict_strings = set()
-        total_duplicates = 0
-        
-        for match in dict_matches:
-            dict_str = match.group()
-            
-            if dict_str not in seen_dict_strings:
-                unique_dicts.append(dict_str)
-                seen_dict_strings.add(dict_str)
-            else:
-                total_duplicates += 1
+        unique_dicts = list(dict.fromkeys(dict_strings))
+        total_duplicates = len(dict_strings) - len(unique_dicts)
         
         if total_duplicates > 0:
-            # Reconstruct the JSON array, preserving the original order
-            new_text = '[' + ', '.join(unique_dicts) + ']'
             print(f"    ✅ Removed {total_duplicates} duplicate dicts, keeping {len(unique_dicts)} unique dicts (order preserved)")
-            return new_text, total_duplicates
         else:
             print(f"    ✅ No duplicate dict objects found")
-            return text, 0
-    
-    def _ensure_json_format(self, text: str) -> str:
-        """Ensures correct JSON format"""
-        
-        text = text.strip()
-        
-        if not text.startswith('['):
-            text = '[' + text
-        
-        if not text.endswith(']'):
-            # Remove trailing comma
-            text = text.rstrip(',').rstrip()
-            text += ']'
-        
-        return text
-    
-    def _parse_final_json(self, text: str) -> Optional[List[Dict]]:
-        """Tries to parse the final JSON"""
-        
-        try:
-            data = json.loads(text)
-            if isinstance(data, list):
-                return data
-        except json.JSONDecodeError as e:
-            print(f"    ❌ JSON parsing failed: {e}")
-            
-            # fallback1: Extract valid dict objects
-            valid_dicts = []
-            
-            for match in self.dict_pattern.finditer(text):
-                dict_str = match.group()
-                try:
-                    dict_obj = json.loads(dict_str)
-                    valid_dicts.append(dict_obj)
-                except:
-                    continue
-            
-            if valid_dicts:
-                print(f"    ✅ Extracted {len(valid_dicts)} valid dicts")
-                return valid_dicts
-            
-            # fallback2: Special handling for a single incomplete dict
-            return self._handle_single_incomplete_dict(text)
-        
-        return None
+        return unique_dicts, total_duplicates
     
     def _handle_single_incomplete_dict(self, text: str) -> Optional[List[Dict]]:
         """Handles the special case of a single incomplete dict"""
@@ -362,16 +305,19 @@ class OutputCleaner:
                     category_text_pairs[pair_key] = []
                 category_text_pairs[pair_key].append(i)
         
-        # 2. Count occurrences and positions of each bbox
+        # 2. Find the positions of every repeated bbox on the (N, 4) bbox array
+        bbox_rows = [
+            i for i, item in enumerate(data_list)
+            if isinstance(item, dict) and isinstance(item.get('bbox'), list) and len(item['bbox']) == 4
+        ]
         bbox_pairs = {}
-        for i, item in enumerate(data_list):
-            if isinstance(item, dict) and 'bbox' in item:
-                bbox = item.get('bbox')
-                if isinstance(bbox, list) and len(bbox) > 0:
-                    bbox_key = tuple(bbox)  # Convert to tuple to use as a dictionary key
-                    if bbox_key not in bbox_pairs:
-                        bbox_pairs[bbox_key] = []
-                    bbox_pairs[bbox_key].append(i)
+        try:
+            batch = CellBatch.from_cells([data_list[i] for i in bbox_rows])
+            for group in batch.duplicate_bbox_groups():
+                positions = [bbox_rows[j] for j in group.tolist()]
+                bbox_pairs[tuple(data_list[positions[0]]['bbox'])] = positions
+        except ValueError as e:
+            print(f"    ⚠️ Skipping bbox deduplication: {e}")
         
         # 3. Identify items to be removed
         duplicates_to_remove = set()
@@ -389,13 +335,12 @@ class OutputCleaner:
         
         # 3b. Process bboxes that appear 2 or more times
         for bbox_key, positions in bbox_pairs.items():
-            if len(positions) >= 2:
-                # Keep the first occurrence, remove subsequent duplicates
-                positions_to_remove = positions[1:]
-                duplicates_to_remove.update(positions_to_remove)
-                
-                print(f"    🔍 Found duplicate bbox: {list(bbox_key)}")
-                print(f"        Count: {len(positions)}, removing at positions: {positions_to_remove}")
+            # Keep the first occurrence, remove subsequent duplicates
+            positions_to_remove = positions[1:]
+            duplicates_to_remove.update(positions_to_remove)
+            
+            print(f"    🔍 Found duplicate bbox: {list(bbox_key)}")
+            print(f"        Count: {len(positions)}, removing at positions: {positions_to_remove}")
         
         if not duplicates_to_remove:
             print(f"    ✅ No category-text pairs or bboxes found exceeding the duplication threshold")
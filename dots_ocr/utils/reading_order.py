@@ -0,0 +1,46 @@
+from typing import Dict, List
+
+
+def _band_order(cells, page_width):
+    middle = page_width / 2
+    ordered, band = [], []
+
+    def _flush():
+        band.sort(key=lambda cell: (cell["bbox"][0] >= middle, cell["bbox"][1], cell["bbox"][0]))
+        ordered.extend(band)
+        band.clear()
+
+    for cell in sorted(cells, key=lambda cell: (cell["bbox"][1], cell["bbox"][0])):
+        x0, _, x1, _ = cell["bbox"]
+        if x0 < middle < x1:
+            _flush()
+            ordered.append(cell)
+        else:
+            band.append(cell)
+    _flush()
+    return ordered
+
+
+def sort_cells(cells: List[Dict], page_width: float) -> List[Dict]:
+    """
+    Sorts layout cells into page reading order.
+
+    Page headers come first and page footers last. The other cells are read top
+    to bottom in bands: a cell crossing the middle of the page closes the current
+    band, the narrow cells collected since then are read left column first.
+
+    Args:
+        cells: Cells with an (x0, y0, x1, y1) "bbox" in page coordinates.
+        page_width: The width of the page in the same coordinates.
+
+    Returns:
+        list: The same cells in reading order.
+    """
+    headers = [cell for cell in cells if cell.get("category") == "Page-header"]
+    footers = [cell for cell in cells if cell.get("category") == "Page-footer"]
+    body = [cell for cell in cells if cell.get("category") not in ("Page-header", "Page-footer")]
+    return (
+        _band_order(headers, page_width)
+        + _band_order(body, page_width)
+        + _band_order(footers, page_width)
+    )
@@ -0,0 +1,184 @@
+import os
+import json
+import threading
+
+
+class ResultSink:
+    """
+    Destination of the parsed pages.
+
+    `DotsOCRParser.post_process_results` builds one page dict per page with the
+    keys `page_no`, `input_height`, `input_width` and, depending on the prompt,
+    `layout_info` (cells, or the raw response when `filtered`), `layout_image`,
+    `md_content` and `md_content_nohf`, plus `native_text` for pages built from
+    the pdf text layer and `tiles` for oversized pages parsed in tiles. The sink
+    stores it and returns the result dict handed back to the caller of
+    `parse_file`.
+
+    A page is only recorded in the checkpoint once `write_page` returned, so its
+    output has to be on disk by then. `begin_document` gets the results the
+    checkpoint restored from an earlier run, which the sink keeps.
+    """
+
+    def begin_document(self, output_dir, filename, save_dir, restored=()):
+        pass
+
+    def write_page(self, save_dir, save_name, page):
+        raise NotImplementedError
+
+    def end_document(self, output_dir, filename, save_dir, results):
+        pass
+
+
+class DirectoryResultSink(ResultSink):
+    """One .json/.jpg/.md/_nohf.md file per page plus a .jsonl index per document."""
+
+    def write_page(self, save_dir, save_name, page):
+        result = {
+            "page_no": page["page_no"],
+            "input_height": page["input_height"],
+            "input_width": page["input_width"],
+        }
+        if "layout_info" in page:
+            json_file_path = os.path.join(save_dir, f"{save_name}.json")
+            with open(json_file_path, "w", encoding="utf-8") as w:
+                json.dump(page["layout_info"], w, ensure_ascii=False)
+            result["layout_info_path"] = json_file_path
+
+        if page.get("layout_image") is not None:
+            image_layout_path = os.path.join(save_dir, f"{save_name}.jpg")
+            page["layout_image"].save(image_layout_path)
+            result["layout_image_path"] = image_layout_path
+
+        if "md_content" in page:
+            md_file_path = os.path.join(save_dir, f"{save_name}.md")
+            with open(md_file_path, "w", encoding="utf-8") as md_file:
+                md_file.write(page["md_content"])
+            result["md_content_path"] = md_file_path
+
+        if "md_content_nohf" in page:
+            md_nohf_file_path = os.path.join(save_dir, f"{save_name}_nohf.md")
+            with open(md_nohf_file_path, "w", encoding="utf-8") as md_file:
+                md_file.write(page["md_content_nohf"])
+            result["md_content_nohf_path"] = md_nohf_file_path
+
+        if page.get("filtered"):
+            result["filtered"] = True
+        if page.get("native_text"):
+            result["native_text"] = True
+        if page.get("tiles"):
+            result["tiles"] = page["tiles"]
+        return result
+
+    def end_document(self, output_dir, filename, save_dir, results):
+        with open(
+            os.path.join(output_dir, os.path.basename(filename) + ".jsonl"),
+            "w",
+            encoding="utf-8",
+        ) as w:
+            for result in results:
+                w.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+class RecordFileResultSink(ResultSink):
+    """
+    Append every page as one json line to `<save_dir>/<filename>.records.jsonl`.
+
+    A document costs a single file instead of four per page. Records are written
+    in completion order and flushed one by one, `load_records` returns them sorted
+    by page. Layout images are not stored, draw them on demand with
+    `render_layout_image`.
+    """
+
+    def __init__(self):
+        self._files = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def records_path(save_dir, filename):
+        return os.path.join(save_dir, f"{filename}.records.jsonl")
+
+    @staticmethod
+    def _read_lines(path):
+        records = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue  # torn last line of a killed run
+        return records
+
+    @staticmethod
+    def load_records(path):
+        records = RecordFileResultSink._read_lines(path)
+        # a page parsed again after an interrupted run keeps its last record
+        records = {record["page_no"]: record for record in records}
+        return [records[page_no] for page_no in sorted(records)]
+
+    def begin_document(self, output_dir, filename, save_dir, restored=()):
+        path = self.records_path(save_dir, filename)
+        restored = {result["page_no"]: result for result in restored}
+        present, torn = set(), False
+        if restored and os.path.exists(path):
+            present = {record["page_no"] for record in self._read_lines(path)}
+            with open(path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell():
+                    f.seek(-1, os.SEEK_END)
+                    torn = f.read(1) != b"\n"
+        with self._lock:
+            # a re-parsed document starts a fresh record file, the records of the
+            # pages the checkpoint restored are kept
+            f = open(path, "a" if restored else "w", encoding="utf-8")
+            if torn:
+                f.write("\n")  # end the torn last line, load_records skips it
+            # the checkpoint may hold pages whose records a killed run never wrote
+            for page_no in sorted(set(restored) - present):
+                result = {k: v for k, v in restored[page_no].items() if k != "records_path"}
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+            f.flush()
+            self._files[save_dir] = (path, f)
+
+    def write_page(self, save_dir, save_name, page):
+        result = {k: v for k, v in page.items() if k != "layout_image"}
+        line = json.dumps(result, ensure_ascii=False) + "\n"
+        with self._lock:
+            path, f = self._files[save_dir]
+            f.write(line)
+            # on disk before the checkpoint records the page
+            f.flush()
+        result["records_path"] = path
+        return result
+
+    def end_document(self, output_dir, filename, save_dir, results):
+        with self._lock:
+            _, f = self._files.pop(save_dir)
+            f.close()
+
+
+class MemoryResultSink(ResultSink):
+    """Keep the page contents in the returned results and write nothing to disk."""
+
+    def write_page(self, save_dir, save_name, page):
+        return dict(page)
+
+
+_SINKS = {
+    "directory": DirectoryResultSink,
+    "records": RecordFileResultSink,
+    "memory": MemoryResultSink,
+}
+
+
+def make_result_sink(sink="directory"):
+    """Accept a `ResultSink` instance or one of "directory", "records", "memory"."""
+    if isinstance(sink, ResultSink):
+        return sink
+    if sink not in _SINKS:
+        raise ValueError(
+            f"result sink {sink} not supported, supported sinks are {list(_SINKS)}"
+        )
+    return _SINKS[sink]()
@@ -0,0 +1,306 @@
+import os
+import time
+import asyncio
+import tempfile
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager, asynccontextmanager
+
+
+# highest priority first
+DEFAULT_PRIORITY_CLASSES = ("interactive", "bulk")
+
+# lease directory of the processes of this host that share one OCR server
+DEFAULT_SHARED_DIR = os.environ.get("DOTS_OCR_SCHEDULER_DIR") or os.path.join(
+    tempfile.gettempdir(), "dots_ocr_scheduler"
+)
+
+
+class _Waiter:
+    """A request waiting for a slot, woken from whichever thread releases one."""
+
+    def __init__(self, loop=None):
+        self.enqueued = time.monotonic()
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+
+    def grant(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._set_future)
+
+    def _set_future(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class _SharedLease:
+    """
+    A file in a directory shared by the processes of one host, present while
+    this scheduler has requests of its top priority class. A daemon thread keeps
+    its mtime fresh, so the lease of a killed process expires after `ttl`.
+    """
+
+    def __init__(self, directory, ttl=30.0):
+        self.directory = directory
+        self.ttl = ttl
+        self.path = os.path.join(directory, f"{os.getpid()}-{id(self)}.lease")
+        self._active = False
+        self._cond = threading.Condition()
+        self._thread = None
+        self._checked = 0.0
+        self._others = False
+
+    def _touch(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path, "a"):
+                pass
+            os.utime(self.path)
+        except OSError as e:
+            print(f"scheduler lease {self.path}: {e}")
+
+    def set_active(self, active):
+        with self._cond:
+            if active == self._active:
+                return
+            self._active = active
+            if active:
+                self._touch()
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._refresh, name="dots-ocr-lease", daemon=True
+                    )
+                    self._thread.start()
+            else:
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+
+    def _refresh(self):
+        with self._cond:
+            while True:
+                self._cond.wait(self.ttl / 3)
+                if self._active:
+                    self._touch()
+
+    def others_active(self):
+        """Whether another scheduler holds a fresh lease, re-read at most twice a second."""
+        now = time.time()
+        if now - self._checked < 0.5:
+            return self._others
+        self._checked = now
+        others = False
+        try:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if path != self.path and name.endswith(".lease"):
+                    if now - os.path.getmtime(path) < self.ttl:
+                        others = True
+                        break
+        except OSError:
+            pass  # no directory yet, or a lease removed while listing
+        self._others = others
+        return others
+
+
+class RequestScheduler:
+    """
+    Admission of requests to the OCR server by priority class.
+
+    Every request names its class and the document it belongs to. At most
+    `max_concurrency` requests are in flight, and each class additionally has
+    its own cap, so that a bulk job can never take the slots an interactive
+    parse needs. A freed slot goes to the highest priority class that has a
+    waiting request and is below its cap; within a class the waiting documents
+    take turns, so a 1000 page document does not delay a 3 page one by more
+    than one request per round.
+
+    The queues only see the requests of their own process, share the scheduler
+    within a process through `get_scheduler`. Separate processes, e.g. the gradio
+    app and a batch ingest job, coordinate through `shared_dir`: while any other
+    scheduler using the same directory has requests of the top class in flight
+    or waiting, the lower classes of this one are capped at `yield_limit`. This
+    only covers processes on one host; processes on different hosts sharing a
+    server need priority on the server side.
+    """
+
+    def __init__(
+        self, max_concurrency=64, class_limits=None, shared_dir=None, yield_limit=None
+    ):
+        """
+        Args:
+            max_concurrency: Requests in flight over all classes.
+            class_limits: Ordered mapping of class name to its cap, highest
+                priority first. Defaults to interactive (uncapped) and bulk
+                (3/4 of `max_concurrency`).
+            shared_dir: Lease directory shared with the schedulers of other
+                processes, None schedules this process on its own.
+            yield_limit: Cap of every lower class while another process has top
+                class requests. Defaults to 1/8 of `max_concurrency`.
+        """
+        if class_limits is None:
+            class_limits = {
+                "interactive": max_concurrency,
+                "bulk": max(1, max_concurrency * 3 // 4),
+            }
+        self.max_concurrency = max_concurrency
+        self.class_limits = dict(class_limits)
+        self._lock = threading.Lock()
+        self._inflight = {name: 0 for name in self.class_limits}
+        # class -> document key -> waiters of that document, documents in turn order
+        self._queues = {name: OrderedDict() for name in self.class_limits}
+        self._granted = {name: 0 for name in self.class_limits}
+        self._wait_time = {name: 0.0 for name in self.class_limits}
+        self._top_class = next(iter(self.class_limits))
+        self._lease = _SharedLease(shared_dir) if shared_dir else None
+        self.yield_limit = yield_limit or max(1, max_concurrency // 8)
+
+    def _check_class(self, priority):
+        if priority not in self.class_limits:
+            raise ValueError(
+                f"unknown priority class {priority}, expected one of {list(self.class_limits)}"
+            )
+
+    def _enqueue(self, priority, key, waiter):
+        with self._lock:
+            self._queues[priority].setdefault(key, deque()).append(waiter)
+            self._dispatch()
+
+    def _remove(self, priority, key, waiter):
+        """Drops a waiter that gave up, returns False if it was granted meanwhile."""
+        with self._lock:
+            queue = self._queues[priority].get(key)
+            if queue is None or waiter not in queue:
+                return False
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[priority][key]
+            self._update_lease()
+            return True
+
+    def _update_lease(self):
+        # called with the lock held
+        if self._lease is not None:
+            self._lease.set_active(
+                bool(self._inflight[self._top_class] or self._queues[self._top_class])
+            )
+
+    def _limit(self, priority):
+        limit = self.class_limits[priority]
+        if (
+            self._lease is not None
+            and priority != self._top_class
+            and self._lease.others_active()
+        ):
+            return min(limit, self.yield_limit)
+        return limit
+
+    def _dispatch(self):
+        # called with the lock held
+        self._update_lease()
+        while sum(self._inflight.values()) < self.max_concurrency:
+            for priority in self.class_limits:
+                documents = self._queues[priority]
+                if documents and self._inflight[priority] < self._limit(priority):
+                    break
+            else:
+                return
+            # round robin: serve the first document, then move it to the back
+            key, queue = next(iter(documents.items()))
+            waiter = queue.popleft()
+            if queue:
+                documents.move_to_end(key)
+            else:
+                del documents[key]
+            self._inflight[priority] += 1
+            self._granted[priority] += 1
+            self._wait_time[priority] += time.monotonic() - waiter.enqueued
+            waiter.grant()
+
+    def acquire(self, priority="bulk", key=None):
+        """Blocks until a request of `priority` for document `key` may be sent."""
+        self._check_class(priority)
+        waiter = _Waiter()
+        self._enqueue(priority, key, waiter)
+        waiter.event.wait()
+
+    async def acquire_async(self, priority="bulk", key=None):
+        """Like `acquire`, without blocking the event loop."""
+        self._check_class(priority)
+        waiter = _Waiter(asyncio.get_running_loop())
+        self._enqueue(priority, key, waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if not self._remove(priority, key, waiter):
+                self.release(priority)  # the slot was granted while cancelling
+            raise
+
+    def release(self, priority="bulk"):
+        with self._lock:
+            self._inflight[priority] -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority="bulk", key=None):
+        self.acquire(priority, key)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    @asynccontextmanager
+    async def slot_async(self, priority="bulk", key=None):
+        await self.acquire_async(priority, key)
+        try:
+            yield
+        finally:
+            self.release(priority)
+
+    def stats(self):
+        with self._lock:
+            return {
+                priority: {
+                    "inflight": self._inflight[priority],
+                    "waiting": sum(len(q) for q in self._queues[priority].values()),
+                    "granted": self._granted[priority],
+                    "avg_wait": self._wait_time[priority] / self._granted[priority]
+                    if self._granted[priority]
+                    else 0.0,
+                }
+                for priority in self.class_limits
+            }
+
+
+_default_scheduler = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    The scheduler shared by all parsers of this process, coordinated with the
+    other processes of the host through `DEFAULT_SHARED_DIR`.
+    """
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = RequestScheduler(shared_dir=DEFAULT_SHARED_DIR)
+        return _default_scheduler
+
+
+def configure_scheduler(
+    max_concurrency=64, class_limits=None, shared_dir=DEFAULT_SHARED_DIR, yield_limit=None
+):
+    """Replaces the shared scheduler, call it before the first parse."""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        _default_scheduler = RequestScheduler(
+            max_concurrency, class_limits, shared_dir, yield_limit
+        )
+        return _default_scheduler
@@ -0,0 +1,107 @@
+import math
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from dots_ocr.utils.cell_batch import CellBatch
+from dots_ocr.utils.reading_order import sort_cells
+
+
+# pixels of a page rendered for tiling, A0 at 200 dpi is about 62M pixels
+TILED_RENDER_MAX_PIXELS = 100_000_000
+
+
+def _tile_starts(length, tile, count):
+    if count == 1:
+        return [0]
+    return [round(i * (length - tile) / (count - 1)) for i in range(count)]
+
+
+def plan_tiles(width: int, height: int, max_pixels: int, overlap: int = 200) -> List[Tuple]:
+    """
+    Splits a page into a grid of overlapping tiles of at most `max_pixels` each.
+
+    Columns or rows are added along the longer tile side until a tile fits, and
+    neighbouring tiles share at least `overlap` pixels so that a text line cut
+    by one tile border is complete in the other tile.
+
+    Args:
+        width: The page width.
+        height: The page height.
+        max_pixels: The pixel budget of one request.
+        overlap: The minimal overlap of neighbouring tiles.
+
+    Returns:
+        list: (x0, y0, x1, y1) tile boxes in reading order (row by row).
+    """
+    if max_pixels <= (4 * overlap) ** 2:
+        raise ValueError(f"max_pixels {max_pixels} too small for a tile overlap of {overlap}")
+    cols = rows = 1
+    while True:
+        tile_w = min(width, math.ceil((width + (cols - 1) * overlap) / cols))
+        tile_h = min(height, math.ceil((height + (rows - 1) * overlap) / rows))
+        if tile_w * tile_h <= max_pixels:
+            break
+        if tile_w >= tile_h:
+            cols += 1
+        else:
+            rows += 1
+    return [
+        (x, y, x + tile_w, y + tile_h)
+        for y in _tile_starts(height, tile_h, rows)
+        for x in _tile_starts(width, tile_w, cols)
+    ]
+
+
+def merge_tile_cells(
+    tiles: List[Tuple],
+    tile_cells: List[List[Dict]],
+    iou_threshold: float = 0.5,
+    containment_threshold: float = 0.8,
+) -> List[Dict]:
+    """
+    Merges the cells of all tiles of a page into page coordinates.
+
+    An element inside an overlap is detected by both tiles. Two cells of
+    different tiles are duplicates if their IoU reaches `iou_threshold` or the
+    smaller one lies within the larger one by `containment_threshold`; the
+    larger cell is kept, since the smaller one is usually cut by a tile border.
+
+    Args:
+        tiles: The tile boxes of `plan_tiles`.
+        tile_cells: The cells of every tile, in tile coordinates.
+        iou_threshold: IoU above which two cells are the same element.
+        containment_threshold: Share of the smaller cell covered by the larger one
+            above which two cells are the same element.
+
+    Returns:
+        list: The cells in page coordinates, sorted into page reading order.
+    """
+    cells, tile_ids = [], []
+    for tile_id, (tile, tile_cell_list) in enumerate(zip(tiles, tile_cells)):
+        if not tile_cell_list:
+            continue
+        batch = CellBatch.from_cells(tile_cell_list).translate(tile[0], tile[1])
+        # back to whole pixels like the cells of an untiled page
+        batch = CellBatch(batch.bboxes.round().astype(np.int64), batch.cells)
+        cells.extend(batch.to_cells())
+        tile_ids.extend([tile_id] * len(batch))
+    if len(cells) < 2:
+        return cells
+    page_width = max(tile[2] for tile in tiles)
+
+    batch = CellBatch.from_cells(cells)
+    iou, containment = batch.pairwise_overlap()
+    tile_ids = np.asarray(tile_ids)
+    duplicate = (tile_ids[:, None] != tile_ids[None, :]) & (
+        (iou >= iou_threshold) | (containment >= containment_threshold)
+    )
+    keep = np.ones(len(cells), dtype=bool)
+    for i in np.argsort(-batch.areas(), kind="stable"):
+        if keep[i]:
+            # the larger cell wins, drop its smaller duplicates from other tiles
+            later = duplicate[i] & keep
+            later[i] = False
+            keep &= ~later
+    # tile by tile is not reading order, a column continues in the tile below
+    return sort_cells([cell for cell, kept in zip(cells, keep) if kept], page_width)
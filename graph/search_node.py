@@ -4,7 +4,7 @@ from langchain_core.messages import ToolMessage
 
 from graph.my_state import MultiModalRAGState
 from milvus_db.db_retriever import m_re
-from utils.embeddings_utils import local_gme_one
+from utils.embeddings_utils import cached_gme_one
 from utils.log_utils import log
 
 # 自定义是为了替代：由langgraph框架自带的ToolNode(有大模型动态传参)
@@ -61,12 +61,12 @@ def retriever_node(state:MultiModalRAGState):
         # 构建图像输入数据
         input_data = [{'image':state.get('input_image')}]
         # 获取图片向量
-        ok,embedding,status,retry_after= local_gme_one(input_data)
+        ok,embedding,status,retry_after= cached_gme_one(input_data)
         results = m_re.dense_search(embedding,limit=3)
     else:
         # 构建文本输入数据
         input_data = [{'text':state.get('input_text')}]
-        ok,embedding,status,retry_after= local_gme_one(input_data)
+        ok,embedding,status,retry_after= cached_gme_one(input_data)
         results = m_re.hybrid_search(embedding,state.get('input_text'),limit=3)
     log.info(f"从知识库中检索到结果：{results}")
 
@@ -3,7 +3,7 @@ from pymilvus import AnnSearchRequest, WeightedRanker
 
 from milvus_db.collections_ioerator import CONTEXT_COLLECTION_NAME, client
 from my_llm import zhipu_client
-from utils.embeddings_utils import local_gme_one
+from utils.embeddings_utils import cached_gme_one
 from utils.log_utils import log
 from evaluate.evaluate_self import rag_evaluator
 
@@ -22,7 +22,7 @@ async def search_context(query: str, user_name: str = None) -> str:
     # 构建文本输入数据
     input_data = [{'text': query}]
     # 获取嵌入向量
-    ok, embedding, _, _ = local_gme_one(input_data)
+    ok, embedding, _, _ = cached_gme_one(input_data)
     filter_expr = None
     if user_name:
         filter_expr = f'user == "{user_name}"'  # 过滤搜索
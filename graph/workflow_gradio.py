@@ -18,7 +18,7 @@ from graph.evaluate_node import evaluate_answer
 from graph.save_context import get_milvus_writer
 from graph.search_node import SearchContextToolNode, retriever_node
 from graph.tools import search_context, network_search
-from my_llm import multiModal_llm
+from my_llm import multiModal_llm, warm_up
 from utils.common_utils import draw_graph
 from utils.embeddings_utils import image_to_base64
 from utils.log_utils import log
@@ -414,4 +414,6 @@ with gr.Blocks(title='多模态RAG项目', theme=gr.themes.Soft(), css=css) as i
     )
 
 if __name__ == '__main__':
+    # 界面先启动，向量模型在后台加载
+    warm_up(background=True)
     instance.launch(debug=True)
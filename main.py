@@ -5,18 +5,20 @@ import gradio as gr
 from langchain_core.documents import Document
 
 from dots_ocr.parser import do_parse
+from dots_ocr.utils.layout_utils import render_layout_image
 from milvus_db.db_operator import do_save_to_milvus
+from my_llm import warm_up
 from splitters.splitter_md import MarkdownDirSplitter
-from utils.common_utils import (
-    delete_directory_if_non_empty,
-    get_filename,
-    get_sorted_md_files,
-)
+from utils.common_utils import get_filename
 from utils.env_utils import DOTS_OCR_IP, DOTS_OCR_PORT
 from utils.log_utils import log
 
 # md存储的临时模型
 base_md_dir = r"./output"
+# OCR结果缓存目录（按页面图像哈希），重复上传同一份PDF时跳过未变化的页面
+ocr_cache_dir = os.path.join(base_md_dir, "ocr_cache")
+# 图片区域的存储目录，OCR写入后切分和向量化直接按路径引用
+images_dir = os.path.join(base_md_dir, "images")
 
 
 class ProcessorAPP:
@@ -27,6 +29,9 @@ class ProcessorAPP:
         self.md_files = None
         self.md_dir = None
         self.file_contents = None
+        # 每页的解析结果(页面内容保存在内存中)，按md文件名索引
+        self.page_results = None
+        self.results = None
         self.splitter = None
 
     def upload_pdf(self, pdf_file):
@@ -47,31 +52,37 @@ class ProcessorAPP:
     def parse_pdf(self):
         """解析pdf文件，变成多个md文件"""
         md_files_dir = os.path.join(base_md_dir, get_filename(self.pdf_path, False))
-        # 删除
-        delete_directory_if_non_empty(md_files_dir)
-        do_parse(
+        results = do_parse(
             input_path=self.pdf_path,
             num_thread=32,
             no_fitz_preprocess=True,
             ip=DOTS_OCR_IP,
             port=DOTS_OCR_PORT,
+            cache_dir=ocr_cache_dir,
+            adaptive_concurrency=True,  # 32为并发上限，实际并发随服务端负载自适应调整
+            render_layout=False,  # 解析时不绘制布局图，在界面上查看某页时再按需绘制
+            result_sink="memory",  # 结果直接保存在内存中，不再写入和重新读取每页的md文件
+            image_dir=images_dir,  # 图片区域按内容哈希只写一次，md中按路径引用
+            resume=True,  # 按页保存检查点，中断后重新解析同一份PDF只处理缺失的页面
+            native_text=True,  # 带文本层的页面直接从PDF提取布局和文字，只有扫描页请求模型
+            priority="interactive",  # 界面上的解析优先于同进程中的批量入库请求
         )
-        if os.path.isdir(md_files_dir):
+        if results:
             self.md_dir = md_files_dir
-            log.info(f"MD files directory created: {md_files_dir}")
-            # 要先排序
-            self.md_files = get_sorted_md_files(self.md_dir)
-            self.md_files = [f for f in self.md_files if "nohf" in f]
+            self.results = results
+            # 结果已按页号排序
+            name = get_filename(self.pdf_path, False)
+            self.page_results = {
+                f"{name}_page_{r['page_no']}_nohf.md": r
+                for r in results
+                if "md_content_nohf" in r
+            }
+            self.md_files = list(self.page_results)
             log.info(f"PDF已解析，生成的MD文件列表：{self.md_files}")
 
-            self.file_contents = {}
-            for f in self.md_files:
-                try:
-                    with open(f, "r", encoding="utf-8") as file:
-                        self.file_contents[f] = file.read()
-                except Exception as e:
-                    log.error(f"读取文件 {f} 时出错：{e}")
-                    self.file_contents[f] = f"读取文件内容时出错：{e}"
+            self.file_contents = {
+                f: r["md_content_nohf"] for f, r in self.page_results.items()
+            }
             file_names = [os.path.basename(f) for f in self.md_files]
             return [
                 f"PDF解析成功！共{len(self.md_files)} 个MD文件",
@@ -96,7 +107,7 @@ class ProcessorAPP:
             ]
 
     def select_md_file(self, selected_file):
-        """选择一个md文件，并展示他的内容"""
+        """选择一个md文件，并展示他的内容和这一页的布局图"""
         log.info(f"选择文件：{selected_file}")
         if selected_file:
             show_file = None
@@ -106,22 +117,37 @@ class ProcessorAPP:
                     break
 
             if show_file and show_file in self.file_contents:
-                return self.file_contents[show_file]
+                return self.file_contents[show_file], self.load_layout_image(show_file)
             else:
-                return f"没有找到这个文件！"
+                return f"没有找到这个文件！", None
         else:
-            return "文件内容加载失败，选择文件不对!"
+            return "文件内容加载失败，选择文件不对!", None
+
+    def load_layout_image(self, md_file):
+        """按需绘制md文件对应页面的布局图，绘制结果缓存在结果中，下次直接返回"""
+        result = self.page_results[md_file]
+        if "layout_image" not in result:
+            try:
+                result["layout_image"] = render_layout_image(
+                    self.pdf_path,
+                    page_idx=result["page_no"],
+                    cells=result["layout_info"],
+                )
+            except Exception as e:
+                log.error(f"绘制布局图 {md_file} 时出错：{e}")
+                return None
+        return result["layout_image"]
 
     def save_to_knowledge(self):
         """存入知识库"""
-        if not self.md_dir:
+        if not self.results:
             return '请先解析PDF文件'
 
         self.splitter = MarkdownDirSplitter(
-            images_output_dir=os.path.join(base_md_dir, "images")
+            images_output_dir=images_dir
         )
 
-        result:list[Document] = self.splitter.process_md_dir(self.md_dir,self.pdf_path)
+        result:list[Document] = self.splitter.process_results(self.results,self.pdf_path)
 
         res: List[Dict] = do_save_to_milvus(result)
 
@@ -150,6 +176,8 @@ class ProcessorAPP:
                 )
                 # MD文件中的内容
                 content = gr.Textbox(label="文件内容", lines=20, interactive=False)
+                # 当前页的布局图，选择文件时才绘制
+                layout_image = gr.Image(label="页面布局", type="pil", interactive=False)
 
             save_btn = gr.Button("存入知识库", variant="secondary", interactive=False)
 
@@ -161,7 +189,9 @@ class ProcessorAPP:
                 fn=self.parse_pdf, outputs=[status, file_dropdown, parse_btn, save_btn]
             )
             file_dropdown.change(
-                fn=self.select_md_file, inputs=file_dropdown, outputs=content
+                fn=self.select_md_file,
+                inputs=file_dropdown,
+                outputs=[content, layout_image],
             )
 
             save_btn.click(fn=self.save_to_knowledge,inputs=[],outputs=status)
@@ -169,5 +199,7 @@ class ProcessorAPP:
 
 
 if __name__ == "__main__":
+    # 界面先启动，向量模型在后台加载
+    warm_up(background=True)
     app = ProcessorAPP()
     app.create_interface().launch()
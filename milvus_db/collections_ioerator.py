@@ -1,15 +1,18 @@
 from pymilvus import MilvusClient, DataType, Function, FunctionType
 
+from utils.lazy import LazyObject
+
 COLLECTION_NAME = 't_doc_collection'
 # 长期历史记录存储的集合名称
 CONTEXT_COLLECTION_NAME = 't_context_collection'
 
-client = MilvusClient(
+# 第一次使用时才连接Milvus，导入本模块不建立连接
+client = LazyObject(lambda: MilvusClient(
     uri="http://www.wlhcloud.top:9121",
     user="root",
     password="Milvus",
     # db_name="default",
-)
+), 'milvus client')
 
 
 def create_db_collection():
@@ -1,5 +1,4 @@
 import os
-import random
 
 from langchain_core.documents import Document
 from typing import List, Dict
@@ -10,10 +9,8 @@ from my_llm import multiModal_llm
 
 from milvus_db.collections_ioerator import COLLECTION_NAME, client
 from utils.common_utils import get_surrounding_text_content
-from utils.embeddings_utils import limiter, RETRY_ON_429, process_item_with_guard, MAX_429_RETRIES, \
-    BASE_BACKOFF, image_to_base64
+from utils.embeddings_utils import embed_items_batched, image_to_base64
 from utils.log_utils import log
-import time
 
 
 def doc_to_dict(docs: List[Document]) -> List[Dict]:
@@ -158,30 +155,13 @@ def do_save_to_milvus(processed_data: List[Document]):
     """
     expanded_data = generate_image_description(doc_to_dict(processed_data))
 
-    processed_data: List[Dict] = []
-    for idx, item in enumerate(expanded_data, start=1):
-        limiter.acquire()
-
-        if RETRY_ON_429:
-            attempts = 0
-            while True:
-                result = process_item_with_guard(item.copy())
-                if result.get('dense'):
-                    processed_data.append(result)
-                    break
-                attempts += 1
-                if attempts > MAX_429_RETRIES:
-                    print(f'[429重试] 超过最大重试次数，跳过idx={idx}')
-                    processed_data.append(result)
-                    break
-                backoff = BASE_BACKOFF * (2 ** (attempts - 1)) * (0.8 + random.random() * 0.4)
-                print(f"[429重试] 第{attempts}次, sleep {backoff:.2f}s ...")
-                time.sleep(backoff)
-        else:
-            result = process_item_with_guard(item.copy())
-            processed_data.append(result)
-        if idx % 20 == 0:
-            print(f"[进度] 已处理 {idx}/{len(expanded_data)}")
+    # 本地GME模型按批次向量化，没有远程API的限流和429退避
+    processed_data: List[Dict] = embed_items_batched(expanded_data)
+    failed = [item for item in processed_data if len(item.get('dense', [])) == 0]
+    if failed:
+        print(f"[向量化] {len(failed)}/{len(processed_data)} 条数据向量化失败，跳过写入")
+        processed_data = [item for item in processed_data if len(item.get('dense', [])) > 0]
+    print(f"[进度] 已向量化 {len(processed_data)}/{len(expanded_data)}")
 
     write_to_milvus(processed_data)
     return processed_data
@@ -1,17 +1,37 @@
+import threading
+
 from langchain_core.embeddings import Embeddings
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from numpy import ndarray
-from sentence_transformers import SentenceTransformer
-from zai import ZhipuAiClient
 
-from utils.env_utils import ALIBABA_API_KEY, ALIBABA_BASE_URL, ZHIPU_API_KEY, LOCAL_GME_MODEL_PATH, LOCAL_TEXT_EMB_PATH
+from utils.embedding_server import EmbeddingClient
+from utils.env_utils import ALIBABA_API_KEY, ALIBABA_BASE_URL, ZHIPU_API_KEY, LOCAL_GME_MODEL_PATH, LOCAL_TEXT_EMB_PATH, \
+    EMBEDDING_SERVER_URL
+from utils.lazy import LazyObject
+
+# 模型和网络客户端都在第一次使用时才创建，导入本模块不加载模型、不建立连接；
+# 需要提前加载时调用warm_up()
 
 
 class CustomQwen3Embeddings(Embeddings):
-    """自定义一个qwen3的Embedding和langchain整合的类"""
+    """自定义一个qwen3的Embedding和langchain整合的类，模型在第一次向量化时加载"""
 
     def __init__(self, model_name):
-        self.qwen3_embedding = SentenceTransformer(model_name)
+        self.model_name = model_name
+        self._qwen3_embedding = None
+        self._lock = threading.Lock()
+
+    @property
+    def qwen3_embedding(self):
+        if self._qwen3_embedding is None:
+            with self._lock:
+                if self._qwen3_embedding is None:
+                    if EMBEDDING_SERVER_URL:
+                        # 向量化服务中已加载的text模型
+                        self._qwen3_embedding = EmbeddingClient(EMBEDDING_SERVER_URL, 'text')
+                    else:
+                        from sentence_transformers import SentenceTransformer
+                        self._qwen3_embedding = SentenceTransformer(self.model_name)
+        return self._qwen3_embedding
 
     def embed_query(self, text: str) -> list[float]:
         return self.embed_documents([text])[0]
@@ -20,34 +40,71 @@ class CustomQwen3Embeddings(Embeddings):
         return self.qwen3_embedding.encode(texts)
 
 
-multiModal_llm = ChatOpenAI(# 多模态大模型
-    model='qwen3-vl-plus',
-    api_key=ALIBABA_API_KEY,
-    base_url=ALIBABA_BASE_URL,
-)
+def _chat_model(model):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=model,
+        api_key=ALIBABA_API_KEY,
+        base_url=ALIBABA_BASE_URL,
+    )
+
+
+def _openai_embedding():
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(
+        api_key=ALIBABA_API_KEY,
+        base_url=ALIBABA_BASE_URL,
+        model="text-embedding-v4",
+        check_embedding_ctx_length=False#关键参数
+    )
+
+
+def _zhipu_client():
+    from zai import ZhipuAiClient
+    return ZhipuAiClient(api_key= ZHIPU_API_KEY)  # 填写您自己的APIKey
+
 
-llm = ChatOpenAI(# 多模态大模型
-    model='qwen-vl-plus',
-    api_key=ALIBABA_API_KEY,
-    base_url=ALIBABA_BASE_URL,
-)
+def _gme_model():
+    # 设置了EMBEDDING_SERVER_URL时，通过向量化服务调用同一份GME模型，接口与SentenceTransformer.encode一致
+    if EMBEDDING_SERVER_URL:
+        return EmbeddingClient(EMBEDDING_SERVER_URL, 'gme')
+    from sentence_transformers import SentenceTransformer
+    # 方式1: 直接指定模型名并设置 cache_folder（如果模型已下载到本地，且结构符合 sentence-transformers 的预期）
+    return SentenceTransformer(
+        LOCAL_GME_MODEL_PATH, # 或者使用本地路径 model_path
+    )
 
-embedding = OpenAIEmbeddings(
-    api_key=ALIBABA_API_KEY,
-    base_url=ALIBABA_BASE_URL,
-    model="text-embedding-v4",
-    check_embedding_ctx_length=False#关键参数
-)
 
+multiModal_llm = LazyObject(lambda: _chat_model('qwen3-vl-plus'), 'multiModal_llm')  # 多模态大模型
 
-zhipu_client = ZhipuAiClient(api_key= ZHIPU_API_KEY)  # 填写您自己的APIKey
+llm = LazyObject(lambda: _chat_model('qwen-vl-plus'), 'llm')  # 多模态大模型
 
+embedding = LazyObject(_openai_embedding, 'embedding')
 
+zhipu_client = LazyObject(_zhipu_client, 'zhipu_client')
 
-# 方式1: 直接指定模型名并设置 cache_folder（如果模型已下载到本地，且结构符合 sentence-transformers 的预期）
-gme_st = SentenceTransformer(
-    LOCAL_GME_MODEL_PATH, # 或者使用本地路径 model_path
-)
+gme_st = LazyObject(_gme_model, 'gme_st')
 
 # 意图识别的小模型embedding
-text_emb = CustomQwen3Embeddings(LOCAL_TEXT_EMB_PATH)
\ No newline at end of file
+text_emb = CustomQwen3Embeddings(LOCAL_TEXT_EMB_PATH)
+
+
+def warm_up(background: bool = False):
+    """提前加载向量模型和创建客户端，避免第一个请求承担加载耗时
+
+    Args:
+        background: True时在后台线程加载，立即返回，界面可以先启动
+    Returns:
+        后台加载时返回线程对象，否则返回None
+    """
+    def _load():
+        for lazy_object in (gme_st, multiModal_llm, llm, embedding, zhipu_client):
+            lazy_object._setup()
+        text_emb.qwen3_embedding
+
+    if background:
+        thread = threading.Thread(target=_load, name='model-warm-up', daemon=True)
+        thread.start()
+        return thread
+    _load()
+    return None
@@ -40,6 +40,15 @@ def remove_base64_images(text: str) -> str:
     return re.sub(pattern=pattern, repl="", string=text)
 
 
+# OCR使用image_dir时，md中的图片按文件路径引用: ![](/path/to/<sha256>.png)
+IMAGE_PATH_PATTERN = r"!\[\]\((?!data:)([^)\n]+)\)"
+
+
+def remove_image_paths(text: str) -> str:
+    """移除所有按路径引用的图片标记"""
+    return re.sub(pattern=IMAGE_PATH_PATTERN, repl="", string=text)
+
+
 def add_title_hierarchy(
         documents: List[Document], source_filename: str
 ) -> List[Document]:
@@ -96,8 +105,21 @@ class MarkdownDirSplitter:
         )
 
     def process_images(self, content: str, source: str) -> List[Document]:
-        """处理Markdown中的base64图片"""
+        """处理Markdown中的图片(base64或文件路径)"""
         image_docs = []
+        # 按路径引用的图片已经由OCR写入文件，直接引用，不再解码和重新保存
+        for img_path in re.findall(IMAGE_PATH_PATTERN, content):
+            image_docs.append(
+                Document(
+                    page_content=img_path,
+                    metadata={
+                        "source": source,
+                        "alt_text": "图片",
+                        "embedding_type": "image",
+                    },
+                )
+            )
+
         pattern = r"data:image/(.*?);base64,(.*?)\)"  # 正则匹配base64图片
 
         def replace_image(match):
@@ -137,15 +159,21 @@ class MarkdownDirSplitter:
         """
         with open(md_file, "r", encoding="utf-8") as file:
             content = file.read()
+        return self.process_md_content(content, md_file)
+
+    def process_md_content(self, content: str, source: str) -> List[Document]:
+        """
+        处理一页md内容，source为图片Document记录的来源
+        """
         # 分割Markdown内容
         split_documents: List[Document] = self.text_splitter.split_text(content)
         documents = []
 
         for doc in split_documents:
             # 处理图片
-            if "![](data:image/png;base64" in doc.page_content:
-                image_docs: List[Document] = self.process_images(doc.page_content, md_file)
-                cleaned_content = remove_base64_images(doc.page_content)
+            if "![](" in doc.page_content:
+                image_docs: List[Document] = self.process_images(doc.page_content, source)
+                cleaned_content = remove_image_paths(remove_base64_images(doc.page_content))
                 if cleaned_content.strip():
                     doc.metadata["embedding_type"] = "text"
                     documents.append(
@@ -185,6 +213,32 @@ class MarkdownDirSplitter:
         # 添加标题层级
         return add_title_hierarchy(all_documents, source_filename)
 
+    def process_results(self, results: List[Dict], source_filename: str) -> List[Document]:
+        """
+        直接切割OCR解析返回的结果，不再读取md文件目录
+
+        memory和records结果自带md_content_nohf；directory结果只有md_content_nohf_path，从该文件读取
+
+        :param results: do_parse返回的每页结果，按页号排序
+        :param source_filename: md 数据的源文件（pdf）
+        :return:
+        """
+        name = os.path.splitext(os.path.basename(source_filename))[0]
+        all_documents = []
+
+        for result in results:
+            md_content = result.get("md_content_nohf")
+            if md_content is None and result.get("md_content_nohf_path"):
+                with open(result["md_content_nohf_path"], "r", encoding="utf-8") as f:
+                    md_content = f.read()
+            if md_content is None:
+                continue  # 没有markdown的页面，例如只做版面检测
+            page_name = f"{name}_page_{result['page_no']}_nohf.md"
+            log.info(f"正在处理的页面: {page_name}")
+            all_documents.extend(self.process_md_content(md_content, page_name))
+        # 添加标题层级
+        return add_title_hierarchy(all_documents, source_filename)
+
 
 if __name__ == "__main__":
     md_dir = (
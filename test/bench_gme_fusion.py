@@ -0,0 +1,108 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from utils import embeddings_utils
+from utils.embeddings_utils import encode_gme_fused, local_gme_one
+
+
+# ===== 旧版 local_gme_one（对照组）：[文本, 图片]分开编码，只返回文本向量并转成list =====
+def legacy_local_gme_one(text, image):
+    embedding = embeddings_utils.gme_st.encode([text, image], convert_to_tensor=True)
+    return embedding[0].tolist()
+
+
+def load_pairs(path, limit):
+    """读取图文对，jsonl每行 {"image": 图片路径, "text": 图片描述}"""
+    pairs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                pairs.append(json.loads(line))
+    return pairs[:limit]
+
+
+def load_queries(path):
+    """读取文本查询，jsonl每行 {"query": 查询文本, "image": 期望命中的图片路径}"""
+    if not path:
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def bench_latency(pairs, batch_size, modes):
+    print(f"\n编码耗时 ({len(pairs)} 个图文项)")
+    start = time.perf_counter()
+    for pair in pairs:
+        legacy_local_gme_one(pair["text"], pair["image"])
+    print(f"{'legacy (逐条, tolist)':<28}{(time.perf_counter() - start) * 1000 / len(pairs):>10.1f} ms/item")
+
+    for mode in modes:
+        embeddings_utils.GME_FUSION_MODE = mode
+        start = time.perf_counter()
+        for pair in pairs:
+            local_gme_one([{"text": pair["text"], "factor": 1}, {"image": pair["image"], "factor": 1}])
+        single = (time.perf_counter() - start) * 1000 / len(pairs)
+        start = time.perf_counter()
+        for i in range(0, len(pairs), batch_size):
+            batch = pairs[i:i + batch_size]
+            encode_gme_fused([p["text"] for p in batch], [p["image"] for p in batch], mode=mode)
+        batched = (time.perf_counter() - start) * 1000 / len(pairs)
+        print(f"{mode:<28}{single:>10.1f} ms/item (逐条){batched:>10.1f} ms/item (batch={batch_size})")
+
+
+def recall_at_k(corpus, queries, targets, k):
+    """查询向量与库向量做内积检索，统计目标项出现在前k个结果中的比例"""
+    scores = queries @ corpus.T
+    top_k = np.argsort(-scores, axis=1)[:, :k]
+    return float(np.mean([target in row for row, target in zip(top_k, targets)]))
+
+
+def bench_recall(pairs, text_queries, batch_size, k, modes):
+    images = [p["image"] for p in pairs]
+    texts = [p["text"] for p in pairs]
+    index = {image: i for i, image in enumerate(images)}
+
+    # 查询与retriever_node一致：纯图片查询直接编码图片，文本查询直接编码文本
+    gme_st = embeddings_utils.gme_st
+    # 图片要包成{'image': 路径}，否则查询和库里的路径字符串按文本匹配，召回虚高
+    image_queries = np.asarray(gme_st.encode([{'image': image} for image in images], batch_size=batch_size),
+                               dtype=np.float32)
+    query_sets = [("图片查询", image_queries, list(range(len(pairs))))]
+    text_queries = [q for q in text_queries if q["image"] in index]
+    if text_queries:
+        vectors = np.asarray(gme_st.encode([q["query"] for q in text_queries], batch_size=batch_size),
+                             dtype=np.float32)
+        query_sets.append(("文本查询", vectors, [index[q["image"]] for q in text_queries]))
+
+    print(f"\n检索召回 Recall@{k} ({len(pairs)} 个图文项)")
+    for mode in modes:
+        corpus = np.concatenate([
+            encode_gme_fused(texts[i:i + batch_size], images[i:i + batch_size], mode=mode)
+            for i in range(0, len(pairs), batch_size)
+        ])
+        line = "".join(
+            f"{name} {recall_at_k(corpus, vectors, targets, k):>6.3f}    "
+            for name, vectors, targets in query_sets
+        )
+        # text 模式即旧行为：入库向量只有图片描述的文本向量
+        print(f"{mode + (' (legacy)' if mode == 'text' else ''):<20}{line}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GME图文融合向量的编码耗时与检索召回基准测试")
+    parser.add_argument("pairs", type=str, help="图文对jsonl，每行 {\"image\": 路径, \"text\": 描述}")
+    parser.add_argument("--queries", type=str, default=None,
+                        help="可选的文本查询jsonl，每行 {\"query\": 文本, \"image\": 期望命中的图片}")
+    parser.add_argument("--limit", type=int, default=200, help="最多使用的图文对数量")
+    parser.add_argument("--batch_size", type=int, default=16)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--skip_joint", action="store_true", help="模型不支持图文联合输入时跳过joint模式")
+    args = parser.parse_args()
+
+    pairs = load_pairs(args.pairs, args.limit)
+    modes = ["text", "weighted"] if args.skip_joint else ["text", "weighted", "joint"]
+    bench_latency(pairs, args.batch_size, modes)
+    bench_recall(pairs, load_queries(args.queries), args.batch_size, args.k, modes)
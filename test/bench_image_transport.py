@@ -0,0 +1,95 @@
+import argparse
+import difflib
+import time
+from typing import List
+
+from dots_ocr.inference import inference_with_vllm
+from dots_ocr.utils.doc_utils import iter_images_from_pdf
+from dots_ocr.utils.image_utils import PILimage_to_base64, fetch_image
+from dots_ocr.utils.prompts import dict_promptmode_to_prompt
+from utils.env_utils import DOTS_OCR_IP, DOTS_OCR_PORT
+
+# (格式, 质量) 组合，第一个为当前默认的无损PNG，作为基准
+TRANSPORT_MODES = [
+    ("PNG", None),
+    ("JPEG", 95),
+    ("JPEG", 85),
+    ("WEBP", 90),
+    ("WEBP", 80),
+]
+
+
+def load_pages(pdf_path: str, max_pages: int, dpi: int = 200) -> List:
+    pages = []
+    for idx, image in iter_images_from_pdf(pdf_path, dpi=dpi):
+        if idx >= max_pages:
+            break
+        pages.append(fetch_image(image))
+    return pages
+
+
+def bench_encode(pages, repeat: int = 3):
+    """统计每种编码方式的单页编码耗时和payload大小"""
+    print(f"{'mode':<12}{'encode ms/page':>16}{'payload KB/page':>18}{'vs PNG':>10}")
+    baseline_size = None
+    for fmt, quality in TRANSPORT_MODES:
+        sizes = []
+        start = time.perf_counter()
+        for _ in range(repeat):
+            sizes = [len(PILimage_to_base64(p, format=fmt, quality=quality)) for p in pages]
+        elapsed = (time.perf_counter() - start) / repeat / len(pages)
+        size = sum(sizes) / len(sizes)
+        baseline_size = baseline_size or size
+        name = f"{fmt}" + (f"@{quality}" if quality else "")
+        print(f"{name:<12}{elapsed * 1000:>16.1f}{size / 1024:>18.1f}{size / baseline_size:>10.2f}")
+
+
+def bench_ocr(pages, ip: str, port: int, model_name: str, prompt_mode: str):
+    """用每种编码方式请求OCR服务，和PNG的输出做文本相似度比较"""
+    prompt = dict_promptmode_to_prompt[prompt_mode]
+    outputs = {}
+    for fmt, quality in TRANSPORT_MODES:
+        start = time.perf_counter()
+        outputs[(fmt, quality)] = [
+            inference_with_vllm(
+                p,
+                prompt,
+                ip=ip,
+                port=port,
+                model_name=model_name,
+                image_format=fmt,
+                image_quality=quality,
+            )
+            or ""
+            for p in pages
+        ]
+        elapsed = (time.perf_counter() - start) / len(pages)
+        baseline = outputs[TRANSPORT_MODES[0]]
+        ratios = [
+            difflib.SequenceMatcher(None, a, b).ratio()
+            for a, b in zip(baseline, outputs[(fmt, quality)])
+        ]
+        identical = sum(a == b for a, b in zip(baseline, outputs[(fmt, quality)]))
+        name = f"{fmt}" + (f"@{quality}" if quality else "")
+        print(
+            f"{name:<12} request {elapsed:.2f}s/page, "
+            f"similarity to PNG {min(ratios):.3f}(min) {sum(ratios) / len(ratios):.3f}(avg), "
+            f"identical pages {identical}/{len(pages)}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="页面图片传输编码的基准测试")
+    parser.add_argument("pdf_path", type=str, help="样例PDF")
+    parser.add_argument("--pages", type=int, default=5, help="参与测试的页数")
+    parser.add_argument("--ocr", action="store_true", help="同时请求OCR服务比较输出一致性")
+    parser.add_argument("--ip", type=str, default=DOTS_OCR_IP or "localhost")
+    parser.add_argument("--port", type=int, default=int(DOTS_OCR_PORT or 8000))
+    parser.add_argument("--model_name", type=str, default="dots_ocr")
+    parser.add_argument("--prompt", type=str, default="prompt_layout_all_en")
+    args = parser.parse_args()
+
+    sample_pages = load_pages(args.pdf_path, args.pages)
+    bench_encode(sample_pages)
+    if args.ocr:
+        bench_ocr(sample_pages, args.ip, args.port, args.model_name, args.prompt)
@@ -0,0 +1,131 @@
+import argparse
+import contextlib
+import io
+import json
+import random
+import re
+import time
+
+from dots_ocr.utils.output_cleaner import OutputCleaner
+
+
+# ===== 旧版字符串清洗流程（对照组），与优化前 OutputCleaner.clean_string_data 的算法保持一致 =====
+LEGACY_DICT_PATTERN = re.compile(r'\{[^{}]*?"bbox"\s*:\s*\[[^\]]*?\][^{}]*?\}', re.DOTALL)
+LEGACY_MISSING_DELIMITER_PATTERN = re.compile(r'\}\s*\{(?!")')
+
+
+def legacy_clean_string(text):
+    text = LEGACY_MISSING_DELIMITER_PATTERN.sub("},{", text)
+
+    if len(text) > 50000 or not text.strip().endswith("]"):
+        if text.count('{"bbox":') > 1:
+            last_bbox_pos = text.rfind('{"bbox":')
+            if last_bbox_pos > 0:
+                text = text[:last_bbox_pos].rstrip()
+                if text.endswith(","):
+                    text = text[:-1]
+
+    dict_strings = [m.group() for m in LEGACY_DICT_PATTERN.finditer(text)]
+    unique_dicts = list(dict.fromkeys(dict_strings))
+    if len(unique_dicts) < len(dict_strings):
+        text = "[" + ", ".join(unique_dicts) + "]"
+
+    text = text.strip()
+    if not text.startswith("["):
+        text = "[" + text
+    if not text.endswith("]"):
+        text = text.rstrip(",").rstrip() + "]"
+
+    try:
+        data = json.loads(text)
+        if isinstance(data, list):
+            return data
+    except RecursionError:
+        # 旧版在 clean_string_data 外层捕获，按清洗失败处理
+        return []
+    except json.JSONDecodeError:
+        valid_dicts = []
+        for m in LEGACY_DICT_PATTERN.finditer(text):
+            try:
+                valid_dicts.append(json.loads(m.group()))
+            except json.JSONDecodeError:
+                continue
+        return valid_dicts
+    return None
+
+
+# ===== 测试语料：模拟vLLM输出的布局JSON =====
+CATEGORIES = ["Text", "Section-header", "List-item", "Table", "Formula", "Caption"]
+
+
+def make_cell(rng, i):
+    x0, y0 = rng.randint(0, 1200), rng.randint(0, 1600)
+    text = "".join(rng.choice("版面分析 layout {x} \"q\" \\n $a_{i}$ ") for _ in range(rng.randint(20, 400)))
+    return {
+        "bbox": [x0, y0, x0 + rng.randint(10, 400), y0 + rng.randint(10, 200)],
+        "category": rng.choice(CATEGORIES),
+        "text": text,
+    }
+
+
+def dumps_cells(cells):
+    return "[" + ", ".join(json.dumps(c, ensure_ascii=False) for c in cells) + "]"
+
+
+def build_corpus(seed, max_chars):
+    """截断、重复、缺失分隔符等典型的失败输出，长度接近16k token的上限"""
+    rng = random.Random(seed)
+    cells = [make_cell(rng, i) for i in range(400)]
+    full = dumps_cells(cells)[:max_chars]
+
+    corpus = {}
+    # 输出在token上限处被截断，最后一个元素不完整
+    corpus["truncated"] = full[: max_chars - 7]
+    # 模型陷入循环，同一个元素重复到token上限
+    loop = json.dumps(cells[0], ensure_ascii=False)
+    corpus["repeated"] = "[" + ", ".join(json.dumps(c, ensure_ascii=False) for c in cells[:5])
+    corpus["repeated"] = (corpus["repeated"] + (", " + loop) * (max_chars // len(loop)))[:max_chars]
+    # 元素之间缺少逗号
+    corpus["missing_delimiter"] = dumps_cells(cells[:60]).replace("}, {", "} {")
+    # 一个超长的文本元素被截断在字符串内部，且文本中夹杂大括号
+    long_text = "{" * (max_chars // 4) + "x" * (max_chars // 2)
+    corpus["truncated_long_text"] = ('[{"bbox": [1, 2, 3, 4], "category": "Text", "text": "' + long_text)[:max_chars]
+    # 重复的元素之间穿插没有bbox的大括号文本，制造大量回溯
+    corpus["unbalanced_braces"] = ('[{"bbox": [1, 2, 3, 4], "category": "Text", "text": "' + "{a} " * (max_chars // 8) + '"}, ') * 2
+    # 模型循环输出未闭合的bbox，旧版正则从每个"{"出发都要扫描到文本末尾
+    corpus["unclosed_bbox_loop"] = ('[{"bbox": [1, 2, 3, 4], "category": "Text", "text": "a"}, ' + '{"bbox": [120, 340, ' * (max_chars // 20))[:max_chars]
+    return corpus
+
+
+def timed(func, text, repeat):
+    elapsed = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = func(text)
+            elapsed.append(time.perf_counter() - start)
+    return max(elapsed), result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="布局JSON清洗(OutputCleaner)的最坏单页耗时")
+    parser.add_argument("--max_chars", type=int, default=60000, help="单页输出长度，16k token约为5-6万字符")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    cleaner = OutputCleaner()
+    corpus = build_corpus(args.seed, args.max_chars)
+
+    print(f"{'case':<22}{'chars':>8}{'legacy ms':>12}{'cells':>7}{'scanner ms':>12}{'cells':>7}")
+    worst_legacy = worst_scanner = 0.0
+    for name, text in corpus.items():
+        t_legacy, legacy_cells = timed(legacy_clean_string, text, args.repeat)
+        t_scanner, cells = timed(lambda t: cleaner.clean_string_data(t, case_id=0).cleaned_data, text, args.repeat)
+        worst_legacy = max(worst_legacy, t_legacy)
+        worst_scanner = max(worst_scanner, t_scanner)
+        print(
+            f"{name:<22}{len(text):>8}{t_legacy * 1000:>12.1f}{len(legacy_cells or []):>7}"
+            f"{t_scanner * 1000:>12.1f}{len(cells):>7}"
+        )
+    print(f"{'worst case':<30}{worst_legacy * 1000:>12.1f}{'':>7}{worst_scanner * 1000:>12.1f}")
@@ -0,0 +1,104 @@
+import argparse
+import time
+import tracemalloc
+from io import BytesIO
+
+import fitz
+from PIL import Image
+
+from dots_ocr.utils.doc_utils import fitz_doc_to_image
+from dots_ocr.utils.image_utils import fetch_image, get_image_by_fitz_doc, smart_resize
+from dots_ocr.utils.consts import IMAGE_FACTOR, MIN_PIXELS, MAX_PIXELS
+
+
+# ===== 旧版预处理流程（对照组），与优化前 dots_ocr 中的实现保持一致 =====
+def legacy_fitz_doc_to_image(page, target_dpi=200):
+    pm = page.get_pixmap(matrix=fitz.Matrix(target_dpi / 72, target_dpi / 72), alpha=False)
+    if pm.width > 4500 or pm.height > 4500:
+        pm = page.get_pixmap(matrix=fitz.Matrix(1, 1), alpha=False)
+    return Image.frombytes("RGB", (pm.width, pm.height), pm.samples)
+
+
+def legacy_fetch_image(image, min_pixels=None, max_pixels=None):
+    image = image.convert("RGB")
+    if min_pixels or max_pixels:
+        height, width = smart_resize(
+            image.height,
+            image.width,
+            factor=IMAGE_FACTOR,
+            min_pixels=min_pixels or MIN_PIXELS,
+            max_pixels=max_pixels or MAX_PIXELS,
+        )
+        image = image.resize((width, height))
+    return image
+
+
+def legacy_get_image_by_fitz_doc(image, target_dpi=200):
+    data_bytes = BytesIO()
+    image.save(data_bytes, format="PNG")
+    pdf_bytes = fitz.open(stream=data_bytes).convert_to_pdf()
+    doc = fitz.open("pdf", pdf_bytes)
+    return legacy_fitz_doc_to_image(doc[0], target_dpi=target_dpi)
+
+
+# ===== 测试工具 =====
+def measure(name, func, inputs):
+    """统计单页耗时、单页新建的PIL图像缓冲区数量、Python层面的内存峰值"""
+    stats_before = Image.core.get_stats()["new_count"]
+    tracemalloc.start()
+    start = time.perf_counter()
+    for item in inputs:
+        func(item)
+    elapsed = (time.perf_counter() - start) / len(inputs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    buffers = (Image.core.get_stats()["new_count"] - stats_before) / len(inputs)
+    print(f"{name:<34}{elapsed * 1000:>10.1f} ms/page{buffers:>8.1f} images/page{peak / 1024 / 1024:>10.1f} MB peak")
+
+
+def bench_pdf_pages(doc, max_pages, dpi, max_pixels):
+    pages = [doc[i] for i in range(min(max_pages, doc.page_count))]
+    print(f"\nPDF页面 -> 模型输入 ({len(pages)} 页, dpi={dpi}, max_pixels={max_pixels})")
+    measure(
+        "legacy",
+        lambda p: legacy_fetch_image(legacy_fitz_doc_to_image(p, dpi), max_pixels=max_pixels),
+        pages,
+    )
+    measure(
+        "single pass",
+        lambda p: fetch_image(fitz_doc_to_image(p, target_dpi=dpi), max_pixels=max_pixels),
+        pages,
+    )
+
+
+def bench_fitz_preprocess(doc, max_pages, dpi, max_pixels):
+    # 用72dpi渲染模拟低分辨率的图片输入
+    images = [fitz_doc_to_image(doc[i], target_dpi=72) for i in range(min(max_pages, doc.page_count))]
+    print(f"\n图片输入 fitz_preprocess ({len(images)} 张, dpi={dpi}, max_pixels={max_pixels})")
+    measure(
+        "legacy (PNG -> PDF -> pixmap)",
+        lambda im: legacy_fetch_image(
+            legacy_get_image_by_fitz_doc(legacy_fetch_image(im), dpi), max_pixels=max_pixels
+        ),
+        images,
+    )
+    measure(
+        "single pass",
+        lambda im: get_image_by_fitz_doc(
+            fetch_image(im), target_dpi=dpi, max_pixels=max_pixels
+        ),
+        images,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="单页图像预处理的CPU/内存基准测试")
+    parser.add_argument("pdf_path", type=str, help="样例PDF")
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--dpi", type=int, default=200)
+    parser.add_argument("--max_pixels", type=int, default=None)
+    args = parser.parse_args()
+
+    with fitz.open(args.pdf_path) as pdf:
+        bench_pdf_pages(pdf, args.pages, args.dpi, args.max_pixels)
+        bench_fitz_preprocess(pdf, args.pages, args.dpi, args.max_pixels)
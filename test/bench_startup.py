@@ -0,0 +1,53 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["main", "graph.workflow_gradio"]
+
+# 在子进程中导入模块，eager模式导入后立即warm_up()，等价于改造前导入即加载全部模型和客户端
+CHILD_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+imported = time.perf_counter() - start
+if {eager}:
+    import my_llm
+    my_llm.warm_up()
+total = time.perf_counter() - start
+print(json.dumps({{"import": imported, "total": total,
+                  "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def measure(module, eager):
+    """在干净的子进程中计时，返回 (导入耗时s, 含模型加载的总耗时s, 内存峰值MB)"""
+    env = dict(os.environ, PYTHONPATH=PROJECT_DIR)
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT.format(module=module, eager=eager)],
+        capture_output=True,
+        text=True,
+        cwd=PROJECT_DIR,
+        env=env,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return result["import"], result["total"], result["rss_mb"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="应用入口的启动耗时和内存基准测试：延迟加载 vs 导入即加载模型")
+    parser.add_argument("--modules", nargs="+", default=MODULES, help="要测试的入口模块")
+    parser.add_argument("--repeat", type=int, default=3, help="取多次中最快的一次，减少抖动")
+    args = parser.parse_args()
+
+    print(f"{'module':<26}{'mode':<8}{'import':>10}{'ready':>10}{'peak RSS':>12}")
+    for module in args.modules:
+        for eager in (False, True):
+            runs = [measure(module, eager) for _ in range(args.repeat)]
+            imported, total, rss = min(runs, key=lambda run: run[1])
+            print(f"{module:<26}{'eager' if eager else 'lazy':<8}{imported:>9.2f}s{total:>9.2f}s{rss:>9.0f} MB")
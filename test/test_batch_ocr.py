@@ -1,6 +1,8 @@
 import os
 from typing import List, Dict
 
+from dots_ocr.batch import BatchIngest, list_pdf_files
+from dots_ocr.dots_parser import DotsOCRParser
 from dots_ocr.parser import do_parse
 from utils.common_utils import get_filename
 from utils.env_utils import DOTS_OCR_PORT, DOTS_OCR_IP
@@ -80,18 +82,31 @@ def _convert_parse(results: List[Dict]):
 
 
 def parse_batch_pdf(dir: str):
-    """解析pdf文件，变成多个md文件"""
-
-    for file in os.listdir(dir):
-        if file.endswith(".pdf"):
-            filepath = os.path.join(dir, file)
-            result = parse_pdf_one(filepath)
-            conver_resp = _convert_parse(result)
-
-            os.makedirs(os.path.join(dir, 'markdown'), exist_ok=True)
-            md_output_path = os.path.join(dir, 'markdown',f"{get_filename(file,False)}.md")
-            with open(md_output_path, "w", encoding="utf-8") as f:
-                f.write(conver_resp.get("combined_md_content", ""))
+    """解析pdf文件，变成多个md文件
+
+    所有pdf的页面共用一个线程池，前一个文件的最后几页和后一个文件的前几页同时解析；
+    每个文件解析完成后立即写出合并的md，中断后重新运行会跳过已完成的文件
+    """
+    os.makedirs(os.path.join(dir, 'markdown'), exist_ok=True)
+
+    def on_document_done(filepath, results, error):
+        if error is not None:
+            return
+        conver_resp = _convert_parse(results)
+        md_output_path = os.path.join(dir, 'markdown', f"{get_filename(filepath, False)}.md")
+        with open(md_output_path, "w", encoding="utf-8") as f:
+            f.write(conver_resp.get("combined_md_content", ""))
+
+    with DotsOCRParser(
+        ip=DOTS_OCR_IP,
+        port=DOTS_OCR_PORT,
+        model_name="dots_ocr",
+        num_thread=32,
+        priority="bulk",  # 批量入库让位于界面上的交互解析
+    ) as dots_ocr_parser:
+        BatchIngest(dots_ocr_parser, on_document_done=on_document_done).run(
+            list_pdf_files(dir)
+        )
 
     # result = parse_pdf_one("")
 
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+
+from utils import embeddings_utils
+from utils.embeddings_utils import encode_gme_fused, local_gme_one
+from utils.env_utils import LOCAL_GME_MODEL_PATH
+
+
+class FakeGME:
+    """按输入类型返回不同向量：字符串是文本，{'image': ...}是图片"""
+
+    def encode(self, inputs, batch_size=32, **kwargs):
+        vectors = []
+        for item in inputs:
+            if isinstance(item, dict) and 'image' in item:
+                vectors.append([0.0, 1.0, len(item['image'])])
+            else:
+                vectors.append([1.0, 0.0, len(item)])
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def test_weighted_encodes_images_as_images(monkeypatch):
+    fake = FakeGME()
+    monkeypatch.setattr(embeddings_utils, 'gme_st', fake)
+    path = '/data/images/figure.png'
+    # text_weight=0 时融合结果就是图片那一半
+    image_half = encode_gme_fused(['图1 描述'], [path], text_weight=0, mode='weighted')[0]
+    as_text = embeddings_utils._normalize(fake.encode([path]))[0]
+    as_image = embeddings_utils._normalize(fake.encode([{'image': path}]))[0]
+    assert not np.allclose(image_half, as_text)
+    assert np.allclose(image_half, as_image)
+    # 纯图片查询同样按图片编码
+    _, query, _, _ = local_gme_one([{'image': path}])
+    assert np.allclose(query, fake.encode([{'image': path}])[0])
+
+
+def test_weighted_image_half_with_gme(tmp_path):
+    import pytest
+
+    if not LOCAL_GME_MODEL_PATH or not os.path.isdir(LOCAL_GME_MODEL_PATH):
+        pytest.skip(f"没有GME模型: {LOCAL_GME_MODEL_PATH}")
+    from PIL import Image, ImageDraw
+
+    path = str(tmp_path / "figure.png")
+    image = Image.new("RGB", (448, 448), "white")
+    ImageDraw.Draw(image).rectangle((64, 64, 384, 384), outline="red", width=8)
+    image.save(path)
+
+    image_half = encode_gme_fused(['红色方框'], [path], text_weight=0, mode='weighted')[0]
+    as_text = embeddings_utils._normalize(
+        np.asarray(embeddings_utils.gme_st.encode([path]), dtype=np.float32))[0]
+    # 图片向量与路径字符串的文本向量应明显不同
+    assert float(image_half @ as_text) < 0.99
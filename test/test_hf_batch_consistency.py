@@ -0,0 +1,75 @@
+import argparse
+import os
+
+from dots_ocr.utils.prompts import dict_promptmode_to_prompt
+
+# 批量生成和逐页生成必须逐字一致：左填充和process_vision_info的批量处理最容易出错，
+# 需要真实的DotsOCR权重，默认路径与load_hf_model一致，可用环境变量DOTS_OCR_WEIGHTS覆盖
+WEIGHTS_PATH = os.environ.get("DOTS_OCR_WEIGHTS", "./weights/DotsOCR")
+# 两页尺寸不同，批量时短的一页会被左填充
+PAGE_SIZES = [(1000, 1400), (1400, 2000)]
+
+
+def make_pages(sizes=PAGE_SIZES):
+    """生成尺寸不同、带文字的页面图片"""
+    from PIL import Image, ImageDraw
+
+    pages = []
+    for i, (width, height) in enumerate(sizes):
+        image = Image.new("RGB", (width, height), "white")
+        draw = ImageDraw.Draw(image)
+        draw.text((60, 50), f"Section {i + 1}", fill="black")
+        for line in range(height // 80 - 2):
+            draw.text((60, 120 + line * 60), f"Line {line + 1} of page {i + 1}, size {width}x{height}.", fill="black")
+        pages.append(image)
+    return pages
+
+
+def compare_batched(weights_path, prompt_mode="prompt_layout_all_en", max_new_tokens=2048, device_map="auto",
+                    attn_implementation="flash_attention_2"):
+    """用同一个模型分别逐页生成和一次批量生成，返回 (逐页结果, 批量结果)"""
+    from dots_ocr.hf_inference import load_hf_model, HFBatchGenerator
+
+    model, processor, process_vision_info = load_hf_model(
+        weights_path, attn_implementation=attn_implementation, device_map=device_map)
+    # 贪心解码，两种方式的输出才可比较
+    model.generation_config.do_sample = False
+    generator = HFBatchGenerator(model, processor, process_vision_info, max_new_tokens=max_new_tokens)
+
+    pages = make_pages()
+    prompts = [dict_promptmode_to_prompt[prompt_mode]] * len(pages)
+    unbatched = [generator.generate_batch([page], [prompt])[0] for page, prompt in zip(pages, prompts)]
+    batched = generator.generate_batch(pages, prompts)
+    return unbatched, batched
+
+
+def test_hf_batch_matches_unbatched():
+    import pytest
+
+    if not os.path.isdir(WEIGHTS_PATH):
+        pytest.skip(f"没有DotsOCR权重: {WEIGHTS_PATH}")
+    pytest.importorskip("torch")
+    unbatched, batched = compare_batched(WEIGHTS_PATH)
+    for i, (single, batch) in enumerate(zip(unbatched, batched)):
+        assert single == batch, f"第{i}页批量生成与逐页生成不一致"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="检查DotsOCR的批量生成与逐页生成输出一致")
+    parser.add_argument("--weights", type=str, default=WEIGHTS_PATH, help="DotsOCR权重目录")
+    parser.add_argument("--prompt_mode", type=str, default="prompt_layout_all_en", choices=list(dict_promptmode_to_prompt))
+    parser.add_argument("--max_new_tokens", type=int, default=2048)
+    parser.add_argument("--device_map", type=str, default="auto")
+    parser.add_argument("--attn_implementation", type=str, default="flash_attention_2")
+    args = parser.parse_args()
+
+    unbatched, batched = compare_batched(args.weights, args.prompt_mode, args.max_new_tokens, args.device_map,
+                                         args.attn_implementation)
+    same = True
+    for i, (single, batch) in enumerate(zip(unbatched, batched)):
+        ok = single == batch
+        same &= ok
+        print(f"{'SAME' if ok else 'DIFF'} page {i} {PAGE_SIZES[i][0]}x{PAGE_SIZES[i][1]}")
+        if not ok:
+            print(f"  unbatched: {single[:300]!r}\n  batched:   {batch[:300]!r}")
+    raise SystemExit(0 if same else 1)
@@ -0,0 +1,72 @@
+import argparse
+import os
+import subprocess
+import sys
+
+
+# 导入这些模块时不应加载的重依赖，它们只在真正解析页面时才按需导入
+HEAVY_MODULES = ["fitz", "pymupdf", "openai", "PIL", "numpy", "tqdm", "pydantic", "requests"]
+ENTRY_MODULES = ["dots_ocr.dots_parser", "dots_ocr.parser", "dots_ocr.batch"]
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time(module):
+    """在干净的子进程中用 -X importtime 导入模块，返回 (dots_ocr部分的累计耗时ms, 已导入的模块集合)"""
+    env = dict(os.environ, PYTHONPATH=PROJECT_DIR)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=PROJECT_DIR,
+        env=env,
+        check=True,
+    )
+    total_us, imported = 0, set()
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # 表头
+        imported.add(name.strip())
+        # 顶层条目只有一个前导空格，其累计耗时已包含它引入的全部子模块
+        if name.startswith(" dots_ocr") and not name.startswith("  "):
+            total_us += int(cumulative)
+    return total_us / 1000, imported
+
+
+def check_import_budget(budget_ms=300, repeat=3):
+    """逐个入口模块检查导入耗时和重依赖，打印结果，返回超出预算的模块列表"""
+    failed = []
+    for module in ENTRY_MODULES:
+        runs = [import_time(module) for _ in range(repeat)]
+        elapsed = min(ms for ms, _ in runs)
+        heavy = sorted(
+            m for m in HEAVY_MODULES if any(m in imported for _, imported in runs)
+        )
+        ok = elapsed <= budget_ms and not heavy
+        if not ok:
+            failed.append(module)
+        print(
+            f"{'OK  ' if ok else 'FAIL'} {module:<24}{elapsed:>8.1f} ms"
+            + (f"  heavy imports: {', '.join(heavy)}" if heavy else "")
+        )
+    return failed
+
+
+def test_import_budget():
+    # 供pytest收集，预算与命令行默认值一致
+    failed = check_import_budget()
+    assert not failed, f"import budget exceeded: {', '.join(failed)}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="dots_ocr入口模块的导入耗时预算，防止重依赖回到模块顶层")
+    parser.add_argument("--budget_ms", type=float, default=300, help="每个入口模块的导入耗时上限")
+    parser.add_argument("--repeat", type=int, default=3, help="取多次导入中最快的一次，减少抖动")
+    args = parser.parse_args()
+
+    if check_import_budget(args.budget_ms, args.repeat):
+        print(f"import budget exceeded ({args.budget_ms} ms, no {', '.join(HEAVY_MODULES)})")
+        sys.exit(1)
@@ -0,0 +1,105 @@
+import os
+import signal
+import subprocess
+import sys
+
+from dots_ocr.utils.checkpoint import PageCheckpoint
+from dots_ocr.utils.result_sink import RecordFileResultSink
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NUM_PAGES = 40
+KILL_AFTER = 14
+
+# 子进程按解析器的顺序写页面：先write_page，再checkpoint.record；写完每页打印页号，
+# 父进程在KILL_AFTER页后SIGKILL它，模拟中断的解析
+CHILD_SCRIPT = """
+import sys, time
+from dots_ocr.utils.checkpoint import PageCheckpoint
+from dots_ocr.utils.result_sink import RecordFileResultSink
+save_dir, input_path, num_pages = sys.argv[1], sys.argv[2], int(sys.argv[3])
+checkpoint = PageCheckpoint(save_dir, "doc", input_path, {"prompt_mode": "test"})
+checkpoint.load()
+sink = RecordFileResultSink()
+sink.begin_document(save_dir, "doc", save_dir)
+for page_no in range(num_pages):
+    result = sink.write_page(save_dir, f"doc_page_{page_no}", make_page(page_no))
+    checkpoint.record(result)
+    print(page_no, flush=True)
+    time.sleep(0.05)
+"""
+
+
+def make_page(page_no):
+    return {
+        "page_no": page_no,
+        "input_height": 100,
+        "input_width": 80,
+        "layout_info": [{"bbox": [0, 0, 10, 10], "category": "Text", "text": f"page {page_no}"}],
+        "md_content": f"page {page_no}",
+    }
+
+
+def run_killed(save_dir, input_path):
+    """启动写页面的子进程，写完KILL_AFTER页后SIGKILL，返回已写的页数"""
+    script = f"from test.test_records_resume import make_page\n{CHILD_SCRIPT}"
+    proc = subprocess.Popen(
+        [sys.executable, "-c", script, save_dir, input_path, str(NUM_PAGES)],
+        stdout=subprocess.PIPE,
+        text=True,
+        cwd=PROJECT_DIR,
+        env=dict(os.environ, PYTHONPATH=PROJECT_DIR),
+    )
+    written = 0
+    for _ in proc.stdout:
+        written += 1
+        if written == KILL_AFTER:
+            proc.send_signal(signal.SIGKILL)
+            break
+    proc.wait()
+    return written
+
+
+def resume(save_dir, input_path):
+    """按解析器的方式续跑：恢复检查点里的页面，只写缺失的页面，返回记录文件里的全部记录"""
+    checkpoint = PageCheckpoint(save_dir, "doc", input_path, {"prompt_mode": "test"})
+    completed = checkpoint.load()
+    sink = RecordFileResultSink()
+    sink.begin_document(save_dir, "doc", save_dir, restored=completed.values())
+    for page_no in range(NUM_PAGES):
+        if page_no not in completed:
+            checkpoint.record(sink.write_page(save_dir, f"doc_page_{page_no}", make_page(page_no)))
+    sink.end_document(save_dir, "doc", save_dir, [])
+    checkpoint.close()
+    return completed, RecordFileResultSink.load_records(RecordFileResultSink.records_path(save_dir, "doc"))
+
+
+def _setup(tmp_path):
+    input_path = str(tmp_path / "doc.pdf")
+    with open(input_path, "wb") as f:
+        f.write(b"%PDF-1.4 test input")
+    return str(tmp_path), input_path
+
+
+def test_records_survive_kill(tmp_path):
+    save_dir, input_path = _setup(tmp_path)
+    assert run_killed(save_dir, input_path) == KILL_AFTER
+    completed, records = resume(save_dir, input_path)
+    assert len(completed) >= KILL_AFTER
+    assert [record["page_no"] for record in records] == list(range(NUM_PAGES))
+    assert records[3]["md_content"] == "page 3"
+
+
+def test_restored_pages_missing_from_records_are_written_back(tmp_path):
+    save_dir, input_path = _setup(tmp_path)
+    run_killed(save_dir, input_path)
+    # 记录文件丢了已完成的页面，并且最后一行被截断
+    path = RecordFileResultSink.records_path(save_dir, "doc")
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(lines[:3])
+        f.write('{"page_no": 3, "inp')
+    completed, records = resume(save_dir, input_path)
+    assert len(completed) >= KILL_AFTER
+    assert [record["page_no"] for record in records] == list(range(NUM_PAGES))
+    assert "records_path" not in records[5]
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+def normalize_text(text: str) -> str:
+    """规范化查询文本：去掉首尾空白，连续空白合并为一个空格"""
+    return " ".join((text or "").split())
+
+
+def image_digest(image: str) -> str:
+    """图片的内容哈希：本地文件按文件内容计算，base64/URL按字符串本身计算"""
+    sha = hashlib.sha256()
+    if image and os.path.isfile(image):
+        with open(image, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha.update(chunk)
+    else:
+        sha.update((image or "").encode("utf-8"))
+    return sha.hexdigest()
+
+
+def embedding_cache_key(input_data: List[Dict[str, Any]], mode: str = "") -> Tuple:
+    """由local_gme_one的输入构造缓存key，同一段文本/同一张图片在不同调用处得到相同的key
+
+    Args:
+        input_data: [{'text'|'image': ..., 'factor': 1}, ...]
+        mode: 图文融合方式，融合方式不同的向量不能互相复用
+    """
+    parts = []
+    for data in input_data:
+        if data.__contains__('image'):
+            parts.append(('image', image_digest(data.get('image')), data.get('factor', 1)))
+        elif data.__contains__('text'):
+            parts.append(('text', normalize_text(data.get('text')), data.get('factor', 1)))
+    return (mode, tuple(parts))
+
+
+class EmbeddingCache:
+    """线程安全的有界向量缓存，按LRU淘汰，超过ttl的条目视为过期
+
+    一轮对话里同一个查询会在search_context、retriever_node和上下文写入处
+    各向量化一次，评估脚本也会反复检索同样的问题；这些调用处共用一个缓存，
+    同一段文本只调用一次模型。
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 600):
+        """
+        Args:
+            max_size: 最多缓存的向量条数(必须>0)
+            ttl: 条目的有效期(秒)，None表示不过期
+        """
+        if max_size <= 0:
+            raise ValueError("缓存大小(max_size)必须大于0")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """命中时返回缓存的值并移到最近使用的位置，未命中或已过期返回None"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._data[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
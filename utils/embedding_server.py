@@ -0,0 +1,267 @@
+"""
+本地向量化服务：GME多模态模型和Qwen3文本模型只在这个进程里加载一份，
+聊天应用、入库应用和评估脚本通过EmbeddingClient调用。
+
+并发到达的encode请求在一个很短的时间窗口内合并成一个批次，只调用一次模型，
+再把结果按请求拆分返回给各自的调用方。
+
+启动: python -m utils.embedding_server --port 8765
+客户端: 在.env中设置 EMBEDDING_SERVER_URL=http://127.0.0.1:8765
+"""
+import argparse
+import base64
+import json
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from utils.log_utils import log
+
+# 由服务端控制，客户端传入的这些参数会被忽略
+IGNORED_ENCODE_KWARGS = ("batch_size", "convert_to_tensor", "convert_to_numpy", "show_progress_bar", "device")
+
+
+class _EncodeRequest:
+    def __init__(self, inputs: List[Any], kwargs: Dict[str, Any]):
+        self.inputs = inputs
+        self.kwargs = kwargs
+        # 参数相同的请求才能合并进同一次encode
+        self.group_key = json.dumps(kwargs, sort_keys=True)
+        self.future: Future = Future()
+
+
+class MicroBatcher:
+    """把多个线程的encode请求合并成批次，交给一个工作线程调用模型
+
+    工作线程取到第一个请求后最多再等待max_wait秒，期间到达的请求(总条数不超过
+    max_batch_size)合并成一批，按encode参数分组后每组调用一次encode_fn。
+    某组encode失败时逐个请求重新encode，只有单独仍然失败的请求收到异常。
+    """
+
+    def __init__(self, encode_fn: Callable[..., np.ndarray], max_batch_size: int = 64, max_wait: float = 0.01):
+        """
+        Args:
+            encode_fn: 模型的encode方法，例如SentenceTransformer.encode
+            max_batch_size: 一个批次最多的输入条数
+            max_wait: 凑批次的最长等待时间(秒)
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: "queue.Queue[_EncodeRequest]" = queue.Queue()
+        self.batches = 0
+        self.requests = 0
+        self.items = 0
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+    def encode(self, inputs: List[Any], **kwargs) -> np.ndarray:
+        """提交一个请求并阻塞到所在批次完成，线程安全"""
+        request = _EncodeRequest(inputs, kwargs)
+        self._queue.put(request)
+        return request.future.result()
+
+    def _collect(self) -> List[_EncodeRequest]:
+        batch = [self._queue.get()]
+        size = len(batch[0].inputs)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.inputs)
+        return batch
+
+    def _run(self):
+        while True:
+            groups: Dict[str, List[_EncodeRequest]] = {}
+            for request in self._collect():
+                groups.setdefault(request.group_key, []).append(request)
+            for group in groups.values():
+                inputs = [item for request in group for item in request.inputs]
+                try:
+                    embeddings = np.asarray(
+                        self.encode_fn(inputs, batch_size=len(inputs), **group[0].kwargs), dtype=np.float32)
+                except Exception as e:
+                    if len(group) == 1:
+                        log.exception(e)
+                        group[0].future.set_exception(e)
+                        continue
+                    # 一条坏输入不应连累同一窗口里的其他请求：退回逐个请求encode，只有仍然失败的请求返回异常
+                    log.warning(f"合并的encode失败，改为逐个请求encode: {e}")
+                    for request in group:
+                        self._run_single(request)
+                    continue
+                self.batches += 1
+                self.requests += len(group)
+                self.items += len(inputs)
+                start = 0
+                for request in group:
+                    request.future.set_result(embeddings[start:start + len(request.inputs)])
+                    start += len(request.inputs)
+
+    def _run_single(self, request: _EncodeRequest):
+        try:
+            embeddings = np.asarray(
+                self.encode_fn(request.inputs, batch_size=len(request.inputs), **request.kwargs), dtype=np.float32)
+        except Exception as e:
+            log.exception(e)
+            request.future.set_exception(e)
+            return
+        self.batches += 1
+        self.requests += 1
+        self.items += len(request.inputs)
+        request.future.set_result(embeddings)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
+
+
+def encode_array(array: np.ndarray) -> Dict[str, Any]:
+    """float32向量用base64传输，比json数字列表小且不损失精度"""
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {"shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+def decode_array(payload: Dict[str, Any]) -> np.ndarray:
+    data = base64.b64decode(payload["data"])
+    return np.frombuffer(data, dtype=np.float32).reshape(payload["shape"])
+
+
+class EmbeddingClient:
+    """向量化服务的客户端，encode的用法与SentenceTransformer.encode一致，返回float32的numpy数组"""
+
+    def __init__(self, base_url: str, model: str, timeout: float = 120):
+        """
+        Args:
+            base_url: 服务地址，例如 http://127.0.0.1:8765
+            model: 服务端的模型名，gme 或 text
+            timeout: 单次请求的超时时间(秒)
+        """
+        self.url = f"{base_url.rstrip('/')}/encode/{model}"
+        self.timeout = timeout
+
+    def encode(self, sentences, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, (str, dict))
+        inputs = [sentences] if single else list(sentences)
+        kwargs = {k: v for k, v in kwargs.items() if k not in IGNORED_ENCODE_KWARGS}
+        body = json.dumps({"inputs": inputs, "kwargs": kwargs}).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            message = e.read().decode("utf-8", errors="replace")
+            raise RuntimeError(f"向量化服务返回错误 {e.code}: {message}") from e
+        embeddings = decode_array(payload)
+        return embeddings[0] if single else embeddings
+
+
+def make_handler(batchers: Dict[str, MicroBatcher]):
+    class EmbeddingHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status: int, payload: Dict[str, Any]):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json(200, {name: batcher.stats() for name, batcher in batchers.items()})
+            else:
+                self._send_json(404, {"error": f"未知路径 {self.path}"})
+
+        def do_POST(self):
+            prefix = "/encode/"
+            name = self.path[len(prefix):] if self.path.startswith(prefix) else None
+            if name not in batchers:
+                self._send_json(404, {"error": f"未知模型 {name}，可选 {list(batchers)}"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+                inputs = payload["inputs"]
+                kwargs = {k: v for k, v in (payload.get("kwargs") or {}).items() if k not in IGNORED_ENCODE_KWARGS}
+            except Exception as e:
+                self._send_json(400, {"error": f"请求格式错误: {e}"})
+                return
+            if not inputs:
+                self._send_json(200, encode_array(np.zeros((0, 0), dtype=np.float32)))
+                return
+            try:
+                embeddings = batchers[name].encode(inputs, **kwargs)
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+            self._send_json(200, encode_array(embeddings))
+
+        def log_message(self, format, *args):
+            pass  # 每个请求都打印会淹没日志
+
+    return EmbeddingHandler
+
+
+def serve(model_paths: Dict[str, str], host: str = "127.0.0.1", port: int = 8765,
+          max_batch_size: int = 64, max_wait: float = 0.01, models: Optional[Dict[str, Any]] = None):
+    """加载模型并启动服务，阻塞直到进程退出
+
+    Args:
+        model_paths: 模型名到本地模型路径，例如 {'gme': ..., 'text': ...}
+        host: 监听地址，默认只监听本机
+        port: 监听端口
+        max_batch_size: 一个批次最多的输入条数
+        max_wait: 凑批次的最长等待时间(秒)
+        models: 已加载的模型，传入时不再按model_paths加载
+    """
+    if models is None:
+        from sentence_transformers import SentenceTransformer
+        models = {}
+        for name, path in model_paths.items():
+            log.info(f"加载向量模型 {name}: {path}")
+            models[name] = SentenceTransformer(path)
+    batchers = {name: MicroBatcher(model.encode, max_batch_size, max_wait) for name, model in models.items()}
+    server = ThreadingHTTPServer((host, port), make_handler(batchers))
+    log.info(f"向量化服务已启动: http://{host}:{port}，模型: {list(batchers)}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    from utils.env_utils import LOCAL_GME_MODEL_PATH, LOCAL_TEXT_EMB_PATH
+
+    parser = argparse.ArgumentParser(description="本地向量化服务，合并并发的encode请求")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max_batch_size", type=int, default=64, help="一个批次最多的输入条数")
+    parser.add_argument("--max_wait_ms", type=float, default=10, help="凑批次的最长等待时间(毫秒)")
+    args = parser.parse_args()
+
+    serve(
+        {"gme": LOCAL_GME_MODEL_PATH, "text": LOCAL_TEXT_EMB_PATH},
+        host=args.host,
+        port=args.port,
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000,
+    )
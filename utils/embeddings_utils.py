@@ -4,11 +4,12 @@ from http import HTTPStatus
 from typing import List, Tuple, Dict, Optional,Any
 
 import dashscope
+import numpy as np
 from dashscope import MultiModalEmbeddingItemImage
 from dashscope.embeddings.multimodal_embedding import MultiModalEmbeddingItemBase, MultiModalEmbeddingItemText
-from sentence_transformers import SentenceTransformer
 
 from my_llm import gme_st
+from utils.embedding_cache import EmbeddingCache, embedding_cache_key
 from utils.env_utils import ALIBABA_API_KEY
 from utils.log_utils import log
 
@@ -22,6 +23,16 @@ MAX_429_RETRIES = 5  # 429状态码的最大重试次数
 BASE_BACKOFF = 2.0  # 指数退避算法的基础等待时间(秒)
 # 图片最大体积(URL HEAD 检查)，若超过则跳过图片项
 MAX_IMAGE_BYTES = 3 * 1024 * 1024
+# 入库时本地GME模型每次encode的条数
+GME_BATCH_SIZE = 16
+# 图文项的向量融合方式：
+#   joint    - 图文作为一个多模态输入({'text','image'})交给GME联合编码
+#   weighted - 文本和图片分别编码，按factor加权求和后归一化
+#   text     - 只取文本向量(旧行为，图片被忽略，仅用于对照)
+GME_FUSION_MODE = 'weighted'
+# 查询向量缓存：最多缓存的条数和有效期(秒)
+EMBEDDING_CACHE_SIZE = 1024
+EMBEDDING_CACHE_TTL = 600
 # =====配置区结束 =====
 
 
@@ -207,22 +218,87 @@ def normalize_image(img: str) -> Tuple[str, str]:
     # 其他不支持的类型
     return "", ""
 
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """按行L2归一化，保持float32"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32, copy=False)
+
+
+def encode_gme_fused(texts: List[str], images: List[str], text_weight: float = 0.5,
+                     mode: Optional[str] = None) -> np.ndarray:
+    """批量计算图文项的融合向量
+
+    Args:
+        texts: 每一项的文本(图片描述)
+        images: 每一项的图片(本地路径、URL或base64)，与texts一一对应
+        text_weight: weighted模式下文本向量的权重，图片向量权重为1-text_weight
+        mode: 融合方式，默认取GME_FUSION_MODE
+    Returns:
+        np.ndarray: 形状为(len(texts), dim)的float32向量
+    """
+    mode = mode or GME_FUSION_MODE
+    if mode == 'joint':
+        inputs = [{'text': text, 'image': img} for text, img in zip(texts, images)]
+        return np.asarray(gme_st.encode(inputs, batch_size=len(inputs)), dtype=np.float32)
+    if mode == 'text':
+        return np.asarray(gme_st.encode(texts, batch_size=len(texts)), dtype=np.float32)
+    if mode != 'weighted':
+        raise ValueError(f"未知的融合方式: {mode}，可选 joint/weighted/text")
+    # 文本和图片放进同一次encode，前一半是文本向量，后一半是图片向量；
+    # 图片必须包成{'image': ...}，纯字符串会被GME当成文本，得到的是路径或base64的文本向量
+    inputs = list(texts) + [{'image': img} for img in images]
+    embeddings = _normalize(np.asarray(gme_st.encode(inputs, batch_size=len(inputs)), dtype=np.float32))
+    text_vectors, image_vectors = embeddings[:len(texts)], embeddings[len(texts):]
+    return _normalize(text_weight * text_vectors + (1 - text_weight) * image_vectors)
+
+
 def local_gme_one(input_data:List[Dict[str,Any]]) ->Tuple[
-    bool, List[float], Optional[int], Optional[float]]:
+    bool, np.ndarray, Optional[int], Optional[float]]:
     """
     调用本地GME模型多模态向量
-    :param input_data:
-    :return:
+
+    只有文本或只有图片时直接编码；同时有文本和图片时按GME_FUSION_MODE融合，
+    weighted模式的权重取各自的factor(默认1，即各占一半)。
+    :param input_data: [{'text'|'image': ..., 'factor': 1}, ...]
+    :return: (成功标志，float32嵌入向量，HTTP状态码，重试等待时间)，与call_dashscope_once一致
     """
-    encode_data = []
+    text = image = None
+    text_factor = image_factor = 1
     for data in input_data:
         if data.__contains__('image'):
-            encode_data.append(data.get('image'))
+            image, image_factor = data.get('image'), data.get('factor', 1)
         elif data.__contains__('text'):
-            encode_data.append(data.get('text'))
+            text, text_factor = data.get('text'), data.get('factor', 1)
+
+    if text is not None and image is not None:
+        embedding = encode_gme_fused([text], [image], text_factor / (text_factor + image_factor))[0]
+    else:
+        encode_data = [{'image': image} if image is not None else text]
+        embedding = np.asarray(gme_st.encode(encode_data)[0], dtype=np.float32)
+    return True,embedding,None,None
 
-    embedding = gme_st.encode(encode_data,convert_to_tensor=True)
-    return True,embedding[0].tolist(),None,None
+
+# 检索、上下文写入和评估共用的查询向量缓存
+query_embedding_cache = EmbeddingCache(EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL)
+
+
+def cached_gme_one(input_data:List[Dict[str,Any]]) ->Tuple[
+    bool, np.ndarray, Optional[int], Optional[float]]:
+    """
+    带缓存的local_gme_one，返回值相同
+
+    按规范化后的文本或图片内容哈希查找query_embedding_cache，命中时不再调用模型；
+    只缓存成功的结果。缓存的向量是只读的，调用方需要修改时请先copy。
+    """
+    key = embedding_cache_key(input_data, GME_FUSION_MODE)
+    embedding = query_embedding_cache.get(key)
+    if embedding is not None:
+        return True,embedding,None,None
+    ok, embedding, status, retry_after = local_gme_one(input_data)
+    if ok:
+        embedding.flags.writeable = False
+        query_embedding_cache.put(key, embedding)
+    return ok,embedding,status,retry_after
 
 def call_dashscope_once(input_data: List[Dict]) -> Tuple[
     bool, List[float], Optional[int], Optional[float]]:
@@ -277,6 +353,70 @@ def call_dashscope_once(input_data: List[Dict]) -> Tuple[
         return False, [], status, retry_after
 
 
+def _item_inputs(item: Dict) -> Tuple[str, str]:
+    """取出数据项的文本和图片输入，返回(文本, 图片)，没有图片时图片为空字符串"""
+    raw_content = (item.get('text') or '').strip()
+    image_raw = (item.get("image_path") or '').strip()
+    if not image_raw:
+        return raw_content, ''
+    # 本地图片文件(OCR按内容哈希写入的图片)直接把路径交给GME读取，不再转base64
+    img = image_raw if os.path.isfile(image_raw) else normalize_image(image_raw)[0]
+    return raw_content, img
+
+
+def embed_items_batched(items: List[Dict], batch_size: int = GME_BATCH_SIZE) -> List[Dict]:
+    """批量向量化入库的数据项，替代逐条调用process_item_with_guard
+
+    纯文本项和图文项分开成组，组内按文本长度排序后切成固定大小的批次，
+    同一批次长度相近，padding最少；每个批次只调用一次gme_st.encode，
+    再按原下标把向量写回各自的数据项。本地模型没有429限流，不需要退避重试。
+    图文项按GME_FUSION_MODE融合文本和图片向量，dense为float32的numpy数组。
+    某个批次encode失败时退回逐条encode，仍然失败的数据项dense为空数组。
+
+    Args:
+        items: 原始数据项列表
+        batch_size: 每次encode的条数
+    Returns:
+        List[Dict]: 与items顺序一致的新数据项，包含嵌入向量
+    """
+    new_items = [item.copy() for item in items]
+    groups: Dict[str, List[Tuple[int, str, str]]] = {'text': [], 'image': []}
+    for idx, item in enumerate(new_items):
+        text, img = _item_inputs(item)
+        if img:
+            log.info(f'图片：{item.get("image_path")},所对应的描述为{text}')
+            groups['image'].append((idx, text, img))
+        else:
+            groups['text'].append((idx, text, img))
+
+    def encode_batch(modality, batch):
+        texts = [text for _, text, _ in batch]
+        if modality == 'image':
+            # 图文项按GME_FUSION_MODE融合，与local_gme_one的结果一致
+            return encode_gme_fused(texts, [img for _, _, img in batch])
+        return np.asarray(gme_st.encode(texts, batch_size=len(texts)), dtype=np.float32)
+
+    for modality, group in groups.items():
+        group.sort(key=lambda entry: len(entry[1]))
+        for start in range(0, len(group), batch_size):
+            batch = group[start:start + batch_size]
+            try:
+                embeddings = list(encode_batch(modality, batch))
+            except Exception as e:
+                print(f"[向量化] {modality}批次encode失败，改为逐条encode: {e}")
+                log.exception(e)
+                embeddings = []
+                for entry in batch:
+                    try:
+                        embeddings.append(encode_batch(modality, [entry])[0])
+                    except Exception as e:
+                        log.exception(e)
+                        embeddings.append(None)
+            for (idx, _, _), embedding in zip(batch, embeddings):
+                new_items[idx]['dense'] = embedding if embedding is not None else []
+    return new_items
+
+
 def process_item_with_guard(item: Dict) -> Dict:
     """处理单个数据项(文本或图像)，生成嵌入向量
 
@@ -290,13 +430,11 @@ def process_item_with_guard(item: Dict) -> Dict:
     """
     # 创建原始项的副本以避免修改原数据
     new_item = item.copy()
-    raw_content = (new_item.get('text') or '').strip()
-    image_raw = (new_item.get("image_path")or '').strip()
+    raw_content, img = _item_inputs(new_item)
 
-    if image_raw:
-        img = normalize_image(image_raw)[0]
+    if img:
         input_data = [{'text':raw_content,'factor':1},{'image':img,'factor':1}]
-        log.info(f'图片：{image_raw},所对应的描述为{raw_content}')
+        log.info(f'图片：{new_item.get("image_path")},所对应的描述为{raw_content}')
     else:
         input_data = [{'text':raw_content,'factor':1}]
 
@@ -23,3 +23,5 @@ DOTS_OCR_IP = os.getenv('DOTS_OCR_IP')
 DOTS_OCR_PORT = os.getenv('DOTS_OCR_PORT')
 LOCAL_GME_MODEL_PATH = os.getenv('LOCAL_GME_MODEL_PATH')
 LOCAL_TEXT_EMB_PATH = os.getenv('LOCAL_TEXT_EMB_PATH')
+# 向量化服务地址(utils/embedding_server.py)，设置后不在本进程加载向量模型
+EMBEDDING_SERVER_URL = os.getenv('EMBEDDING_SERVER_URL')
@@ -0,0 +1,69 @@
+import threading
+from typing import Any, Callable
+
+from utils.log_utils import log
+
+
+class LazyObject:
+    """线程安全的延迟初始化代理
+
+    第一次访问属性(或调用)时才执行factory创建真正的对象，之后所有访问都转发给它。
+    多个线程同时第一次访问时只会创建一次。用于模块级的大模型和网络客户端，
+    这样只导入模块而不使用它们的代码路径不会加载模型、也不会建立连接。
+
+    isinstance(proxy, Cls) 会通过__class__触发创建并按真正对象的类型判断。
+    """
+
+    def __init__(self, factory: Callable[[], Any], name: str = None):
+        """
+        Args:
+            factory: 无参函数，返回真正的对象
+            name: 对象名称，用于日志和repr
+        """
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_name", name or getattr(factory, "__name__", "object"))
+        object.__setattr__(self, "_wrapped", None)
+        object.__setattr__(self, "_loaded", False)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _setup(self) -> Any:
+        """返回真正的对象，首次调用时创建(双重检查加锁)"""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    log.info(f"初始化 {self._name}")
+                    object.__setattr__(self, "_wrapped", self._factory())
+                    object.__setattr__(self, "_loaded", True)
+        return self._wrapped
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def __class__(self):
+        return self._setup().__class__
+
+    def __getattr__(self, name):
+        # 只有代理自身没有的属性才会走到这里
+        return getattr(self._setup(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._setup(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self._setup(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._setup()(*args, **kwargs)
+
+    def __or__(self, other):
+        return self._setup() | other
+
+    def __ror__(self, other):
+        return other | self._setup()
+
+    def __repr__(self):
+        if self._loaded:
+            return repr(self._wrapped)
+        return f"<LazyObject {self._name} (未初始化)>"